@@ -1,10 +1,15 @@
+import math
 import numpy as np
 import matplotlib.pyplot as plt
 from launchsim import Rocket
 
 class Rocket_TVC(Rocket):
+    #The state of the PID is part of the state of the flight.
+    _STATE = Rocket._STATE + ("_total_error", "_prev_error", "_held",
+        "_command", "_samples", "_angle")
 
-    def __init__(self, kp, ki, kd, launch_ang, max_angle=5, **kwargs):
+    def __init__(self, kp, ki, kd, launch_ang, max_angle=5, rate=None,
+                 servo_rate=None, servo_lag=None, **kwargs):
         """Initialize class.
         Args:
             kp (float): proportional coefficient.
@@ -13,6 +18,17 @@ class Rocket_TVC(Rocket):
             launch_ang (touple): Launch angle (deg [theta, phi]).
             max_angle (float): Maximum angle of the thrust vector in any
                 direction (deg).
+            rate (float): Sample rate of the controller (Hz). The PID runs at
+                the first time step at or after each sample time, with this
+                sample time, and its output is held in between. Default to
+                None, the PID runs on every time step with the sample time dt.
+                Required with integrator='rk45', whose steps end at every
+                sample of the PID.
+            servo_rate (float): Maximum rate the thrust vector turns with
+                (deg/s), per axis. Default to None, no limit.
+            servo_lag (float): Time constant of the servo (s), the thrust
+                vector follows the command as a first order lag. Default to
+                None, it follows at once.
             **kwargs: input for super class.
         """
         super().__init__(launch_ang, **kwargs)
@@ -23,9 +39,36 @@ class Rocket_TVC(Rocket):
         self._prev_error = np.zeros(2)
         self._total_error = 0
         self._desired_ang = np.array([self.r[0][3], self.r[0][4]])
+        #Angle of the thrust vector held between samples of the adaptive
+        #integrator, None when the PID runs on every call of thrust().
+        self._held = None
+        #Sample period and sample time of the PID (s).
+        self._period = None if rate is None else 1/rate
+        self._ts = self._dt if rate is None else self._period
+        if self._period is None and self._integrator != "euler":
+            #A breakpoint at every time step of the burn, more evaluations
+            #than the Euler step.
+            raise ValueError("The adaptive integrator needs the rate of the "
+                "controller.")
+        if self._period is not None and self._period < self._dt*(1 - 1e-9):
+            raise ValueError("The controller can not run faster than the "
+                "time step.")
+        self._command = np.zeros(2) #Output of the last sample of the PID.
+        self._samples = 0 #Number of the next sample.
+        #The servo moves the thrust vector by a fraction of the difference to
+        #the command each time step, at most by slew.
+        self._servo = servo_rate is not None or servo_lag is not None
+        if self._servo and self._integrator != "euler":
+            raise ValueError("The servo is only modeled with the Euler step.")
+        self._servo_lag = servo_lag
+        self._lag_gain = (1.0 if servo_lag is None else
+            1 - math.exp(-self._dt/servo_lag))
+        self._slew = (math.inf if servo_rate is None else
+            servo_rate*(np.pi/180)*self._dt)
+        self._angle = np.zeros(2) #Angle of the thrust vector (rad).
         return
 
-    def thrust(self, t, r):
+    def thrust(self, t, r, kin=None):
         """Thrust as a vector pointing from the back of the rocket with an
          angle depending on the TVC from positive z in the local frame of
          reference, converted into the global frame of reference.
@@ -33,21 +76,153 @@ class Rocket_TVC(Rocket):
             t (float): Time since initialization (s).
             r (np.array): Positional vector
                 (East, North, altitude, pitch, yaw).
+            kin (Kinematics): Kinematics of the state, if already known.
         Returns:
             np.array: Force from thrust as a vector
                 (East, North, altitude, pitch, yaw).
         """
         if t < self._burntime:
+            if kin is None:
+                kin = self.kinematics(r, np.zeros(5))
             #Thrust is now a vector in the local frame of reference.
-            thrust = self._thrustforce*np.array([0, 0, 1])
-            l_thrust = self.rotate(self.pid(r), thrust)
+            thrust = self.thrust_force(t)*np.array([0, 0, 1])
+            u = self.actuator(t, r)
+            l_thrust = self.rotate(u, thrust)
             #Convert the vector to the global frame of reference.
-            g_thrust = self.rotate(r[3:], l_thrust)
+            g_thrust = kin.rotation @ l_thrust
             return np.array((g_thrust[0], g_thrust[1], g_thrust[2],
                              -l_thrust[1]*self._hcm, l_thrust[0]*self._hcm))
         else:
             return np.zeros(5)
 
+    def actuator(self, t, r):
+        """Angle of the thrust vector at a time step. The command is the held
+         angle or the output of the PID, which runs on its own schedule, see
+         rate. The servo, if modeled, moves the thrust vector towards it.
+         Called once per time step.
+        Args:
+            t (float): Time since initialization (s).
+            r (np.array): Positional vector
+                (East, North, altitude, pitch, yaw).
+        Returns:
+            np.array: Angle of the thrust vector (rad [pitch, yaw]).
+        """
+        if self._held is not None:
+            command = self._held
+        elif self._period is None:
+            command = self.pid(r)
+        else:
+            if t >= (self._samples - 1e-6)*self._period:
+                self._command = self.pid(r)
+                self._samples = math.floor(t/self._period + 1e-6) + 1
+            command = self._command
+        if not self._servo:
+            return command
+        move = np.clip(self._lag_gain*(command - self._angle), -self._slew,
+            self._slew)
+        self._angle = self._angle + move
+        return self._angle
+
+    def control(self, u):
+        """Hold the angle of the thrust vector in place of the PID, limited
+         to max_angle, see Rocket.iter_steps().
+        Args:
+            u (np.array): Angle of the thrust vector (rad [pitch, yaw]), or
+                None to hand control back to the PID.
+        """
+        if u is None:
+            self._held = None
+        else:
+            limit = self._max_angle*(np.pi/180)
+            self._held = np.clip(np.asarray(u, dtype=np.float64), -limit,
+                limit)
+        return
+
+    def _launch_fast(self, terminal, stop=None):
+        """Run the fast kernel with the PID and servo state, and the held
+         control input, as plain floats."""
+        held = self._held
+        self._total_error = (self._total_error + np.zeros(2)).tolist()
+        self._prev_error = self._prev_error.tolist()
+        self._command = list(map(float, self._command))
+        self._angle = self._angle.tolist()
+        if held is not None:
+            self._held = held.tolist()
+        try:
+            return super()._launch_fast(terminal, stop)
+        finally:
+            self._total_error = np.array(self._total_error)
+            self._prev_error = np.array(self._prev_error)
+            self._command = np.array(self._command)
+            self._angle = np.array(self._angle)
+            self._held = held
+
+    def _fast_thrust(self, t, r, rot):
+        """Thrust with TVC for the fast kernel, the same as thrust(),
+         actuator() and pid() on plain floats.
+        Args:
+            t (float): Time since initialization (s).
+            r (list): Positional vector (East, North, altitude, pitch, yaw).
+            rot (tuple): cos and sin of pitch, cos and sin of yaw.
+        Returns:
+            tuple: Force from thrust (East, North, altitude, pitch, yaw).
+        """
+        if t >= self._burntime:
+            return (0.0, 0.0, 0.0, 0.0, 0.0)
+        total, prev, u = self._total_error, self._prev_error, self._command
+        period = self._period
+        if self._held is not None:
+            u = self._held
+        elif period is None or t >= (self._samples - 1e-6)*period:
+            limit = self._max_angle*(np.pi/180)
+            for j in range(2):
+                error = float(self._desired_ang[j]) - r[j+3]
+                total[j] += error*self._ts
+                u[j] = (self._kp*error + self._ki*total[j] +
+                    self._kd*(error - prev[j]))
+                u[j] = max(-limit, min(limit, u[j]))
+                prev[j] = error
+            if period is not None:
+                self._samples = math.floor(t/period + 1e-6) + 1
+        if self._servo:
+            angle, slew = self._angle, self._slew
+            for j in range(2):
+                angle[j] += max(-slew, min(slew,
+                    self._lag_gain*(u[j] - angle[j])))
+            u = angle
+
+        #Thrust vector in the local frame, then in the global frame.
+        cu, su = math.cos(u[0]), math.sin(u[0])
+        cv, sv = math.cos(u[1]), math.sin(u[1])
+        f = self.thrust_force(t)
+        l0, l1, l2 = sv*cu*f, -su*f, cv*cu*f
+        cp, sp, cy, sy = rot
+        return (cy*l0 + sy*sp*l1 + sy*cp*l2, cp*l1 - sp*l2,
+            -sy*l0 + cy*sp*l1 + cy*cp*l2, -l1*self._hcm, l0*self._hcm)
+
+    def _breakpoints(self):
+        """The PID samples at its own rate during the burn, and the thrust
+         vector is held in between.
+        Returns:
+            list: Times (s).
+        """
+        samples = self._period*np.arange(1, math.ceil(self.t[-1]/
+            self._period) + 1)
+        samples = samples[samples < self._burntime]
+        return super()._breakpoints() + list(samples)
+
+    def _sample(self, t, r, v):
+        """Run the PID once at a sample time of the adaptive integrator.
+        Args:
+            t (float): Time since initialization (s).
+            r (np.array): Positional vector
+                (East, North, altitude, pitch, yaw).
+            v (np.array): Velocity vector (East, North, altitude, pitch, yaw).
+        """
+        if t < self._burntime:
+            self._held = self.pid(r)
+        return
+
     def pid(self, r):
         """Calculate the angle of the thrust vector using PID.
         Args:
@@ -56,7 +231,7 @@ class Rocket_TVC(Rocket):
             np.array: Angle of thrust vector (rad [pitch, yaw]).
         """
         error = self._desired_ang - r[3:]
-        self._total_error += error*self._dt
+        self._total_error += error*self._ts
         proportional = self._kp*error
         integral = self._ki*self._total_error
         derivative = self._kd*(error - self._prev_error)
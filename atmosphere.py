@@ -0,0 +1,146 @@
+import math
+from functools import lru_cache
+import numpy as np
+
+G = 9.80665 #Gravitational constant (m/s^2).
+P0 = 101325 #Standard absolute atmospheric pressure (Pa).
+AIR_MOLAR = 0.0289654 #Molar mass of dry air (kg/mol).
+GAS_CONSTANT = 8.314463 #Ideal gas constant (J/(mol*K)).
+T0 = 288.15 #Absolute temperature at sea level (K).
+GAMMA = 1.4 #Heat capacity ratio of air.
+#Layers of the International Standard Atmosphere up to 84852 m: base
+#altitude (m) and temperature lapse rate (K/m). The altitude is used as
+#geometric altitude, and the atmosphere is held constant above the top.
+BASES = (0.0, 11000.0, 20000.0, 32000.0, 47000.0, 51000.0, 71000.0)
+LAPSE = (-0.0065, 0.0, 0.001, 0.0028, 0.0, -0.0028, -0.002)
+TOP = 84852.0
+
+def _layers():
+    """Temperature, pressure and density at the base of each layer, and the
+     exponent of the density in the layer (None if isothermal)."""
+    temperatures, pressures, densities, exponents = [T0], [P0], [], []
+    for j, lapse in enumerate(LAPSE):
+        t, p = temperatures[j], pressures[j]
+        densities.append(p*AIR_MOLAR/(GAS_CONSTANT*t))
+        exponents.append(None if lapse == 0 else
+            (G*AIR_MOLAR/(GAS_CONSTANT*-lapse))-1)
+        if j+1 < len(LAPSE):
+            h = BASES[j+1] - BASES[j]
+            temperatures.append(t + lapse*h)
+            if lapse == 0:
+                pressures.append(p*math.exp(-G*AIR_MOLAR*h/(GAS_CONSTANT*t)))
+            else:
+                pressures.append(p*(temperatures[j+1]/t)**(exponents[j]+1))
+    return temperatures, pressures, densities, exponents
+
+TEMPERATURES, PRESSURES, DENSITIES, EXPONENTS = _layers()
+_ARRAYS = [np.array(x, dtype=np.float64) for x in (BASES, LAPSE, TEMPERATURES,
+    PRESSURES, DENSITIES, [np.nan if x is None else x for x in EXPONENTS])]
+
+def _scalar(h):
+    """Temperature, pressure and density at one altitude."""
+    h = min(h, TOP)
+    j = len(BASES)-1
+    while j > 0 and h < BASES[j]:
+        j -= 1
+    lapse, dh = LAPSE[j], h - BASES[j]
+    if lapse == 0:
+        ratio = math.exp(-G*AIR_MOLAR*dh/(GAS_CONSTANT*TEMPERATURES[j]))
+        return TEMPERATURES[j], PRESSURES[j]*ratio, DENSITIES[j]*ratio
+    #Same expression as the troposphere model this replaces.
+    base = 1+(lapse*dh/TEMPERATURES[j])
+    return (TEMPERATURES[j]*base, PRESSURES[j]*base**(EXPONENTS[j]+1),
+        DENSITIES[j]*base**EXPONENTS[j])
+
+def _vector(h):
+    """Temperature, pressure and density at an array of altitudes."""
+    h = np.minimum(np.asarray(h, dtype=np.float64), TOP)
+    bases, lapse, temperatures, pressures, densities, exponents = _ARRAYS
+    j = np.maximum(np.searchsorted(bases, h, side='right')-1, 0)
+    lapse, dh, tb = lapse[j], h - bases[j], temperatures[j]
+    isothermal = lapse == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base = 1+(lapse*dh/tb)
+        ratio = np.exp(-G*AIR_MOLAR*dh/(GAS_CONSTANT*tb))
+        temperature = np.where(isothermal, tb, tb*base)
+        pressure = pressures[j]*np.where(isothermal, ratio,
+            base**(exponents[j]+1))
+        density = densities[j]*np.where(isothermal, ratio,
+            base**exponents[j])
+    return temperature, pressure, density
+
+def state(h):
+    """Temperature (K), pressure (Pa) and density (kg/m^3) at altitude h (m),
+     a float or an array."""
+    if np.ndim(h) == 0:
+        return _scalar(h)
+    return _vector(h)
+
+def temperature(h):
+    """Absolute temperature (K) at altitude h (m), a float or an array."""
+    return state(h)[0]
+
+def pressure(h):
+    """Pressure (Pa) at altitude h (m), a float or an array."""
+    return state(h)[1]
+
+def density(h):
+    """Air density (kg/m^3) at altitude h (m), a float or an array."""
+    return state(h)[2]
+
+def speed_of_sound(h):
+    """Speed of sound (m/s) at altitude h (m), a float or an array."""
+    return np.sqrt(GAMMA*GAS_CONSTANT*temperature(h)/AIR_MOLAR)
+
+class Table():
+    def __init__(self, step=1.0, bottom=-1000.0, top=TOP):
+        """Initialize class. The atmosphere sampled on an even grid, looked up
+         by linear interpolation in constant time. With the default step of
+         1 m the relative error of the density is below 1e-8.
+        Args:
+            step (float): Distance between samples (m). Default to 1.0.
+            bottom (float): Lowest altitude (m). Default to -1000.0.
+            top (float): Highest altitude (m), the table is held constant
+                outside. Default to TOP.
+        """
+        self.step = step
+        self.bottom = bottom
+        self.h = np.arange(bottom, top+step, step)
+        self.temperature, self.pressure, self.density = _vector(self.h)
+        self.speed_of_sound = np.sqrt(GAMMA*GAS_CONSTANT*self.temperature/
+            AIR_MOLAR)
+        #Plain lists for single altitudes, faster to index than arrays.
+        self._density = self.density.tolist()
+        return
+
+    def lookup(self, values, h):
+        """Interpolate a sampled quantity.
+        Args:
+            values (np.array): One of the sampled quantities of the table.
+            h (float or np.array): Altitude (m).
+        Returns:
+            float or np.array: The quantity at h.
+        """
+        x = np.clip((np.asarray(h) - self.bottom)/self.step, 0,
+            len(self.h)-1.0)
+        j = np.minimum(x.astype(int), len(self.h)-2)
+        return values[j] + (x - j)*(values[j+1] - values[j])
+
+    def density_at(self, h):
+        """Air density (kg/m^3) at altitude h (m), a float or an array."""
+        if np.ndim(h) != 0:
+            return self.lookup(self.density, h)
+        x = min(max((h - self.bottom)/self.step, 0.0), len(self.h)-1.0)
+        j = min(int(x), len(self.h)-2)
+        low = self._density[j]
+        return low + (x - j)*(self._density[j+1] - low)
+
+@lru_cache(maxsize=None)
+def table(step=1.0):
+    """The shared Table with the given step, built on first use.
+    Args:
+        step (float): Distance between samples (m). Default to 1.0.
+    Returns:
+        Table: The table.
+    """
+    return Table(step)
@@ -0,0 +1,308 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import partial
+import numpy as np
+import dispersion
+from ensemble import Rocket_Ensemble
+import render
+import results
+import store
+from sweep import build, run_sweep
+
+BASELINE = "benchmark.json"
+THRESHOLD = 0.1 #Allowed slowdown or growth of peak memory, relative.
+DTS = (0.01, 0.005, 0.002) #Time steps of the single flights (s).
+MEMBERS = 256 #Members of the large ensemble.
+
+class Timer():
+    def __init__(self):
+        """Initialize class. Adds up the time spent in named phases. Phases
+         may be nested, the time of a phase does not include the phases
+         inside it, so the phases add up to the total.
+        """
+        self.phases = {}
+        self._inner = []
+        return
+
+    @contextmanager
+    def phase(self, name):
+        """Time the code inside the with-block as the phase 'name'."""
+        self._inner.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = (self.phases.get(name, 0.0) + elapsed
+                - self._inner.pop())
+            if self._inner:
+                self._inner[-1] += elapsed
+        return
+
+def flight(timer, dt=0.01, kernel="numpy", tvc=True):
+    """One flight of the rocket of TVC.py, with the phases build, integrate
+     and events.
+    Args:
+        timer (Timer): Timer of the phases.
+        dt (float): Time step (s). Default to 0.01.
+        kernel (str): 'numpy' or 'fast', see Rocket.launch(). Default to
+            'numpy'.
+        tvc (bool): Fly with TVC. Default to True.
+    Returns:
+        int: Number of time steps.
+    """
+    scenario = dict(results.INPUTS, dt=dt, **(results.GAINS if tvc else {}))
+    with timer.phase("build"):
+        rocket = build(scenario)
+    find_events = rocket.find_events
+
+    def timed():
+        with timer.phase("events"):
+            return find_events()
+
+    rocket.find_events = timed
+    with timer.phase("integrate"):
+        rocket.launch(kernel=kernel)
+    return len(rocket.t)-1
+
+def wind_sweep(timer):
+    """The whole workload of results.py in this process: simulate the wind
+     sweep, store the flights and render the figures.
+    Args:
+        timer (Timer): Timer of the phases.
+    Returns:
+        int: Number of time steps of all flights.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        with timer.phase("simulate"):
+            flights = run_sweep(results.scenarios(), max_workers=1)
+        path = os.path.join(directory, "flights")
+        with timer.phase("store"):
+            store.save(path, flights)
+        with timer.phase("render"):
+            render.render(results.jobs(directory), path, max_workers=1)
+    return sum(len(flight.t)-1 for flight in flights)
+
+def ensemble(timer, members=MEMBERS):
+    """A large ensemble drawn around the nominal scenario of dispersion.py.
+    Args:
+        timer (Timer): Timer of the phases.
+        members (int): Number of members. Default to MEMBERS.
+    Returns:
+        int: Number of time steps times the number of members.
+    """
+    with timer.phase("build"):
+        scenarios = dispersion.sample(dispersion.NOMINAL, dispersion.SPREAD,
+            np.random.default_rng(0), members)
+        rockets = Rocket_Ensemble.from_scenarios(scenarios)
+    with timer.phase("integrate"):
+        rockets.launch()
+    return (len(rockets.t)-1)*members
+
+#Canonical benchmarks by name.
+BENCHMARKS = {f"tvc_{kernel}_dt{dt:g}":partial(flight, dt=dt, kernel=kernel)
+    for kernel in ("numpy", "fast") for dt in DTS}
+BENCHMARKS["rocket_numpy_dt0.01"] = partial(flight, tvc=False)
+BENCHMARKS["rocket_fast_dt0.01"] = partial(flight, kernel="fast", tvc=False)
+BENCHMARKS["wind_sweep"] = wind_sweep
+BENCHMARKS[f"ensemble_{MEMBERS}"] = ensemble
+
+def measure(function, repeat=3):
+    """Run a benchmark a number of times and keep the fastest run.
+    Args:
+        function (callable): The benchmark, taking a Timer and returning
+            the number of steps.
+        repeat (int): Number of timed runs. Default to 3.
+    Returns:
+        dict: Steps, seconds, steps per second and seconds of each phase of
+            the fastest run, and peak memory None.
+    """
+    best = None
+    for _ in range(repeat):
+        timer = Timer()
+        start = time.perf_counter()
+        steps = function(timer)
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best["seconds"]:
+            best = {"steps":steps, "seconds":seconds,
+                "steps_per_second":steps/seconds, "peak_memory":None,
+                "phases":timer.phases}
+    return best
+
+def peak_memory():
+    """Peak resident memory of this process (bytes), NaN where neither
+     /proc nor the resource module is available, e.g. on Windows."""
+    try:
+        #The high water mark of this process alone. ru_maxrss also counts
+        #the parent a started process was forked from.
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])*1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return np.nan
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*(
+        1 if sys.platform == "darwin" else 1024)
+
+def _isolated(name, repeat):
+    """measure() a benchmark in a fresh process, with the peak resident
+     memory of the process."""
+    result = measure(BENCHMARKS[name], repeat)
+    memory = peak_memory()
+    result["peak_memory"] = None if np.isnan(memory) else memory
+    return result
+
+def run(names=None, repeat=3, isolate=True, log=None):
+    """Run benchmarks.
+    Args:
+        names (list): Names of the benchmarks. Default to all BENCHMARKS.
+        repeat (int): Number of timed runs of each. Default to 3.
+        isolate (bool): Run each benchmark in a freshly started process and
+            measure its peak memory, including the interpreter and the
+            imported modules. Otherwise run in this process without
+            measuring memory. Default to True.
+        log (callable): Called with a line of text after each benchmark.
+            Default to None.
+    Returns:
+        dict: The machine and the measure() of each benchmark by name.
+    """
+    report = {"machine":machine(), "benchmarks":{}}
+    for name in names or BENCHMARKS:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = pool.submit(_isolated, name, repeat).result()
+        else:
+            result = measure(BENCHMARKS[name], repeat)
+        report["benchmarks"][name] = result
+        if log is not None:
+            log(format_result(name, result))
+    return report
+
+def machine():
+    """What the benchmarks ran on, stored with the results."""
+    return {"python":platform.python_version(), "numpy":np.__version__,
+        "platform":platform.platform(), "processor":platform.processor(),
+        "cpus":os.cpu_count()}
+
+def compare(baseline, report, threshold=THRESHOLD):
+    """Compare a run against a baseline. A benchmark regressed if it is
+     slower, in steps per second, or its peak memory is larger than the
+     baseline by more than the threshold.
+    Args:
+        baseline (dict): Report of run() to compare against.
+        report (dict): Report of run().
+        threshold (float): Allowed relative change. Default to THRESHOLD.
+    Returns:
+        list: (name, metric, baseline, current, ratio, regressed) of each
+            metric of the benchmarks in both reports.
+    """
+    rows = []
+    for name, result in report["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            continue
+        #Speed regresses when it drops, memory when it grows.
+        ratio = old["steps_per_second"]/result["steps_per_second"]
+        rows.append((name, "steps_per_second", old["steps_per_second"],
+            result["steps_per_second"], ratio, ratio > 1 + threshold))
+        if old["peak_memory"] and result["peak_memory"]:
+            ratio = result["peak_memory"]/old["peak_memory"]
+            rows.append((name, "peak_memory", old["peak_memory"],
+                result["peak_memory"], ratio, ratio > 1 + threshold))
+    return rows
+
+def load(path):
+    """Read a report saved with save()."""
+    with open(path) as file:
+        return json.load(file)
+
+def save(report, path):
+    """Write a report as JSON.
+    Args:
+        report (dict): Report of run().
+        path (str): Path of the file.
+    """
+    with open(path + ".tmp", 'w') as file:
+        json.dump(report, file, indent=1)
+    os.replace(path + ".tmp", path)
+    return
+
+def format_result(name, result):
+    """One line of text with the results of a benchmark."""
+    phases = ", ".join(f"{phase} {seconds:.3f} s"
+        for phase, seconds in result["phases"].items())
+    memory = ("" if result["peak_memory"] is None else
+        f", peak {result['peak_memory']/2**20:.1f} MiB")
+    return (f"{name:22}{result['steps_per_second']:12.0f} steps/s in "
+        f"{result['seconds']:.3f} s{memory} ({phases})")
+
+def format_comparison(rows):
+    """Text table of the rows of compare()."""
+    lines = [f"{'benchmark':22}{'metric':18}{'baseline':>14}{'current':>14}"
+        f"{'ratio':>8}"]
+    for name, metric, old, new, ratio, regressed in rows:
+        lines.append(f"{name:22}{metric:18}{old:14.0f}{new:14.0f}"
+            f"{ratio:8.3f}{'  REGRESSION' if regressed else ''}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    """Run the benchmarks from the command line. Without a baseline file
+     the results become the baseline, otherwise they are compared against
+     it and the exit status is 1 on a regression.
+    Args:
+        argv (list): Arguments. Default to sys.argv[1:].
+    Returns:
+        int: Exit status.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the simulator.")
+    parser.add_argument("names", nargs="*", metavar="name",
+        help=f"benchmarks to run, out of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--baseline", default=BASELINE,
+        help=f"baseline file (default {BASELINE})")
+    parser.add_argument("--save", action="store_true",
+        help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+        help=f"allowed relative regression (default {THRESHOLD})")
+    parser.add_argument("--repeat", type=int, default=3,
+        help="timed runs of each benchmark, the fastest counts (default 3)")
+    parser.add_argument("--in-process", action="store_true",
+        help="run in this process, without measuring the peak memory")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark {', '.join(unknown)}")
+
+    report = run(args.names, args.repeat, not args.in_process,
+        log=print)
+    if args.save or not os.path.isfile(args.baseline):
+        if os.path.isfile(args.baseline):
+            #Benchmarks that were not run keep their baseline.
+            baseline = load(args.baseline)
+            baseline["machine"] = report["machine"]
+            baseline["benchmarks"].update(report["benchmarks"])
+            report = baseline
+        save(report, args.baseline)
+        print(f"Baseline saved to {args.baseline}.")
+        return 0
+    baseline = load(args.baseline)
+    if baseline["machine"] != report["machine"]:
+        print("The baseline was measured on a different machine.")
+    rows = compare(baseline, report, args.threshold)
+    print(format_comparison(rows))
+    return 1 if any(row[-1] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+import numpy as np
+import events
+from store import CHANNELS
+import sweep
+from trajectory import Trajectory
+
+PATH = ".simcache"
+BUDGET = 2**30 #Size of the cache (bytes).
+#Modules of the simulator. A change to the source of any of them is a new
+#version, and the flights cached before are no longer found.
+SOURCES = ("launchsim", "TVC", "atmosphere", "integrators", "motor", "wind",
+    "events", "profiling", "sweep", "trajectory")
+
+@lru_cache(maxsize=None)
+def version():
+    """Hash of the source of the SOURCES modules."""
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCES:
+        with open(os.path.join(directory, name + ".py"), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def canonical(value):
+    """A JSON compatible form of an input in which equal inputs are equal:
+     keys sorted, integers as floats, touples as lists, arrays by their
+     content and other objects, like Motor and Wind, by their attributes.
+    Args:
+        value: The input.
+    Returns:
+        The canonical form.
+    """
+    if isinstance(value, dict):
+        return [[str(key), canonical(value[key])] for key in sorted(value)]
+    if isinstance(value, (list, tuple)):
+        return [canonical(x) for x in value]
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        return {"dtype":value.dtype.str, "shape":list(value.shape),
+            "data":hashlib.sha256(value.tobytes()).hexdigest()}
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if hasattr(value, "__dict__"):
+        return {"class":type(value).__qualname__,
+            "attributes":canonical(vars(value))}
+    raise TypeError(f"Can not hash {type(value).__name__}.")
+
+class Cache():
+    def __init__(self, path=PATH, budget=BUDGET):
+        """Initialize class. Flights stored on disk by the hash of everything
+         that determines them: the scenario, the terminal event, the kernel
+         and the version of the simulator. Each flight is one uncompressed
+         .npz file with its channels and events. When the files exceed the
+         budget, the least recently used are removed. The time of last use is
+         the modification time of the file, so processes can share a cache.
+        Args:
+            path (str): Directory of the cache. Default to PATH.
+            budget (int): Size of the cache (bytes). Default to BUDGET.
+        """
+        self.path = path
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        return
+
+    def key(self, scenario, terminal=None, kernel="numpy"):
+        """Key of a flight.
+        Args:
+            scenario (dict): See sweep.build().
+            terminal (str): See sweep.run(). Default to None.
+            kernel (str): See sweep.run(). Default to 'numpy'.
+        Returns:
+            str: The key, a hexadecimal SHA-256.
+        """
+        text = json.dumps([canonical(scenario), terminal, kernel, version()],
+            separators=(",", ":"))
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key, inputs=None):
+        """A cached flight, marked as used.
+        Args:
+            key (str): Key of the flight, see key().
+            inputs (dict): Input of the flight, for the Trajectory. Default
+                to None.
+        Returns:
+            Trajectory: The flight, or None if it is not cached.
+        """
+        path = self._file(key)
+        try:
+            with np.load(path) as data:
+                channels = [data[name] for name in CHANNELS]
+                found = {str(name):events.Event(str(name), float(t), r, v)
+                    for name, t, r, v in zip(data["event_names"],
+                    data["event_t"], data["event_r"], data["event_v"])}
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return Trajectory(*channels, inputs=inputs,
+            summary=events.Summary(found))
+
+    def put(self, key, flight):
+        """Store a flight and evict flights beyond the budget.
+        Args:
+            key (str): Key of the flight, see key().
+            flight (Trajectory): The flight, or a launched Rocket.
+        """
+        if not isinstance(flight, Trajectory):
+            flight = Trajectory.from_rocket(flight)
+        found = {} if flight.summary is None else flight.summary.events
+        path = self._file(key)
+        with open(path + ".tmp", 'wb') as file:
+            np.savez(file, **{name:np.asarray(getattr(flight, name),
+                dtype=np.float64) for name in CHANNELS},
+                event_names=np.array(list(found), dtype=str),
+                event_t=np.array([event.t for event in found.values()],
+                dtype=np.float64),
+                event_r=np.array([event.r for event in found.values()],
+                dtype=np.float64).reshape(-1, 5),
+                event_v=np.array([event.v for event in found.values()],
+                dtype=np.float64).reshape(-1, 5))
+        os.replace(path + ".tmp", path)
+        self.evict()
+        return
+
+    def run(self, scenario, terminal=None, kernel="numpy"):
+        """sweep.run() through the cache.
+        Args:
+            scenario (dict): See sweep.build().
+            terminal (str): See sweep.run(). Default to None.
+            kernel (str): See sweep.run(). Default to 'numpy'.
+        Returns:
+            Trajectory: The flight.
+        """
+        key = self.key(scenario, terminal, kernel)
+        flight = self.get(key, scenario)
+        if flight is None:
+            flight = sweep.run(scenario, terminal, kernel)
+            self.put(key, flight)
+        return flight
+
+    def entries(self):
+        """Cached files as (last use (ns), size (bytes), path), least recently
+         used first."""
+        found = []
+        with os.scandir(self.path) as scan:
+            for entry in scan:
+                if entry.name.endswith(".npz"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return sorted(found)
+
+    def size(self):
+        """Size of the cached files (bytes)."""
+        return sum(size for _, size, _ in self.entries())
+
+    def __len__(self):
+        return len(self.entries())
+
+    def evict(self):
+        """Remove the least recently used flights until the cache fits the
+         budget."""
+        found = self.entries()
+        total = sum(size for _, size, _ in found)
+        for _, size, path in found:
+            if total <= self.budget:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return
+
+    def clear(self):
+        """Remove all cached flights."""
+        for _, _, path in self.entries():
+            os.remove(path)
+        return
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".npz")
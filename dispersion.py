@@ -0,0 +1,368 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import events
+from ensemble import Rocket_Ensemble, Rocket_TVC_Ensemble
+from metrics import INPUTS, LAUNCH_ANG
+
+#Metrics each flight is reduced to: apogee altitude (m) and time (s),
+#landing point (m [East, North]), flight time (s) and top speed (m/s). The
+#landing point and flight time are taken at the end of the simulation for a
+#flight that does not land before tmax.
+METRICS = ("apogee", "apogee_time", "landing_east", "landing_north",
+    "flight_time", "max_speed")
+QUANTILES = (0.05, 0.5, 0.95)
+#Uncertainty of the input around the nominal value: ('normal', sigma) adds a
+#normal deviation, ('relative', sigma) scales by 1 plus a normal deviation
+#and ('uniform', width) adds a uniform deviation within +-width. The launch
+#angle is given as 'elevation' and 'azimuth' (deg).
+SPREAD = {"wind_speed":("normal", 1.0), "wind_ang":("uniform", 20),
+    "thrustforce":("relative", 0.02), "cd":("relative", 0.05),
+    "cl":("relative", 0.1), "dry_mass":("relative", 0.01),
+    "wet_mass":("relative", 0.01), "elevation":("normal", 0.5),
+    "azimuth":("normal", 1.0)}
+#The 8 m/s headwind case of metrics.py.
+NOMINAL = dict(INPUTS, launch_ang=LAUNCH_ANG, wind_speed=8, wind_ang=90)
+#Inputs that may be negative, all others are clipped at zero.
+ANGLES = ("wind_ang", "elevation", "azimuth")
+
+def sample(nominal, spread, rng, size):
+    """Draw scenarios around a nominal scenario. The inputs are drawn in the
+     order of sorted names, so the same generator gives the same scenarios.
+    Args:
+        nominal (dict): Nominal scenario, see sweep.build().
+        spread (dict): Uncertainty by input, see SPREAD.
+        rng (np.random.Generator): Random numbers.
+        size (int): Number of scenarios.
+    Returns:
+        list: The scenarios.
+    """
+    values = {}
+    elevation, azimuth = nominal["launch_ang"]
+    center = dict(nominal, elevation=elevation, azimuth=azimuth)
+    for name in sorted(spread):
+        kind, width = spread[name]
+        if kind == "normal":
+            x = center[name] + width*rng.standard_normal(size)
+        elif kind == "relative":
+            x = center[name]*(1 + width*rng.standard_normal(size))
+        elif kind == "uniform":
+            x = center[name] + width*rng.uniform(-1, 1, size)
+        else:
+            raise ValueError(f"Unknown distribution '{kind}'.")
+        values[name] = x if name in ANGLES else np.maximum(x, 0)
+    scenarios = []
+    for j in range(size):
+        scenario = dict(center)
+        scenario.update({name:float(x[j]) for name, x in values.items()})
+        scenario["launch_ang"] = (scenario.pop("elevation"),
+            scenario.pop("azimuth"))
+        scenarios.append(scenario)
+    return scenarios
+
+def reduce(flight):
+    """Reduce a flight to METRICS.
+    Args:
+        flight (Trajectory): The flight.
+    Returns:
+        np.array: Value of each of METRICS.
+    """
+    g = -flight.v[:, 2]
+    j = events.first_crossing(g)
+    if j is None:
+        j = np.argmax(flight.r[:, 2])
+        apogee = events.Event("apogee", flight.t[j], flight.r[j], flight.v[j])
+    else:
+        apogee = events.locate("apogee", flight.t, flight.r, flight.v, g, j)
+    g = -flight.r[:, 2]
+    j = events.first_crossing(g)
+    if j is None:
+        touchdown = events.Event("touchdown", flight.t[-1], flight.r[-1],
+            flight.v[-1])
+    else:
+        touchdown = events.locate("touchdown", flight.t, flight.r, flight.v,
+            g, j)
+    speed = np.sqrt(np.max(np.einsum('ij,ij->i', flight.v[:, :3],
+        flight.v[:, :3])))
+    return np.array((apogee.r[2], apogee.t, touchdown.r[0], touchdown.r[1],
+        touchdown.t, speed))
+
+def run_chunk(index, nominal, spread, seed, size):
+    """Simulate one chunk of a campaign as an ensemble and reduce it. The
+     random numbers of chunk i come from its own stream, spawned from the
+     seed with key i, so a chunk gives the same result on any worker.
+    Args:
+        index (int): Index of the chunk.
+        nominal (dict): Nominal scenario, with PID gains for TVC.
+        spread (dict): Uncertainty by input, see SPREAD.
+        seed (int): Seed of the campaign.
+        size (int): Number of flights.
+    Returns:
+        np.array: METRICS of each flight, shape (size, len(METRICS)).
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed,
+        spawn_key=(index,)))
+    scenarios = sample(nominal, spread, rng, size)
+    if "kp" in nominal:
+        ensemble = Rocket_TVC_Ensemble.from_scenarios(scenarios)
+    else:
+        ensemble = Rocket_Ensemble.from_scenarios(scenarios)
+    ensemble.launch()
+    return np.array([reduce(ensemble.member(i)) for i in range(size)])
+
+class P2():
+    def __init__(self, probabilities, k):
+        """Initialize class. The P^2 algorithm of Jain and Chlamtac, which
+         estimates quantiles of a stream from five markers each, without
+         storing the values. Estimates every probability for k variables at
+         once.
+        Args:
+            probabilities (list): Probabilities of the quantiles.
+            k (int): Number of variables.
+        """
+        p = np.repeat(np.asarray(probabilities, dtype=np.float64)[None, :],
+            k, axis=0).ravel()
+        self.probabilities = tuple(probabilities)
+        self.k = k
+        self.count = 0
+        #Heights and positions of the markers, one row per estimate.
+        self._q = np.zeros((len(p), 5))
+        self._n = np.tile(np.arange(1.0, 6.0), (len(p), 1))
+        self._desired = np.stack((np.ones_like(p), 1 + 2*p, 1 + 4*p, 3 + 2*p,
+            5*np.ones_like(p)), axis=1)
+        self._increment = np.stack((np.zeros_like(p), p/2, p, (1 + p)/2,
+            np.ones_like(p)), axis=1)
+        return
+
+    def add(self, x):
+        """Add one value of each variable.
+        Args:
+            x (np.array): The values, shape (k,).
+        """
+        x = np.repeat(x, len(self.probabilities))
+        if self.count < 5:
+            self._q[:, self.count] = x
+            self.count += 1
+            if self.count == 5:
+                self._q.sort(axis=1)
+            return
+        self.count += 1
+        q, n = self._q, self._n
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        cell = np.sum(x[:, None] >= q[:, 1:4], axis=1)
+        n += np.arange(5)[None, :] > cell[:, None]
+        self._desired += self._increment
+        rows = np.arange(len(q))
+        for i in (1, 2, 3):
+            d = self._desired[:, i] - n[:, i]
+            s = np.where((d >= 1) & (n[:, i+1] - n[:, i] > 1), 1,
+                np.where((d <= -1) & (n[:, i-1] - n[:, i] < -1), -1, 0))
+            if not s.any():
+                continue
+            parabolic = q[:, i] + s/(n[:, i+1] - n[:, i-1])*(
+                (n[:, i] - n[:, i-1] + s)*(q[:, i+1] - q[:, i])
+                /(n[:, i+1] - n[:, i])
+                + (n[:, i+1] - n[:, i] - s)*(q[:, i] - q[:, i-1])
+                /(n[:, i] - n[:, i-1]))
+            neighbour = i + np.where(s < 0, -1, 1)
+            linear = q[:, i] + s*(q[rows, neighbour] - q[:, i])/(
+                n[rows, neighbour] - n[:, i])
+            height = np.where((q[:, i-1] < parabolic) & (parabolic < q[:, i+1]),
+                parabolic, linear)
+            q[:, i] = np.where(s != 0, height, q[:, i])
+            n[:, i] += s
+        return
+
+    def estimate(self):
+        """The quantiles, shape (k, len(probabilities))."""
+        if self.count < 5:
+            values = self._q[::len(self.probabilities), :self.count]
+            return np.quantile(values, self.probabilities, axis=1).T
+        return self._q[:, 2].reshape(self.k, len(self.probabilities))
+
+    def state(self):
+        """Everything needed to continue the estimate, as lists."""
+        return {"probabilities":list(self.probabilities), "k":self.k,
+            "count":self.count, "q":self._q.tolist(), "n":self._n.tolist(),
+            "desired":self._desired.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        """Inverse of state()."""
+        p2 = cls(state["probabilities"], state["k"])
+        p2.count = state["count"]
+        p2._q = np.array(state["q"])
+        p2._n = np.array(state["n"])
+        p2._desired = np.array(state["desired"])
+        return p2
+
+class Campaign():
+    def __init__(self, nominal=None, spread=None, seed=0, chunk=32,
+                 quantiles=QUANTILES):
+        """Initialize class. A Monte Carlo dispersion campaign. Flights are
+         simulated in chunks, each chunk as one ensemble with its own random
+         stream, and reduced to METRICS right away. Only running statistics
+         are kept: the mean and the covariance of the metrics and P^2
+         estimates of their quantiles.
+        Args:
+            nominal (dict): Nominal scenario, see sweep.build(). Default to
+                NOMINAL.
+            spread (dict): Uncertainty by input, see SPREAD. Default to
+                SPREAD.
+            seed (int): Seed of the campaign. Default to 0.
+            chunk (int): Number of flights per chunk. Default to 32.
+            quantiles (list): Probabilities of the estimated quantiles.
+                Default to QUANTILES.
+        """
+        self.nominal = dict(NOMINAL if nominal is None else nominal)
+        self.spread = dict(SPREAD if spread is None else spread)
+        self.seed = seed
+        self.chunk = chunk
+        self.chunks = 0
+        self.count = 0
+        self._mean = np.zeros(len(METRICS))
+        #Sum of the outer products of the deviations from the mean.
+        self._comoment = np.zeros((len(METRICS), len(METRICS)))
+        self._quantiles = P2(quantiles, len(METRICS))
+        return
+
+    def run(self, samples, max_workers=None, checkpoint=None):
+        """Extend the campaign by at least the given number of flights,
+         rounded up to whole chunks. The result only depends on the seed and
+         the total number of chunks, not on the number of workers or on how
+         the campaign was split up.
+        Args:
+            samples (int): Number of flights to add.
+            max_workers (int): Number of processes. Default to the number of
+                cores. With 1 the chunks are run in this process.
+            checkpoint (str): Path to save the campaign to after every chunk.
+                Default to None.
+        """
+        indices = range(self.chunks, self.chunks - (-samples//self.chunk))
+        task = partial(run_chunk, nominal=self.nominal, spread=self.spread,
+            seed=self.seed, size=self.chunk)
+        if max_workers == 1:
+            results = map(task, indices)
+            self._collect(results, checkpoint)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                self._collect(executor.map(task, indices), checkpoint)
+        return
+
+    def _collect(self, results, checkpoint):
+        """Merge the metrics of chunks into the statistics, in chunk order."""
+        for metrics in results:
+            self.add(metrics)
+            self.chunks += 1
+            if checkpoint is not None:
+                self.save(checkpoint)
+        return
+
+    def add(self, metrics):
+        """Merge the metrics of a batch of flights into the statistics.
+        Args:
+            metrics (np.array): METRICS of each flight, shape
+                (flights, len(METRICS)).
+        """
+        count = len(metrics)
+        mean = metrics.mean(axis=0)
+        deviation = metrics - mean
+        delta = mean - self._mean
+        total = self.count + count
+        self._mean = self._mean + delta*count/total
+        self._comoment += (deviation.T @ deviation
+            + np.outer(delta, delta)*self.count*count/total)
+        self.count = total
+        for row in metrics:
+            self._quantiles.add(row)
+        return
+
+    @property
+    def mean(self):
+        """dict: Mean of each of METRICS."""
+        return dict(zip(METRICS, self._mean))
+
+    @property
+    def covariance(self):
+        """np.array: Sample covariance of METRICS."""
+        return self._comoment/max(self.count - 1, 1)
+
+    @property
+    def std(self):
+        """dict: Sample standard deviation of each of METRICS."""
+        return dict(zip(METRICS, np.sqrt(np.diag(self.covariance))))
+
+    @property
+    def quantiles(self):
+        """dict: Estimated quantiles of each of METRICS, by probability."""
+        estimate = self._quantiles.estimate()
+        return {name:dict(zip(self._quantiles.probabilities, row))
+            for name, row in zip(METRICS, estimate)}
+
+    def ellipse(self, probability=0.95):
+        """Landing ellipse, assuming normally distributed landing points.
+        Args:
+            probability (float): Probability of landing inside. Default to
+                0.95.
+        Returns:
+            np.array: Center (m [East, North]).
+            np.array: Semi-axes, major first (m).
+            float: Angle of the major axis from East towards North (deg).
+        """
+        j = [METRICS.index("landing_east"), METRICS.index("landing_north")]
+        values, vectors = np.linalg.eigh(self.covariance[np.ix_(j, j)])
+        scale = np.sqrt(-2*np.log(1 - probability))
+        major = vectors[:, 1]
+        return (self._mean[j], scale*np.sqrt(np.maximum(values[::-1], 0)),
+            np.degrees(np.arctan2(major[1], major[0])))
+
+    def save(self, path):
+        """Save the campaign as JSON, so it can be extended later."""
+        state = {"nominal":self.nominal, "spread":self.spread,
+            "seed":self.seed, "chunk":self.chunk, "chunks":self.chunks,
+            "count":self.count, "mean":self._mean.tolist(),
+            "comoment":self._comoment.tolist(),
+            "quantiles":self._quantiles.state()}
+        with open(path + ".tmp", 'w') as file:
+            json.dump(state, file)
+        os.replace(path + ".tmp", path)
+        return
+
+    @classmethod
+    def load(cls, path):
+        """Load a campaign saved with save().
+        Args:
+            path (str): Path of the file.
+        Returns:
+            Campaign: The campaign.
+        """
+        with open(path) as file:
+            state = json.load(file)
+        nominal = dict(state["nominal"])
+        nominal["launch_ang"] = tuple(nominal["launch_ang"])
+        campaign = cls(nominal, {name:tuple(value)
+            for name, value in state["spread"].items()}, state["seed"],
+            state["chunk"])
+        campaign.chunks = state["chunks"]
+        campaign.count = state["count"]
+        campaign._mean = np.array(state["mean"])
+        campaign._comoment = np.array(state["comoment"])
+        campaign._quantiles = P2.from_state(state["quantiles"])
+        return campaign
+
+if __name__ == "__main__":
+    path = "dispersion.json"
+    campaign = Campaign.load(path) if os.path.isfile(path) else Campaign()
+    campaign.run(256, checkpoint=path)
+    print(f"{campaign.count} flights")
+    for name in METRICS:
+        quantiles = ", ".join(f"P{100*p:g} {value:.1f}"
+            for p, value in campaign.quantiles[name].items())
+        print(f"{name:14}mean {campaign.mean[name]:9.1f}, "
+            f"std {campaign.std[name]:7.1f}, {quantiles}")
+    center, axes, angle = campaign.ellipse()
+    print(f"95% landing ellipse at {np.round(center, 1)} m, semi-axes "
+        f"{np.round(axes, 1)} m, major axis at {angle:.1f} deg")
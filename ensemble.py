@@ -0,0 +1,513 @@
+import numpy as np
+import atmosphere
+from wind import Field
+from trajectory import Trajectory
+
+def _cross(a, b):
+    """Row wise cross product of two (N, 3) arrays, without the overhead of
+     np.cross."""
+    return np.stack((a[:, 1]*b[:, 2] - a[:, 2]*b[:, 1],
+        a[:, 2]*b[:, 0] - a[:, 0]*b[:, 2], a[:, 0]*b[:, 1] - a[:, 1]*b[:, 0]),
+        axis=1)
+
+class Rocket_Ensemble():
+    def __init__(self, launch_ang, tmax, wind_speed, wind_ang, dry_mass,
+                 wet_mass, length, cd, cl, critical_angle, hcm, hcp, radius,
+                 thrustforce, burntime, dt=0.01, rail_length=5.0,
+                 atmosphere_table=False, motor=None, wind=None):
+        """Initialize class. Simulates N rockets at once, where every
+         argument except tmax and dt may be given per member. The model is
+         the same as in launchsim.Rocket.
+        Args:
+            launch_ang (touple): Launch angle (deg [elevation, azimuth]),
+                shape (2,) or (N, 2).
+            tmax (int): Length of simulation (s).
+            wind_speed (float or np.array): Wind speed (m/s).
+            wind_ang (float or np.array): Wind direction (deg).
+            dry_mass (float or np.array): Dry mass (kg).
+            wet_mass (float or np.array): Wet mass (kg).
+            length (float or np.array): Length of the rocket (mm).
+            cd (float or np.array): Drag coefficient.
+            cl (float or np.array): Lift coefficient.
+            critical_angle (float or np.array): Critical angle of attack (deg).
+            hcm (float or np.array): Height of the centre of mass (mm).
+            hcp (float or np.array): Height of the centre of pressure (mm).
+            radius (float or np.array): Radius of nose cone (mm).
+            thrustforce (float or np.array): Force of thrust (N).
+            burntime (float or np.array): Burntime (s).
+            dt (float): Time step (s). Default to 0.01.
+            rail_length (float or np.array): Lenght of launch rail (m).
+                Default to 5.0.
+            atmosphere_table (bool): Look the air density up in the shared
+                atmosphere.table(). Default to False.
+            motor (Motor): Thrust curve shared by all members, replacing
+                thrustforce and burntime. Default to None.
+            wind (Wind or list): Wind depending on altitude and time, shared
+                by all members or one per member, replacing wind_speed and
+                wind_ang. Default to None.
+        """
+        launch_ang = np.asarray(launch_ang, dtype=np.float64)
+        (elevation, azimuth, wind_speed, wind_ang, dry_mass, wet_mass, length,
+            cd, cl, critical_angle, hcm, hcp, radius, thrustforce, burntime,
+            rail_length) = np.broadcast_arrays(*[np.atleast_1d(
+            np.asarray(x, dtype=np.float64)) for x in (launch_ang[..., 0],
+            launch_ang[..., 1], wind_speed, wind_ang, dry_mass, wet_mass,
+            length, cd, cl, critical_angle, hcm, hcp, radius, thrustforce,
+            burntime, rail_length)])
+        self.n = len(elevation)
+        steps = tmax*int(1/dt)+1
+
+        self._dt = dt
+        self._i = 0
+        self.t = np.linspace(0, tmax, steps)
+        self.r, self.v, self.a = np.zeros((3, self.n, steps, 5))
+
+        #Set initial launch angle in Euler angles pitch and yaw.
+        self.r[:, 0, 3] = -((np.pi/2)-elevation*np.pi/180)*np.cos(
+            azimuth*np.pi/180)
+        self.r[:, 0, 4] = ((np.pi/2)-elevation*np.pi/180)*np.sin(
+            azimuth*np.pi/180)
+        self.r[:, 0, 3:][abs(self.r[:, 0, 3:]) < 10E-14] = 0
+
+        self._rodlenght = rail_length
+        self._burntime = burntime
+        self._thrustforce = thrustforce
+        self._mt = wet_mass
+        self._mf = wet_mass-dry_mass
+        self._cd = cd
+        self._cl = cl
+        self._hcm = hcm/1000
+        self._hcp = hcp/1000
+        self._wind = -wind_speed[:, None]*np.stack((np.sin(wind_ang*np.pi/180),
+            np.cos(wind_ang*np.pi/180), np.zeros(self.n)), axis=1)
+        self._side_area = (length/1000)*(radius/1000)*2
+        self._front_area = np.pi*((radius/1000)**2)
+        self._critical_angle = critical_angle*np.pi/180
+        self._radius = radius/1000
+        self._length = length/1000
+
+        #Histories, one row per member and time step.
+        self._m = np.zeros((self.n, steps))
+        self._m[:, 0] = wet_mass
+        self._rho = np.zeros((self.n, steps))
+        self.angle_attack, self.fthrust, self.fdrag, self.flift = np.zeros(
+            (4, self.n, steps, 3))
+
+        self._g = atmosphere.G #Gravitational constant (m/s^2).
+        self._rho[:, 0] = 1.225 #Air density (kg/m^3).
+        #Air density (kg/m^3) as a function of altitude (m).
+        self._density = (atmosphere.table().density_at if atmosphere_table
+            else atmosphere.density)
+        #Thrust (N) and fraction of the propellant burned at every time step,
+        #evaluated on the whole time grid at once.
+        self._motor = motor
+        if motor is not None:
+            self._burntime = np.full(self.n, motor.burntime)
+            self._curve = (motor.thrust(self.t), motor.burned(self.t))
+        #Winds of all members stacked, looked up for all at once.
+        self._field = None
+        if wind is not None:
+            self._field = Field(list(wind) if isinstance(wind, (list, tuple))
+                else [wind])
+        #Velocity of the air at the current state of each member.
+        self._air = self.air_velocity(0.0, self.r[:, 0, 2])
+        return
+
+    @classmethod
+    def from_scenarios(cls, scenarios, **kwargs):
+        """Build an ensemble from a list of keyword dictionaries, one per
+         member, as they would be given to the scalar class.
+        Args:
+            scenarios (list): Keyword arguments for each member. 'tmax', 'dt'
+                and 'rate' must be the same for all members.
+            **kwargs: Further input for the class, shared by all members.
+        Returns:
+            Rocket_Ensemble: The ensemble, member i built from scenarios[i].
+        """
+        args = {}
+        for key in scenarios[0]:
+            values = [scenario[key] for scenario in scenarios]
+            if key == "wind":
+                args[key] = values
+            elif key in ("tmax", "dt", "rate"):
+                if any(value != values[0] for value in values):
+                    raise ValueError(f"'{key}' must be shared by all members.")
+                args[key] = values[0]
+            else:
+                args[key] = np.array(values, dtype=np.float64)
+        args.update(kwargs)
+        return cls(**args)
+
+    def __len__(self):
+        return self.n
+
+    def member(self, i):
+        """The flight of a single member.
+        Args:
+            i (int): Index of the member.
+        Returns:
+            Trajectory: Views into the ensemble histories of member i.
+        """
+        return Trajectory(self.t, self.r[i], self.v[i], self.a[i], self._m[i],
+            self._rho[i], self.angle_attack[i], self.fthrust[i], self.fdrag[i],
+            self.flift[i])
+
+    def rotation(self, rot):
+        """Rotation matrices of all members.
+        Args:
+            rot (np.array): Rotations (pitch, yaw), shape (N, 2).
+        Returns:
+            np.array: Rotation matrices, shape (N, 3, 3).
+        """
+        cp, sp = np.cos(rot[:, 0]), np.sin(rot[:, 0])
+        cy, sy = np.cos(rot[:, 1]), np.sin(rot[:, 1])
+        rotation = np.empty((len(rot), 3, 3))
+        rotation[:, 0, 0] = cy
+        rotation[:, 0, 1] = sy*sp
+        rotation[:, 0, 2] = sy*cp
+        rotation[:, 1, 0] = 0
+        rotation[:, 1, 1] = cp
+        rotation[:, 1, 2] = -sp
+        rotation[:, 2, 0] = -sy
+        rotation[:, 2, 1] = cy*sp
+        rotation[:, 2, 2] = cy*cp
+        return rotation
+
+    def rotate(self, rot, vector, inverse=False):
+        """
+        Rotate the vectors of all members counter clockwise by their x- and
+        y-axis.
+
+        Args:
+            rot (np.array): Rotations (pitch, yaw), shape (N, 2).
+            vector (np.array): Input vectors (East, North, Altitude), shape
+                (N, 3).
+            inverse (bool): Invert the rotation if 'True'. Default 'False'.
+        Returns:
+            np.array: Rotated output vectors, shape (N, 3).
+        """
+        if inverse:
+            return np.einsum('nji,nj->ni', self.rotation(rot), vector)
+        return np.einsum('nij,nj->ni', self.rotation(rot), vector)
+
+    def _on_rail(self, r):
+        return np.sqrt(np.einsum('ni,ni->n', r, r)) < self._rodlenght
+
+    def air_velocity(self, t, h):
+        """Velocity of the air, the wind, of all members.
+        Args:
+            t (float): Time since initialization (s).
+            h (np.array): Altitudes (m), shape (N,).
+        Returns:
+            np.array: The velocity, shape (N, 3).
+        """
+        if self._field is None:
+            return self._wind
+        return np.broadcast_to(self._field.velocity(t, h), (self.n, 3))
+
+    def thrust_force(self):
+        """Magnitude of the thrust (N) of all members during the burn, at the
+         current time step."""
+        if self._motor is None:
+            return self._thrustforce
+        return np.full(self.n, self._curve[0][self._i])
+
+    def update(self, t, r, v):
+        """Update mass (kg) as a function of time (s), air density (kg/m^3) as a
+        function of height (m) and calculate the angle of attack (rad) for all
+        members.
+        Args:
+            t (float): Time since initialization in seconds.
+            r (np.array): Positional vectors, shape (N, 5).
+            v (np.array): Velocity vectors, shape (N, 5).
+        """
+        i = self._i + 1
+        if self._motor is None:
+            self._m[:, i] = np.where(t >= self._burntime, self._mt - self._mf,
+                self._mt - (self._mf*t/self._burntime))
+        else:
+            self._m[:, i] = self._mt - self._mf*self._curve[1][self._i]
+
+        self._rho[:, i] = self._density(r[:, 2])
+
+        self._air = self.air_velocity(t, r[:, 2])
+        rel_v = v[:, :3] - self._air
+        speed2 = np.einsum('ni,ni->n', rel_v, rel_v)
+        moving = abs(speed2) > 0
+        motion_theta = np.where(moving, np.arccos(rel_v[:, 2]/np.sqrt(
+            np.where(moving, speed2, 1))), 0)
+        rocket_theta = np.arccos(np.cos(r[:, 3])*np.cos(r[:, 4]))
+        self.angle_attack[:, i, 0] = motion_theta
+        self.angle_attack[:, i, 1] = rocket_theta
+        self.angle_attack[:, i, 2] = motion_theta - rocket_theta
+        return
+
+    def weight(self, r, rotation=None):
+        """Weight of all members, pointing from the centre of mass towards
+         negative z in the main coordinate system.
+        Args:
+            r (np.array): Positional vectors, shape (N, 5).
+            rotation (np.array): Rotation matrices of r, if already known.
+        Returns:
+            np.array: Force from weight, shape (N, 5).
+        """
+        if rotation is None:
+            rotation = self.rotation(r[:, 3:])
+        f_weight = np.zeros((self.n, 5))
+        f_weight[:, 2] = -self._g*self._m[:, self._i]
+        rail = self._on_rail(r)
+        if rail.any():
+            f_weight[rail, :3] = (rotation[rail, 2, 2]*f_weight[rail, 2])[
+                :, None]*rotation[rail, :, 2]
+        return f_weight
+
+    def thrust(self, t, r, rotation=None):
+        """Thrust of all members, pointing from the back of the rocket towards
+         positive z in the local reference frame, converted into the global
+         reference frame.
+        Args:
+            t (float): Time since initialization in seconds.
+            r (np.array): Positional vectors, shape (N, 5).
+            rotation (np.array): Rotation matrices of r, if already known.
+        Returns:
+            np.array: Force from thrust, shape (N, 5).
+        """
+        if rotation is None:
+            rotation = self.rotation(r[:, 3:])
+        f_thrust = np.zeros((self.n, 5))
+        burning = t < self._burntime
+        if burning.any():
+            f_thrust[burning, :3] = self.thrust_force()[burning, None]*(
+                rotation[burning, :, 2])
+        return f_thrust
+
+    def drag(self, r, v):
+        """Drag of all members, pointing from the centre of pressure opposite
+         the direction of motion in a global reference frame.
+        Args:
+            r (np.array): Positional vectors, shape (N, 5).
+            v (np.array): Velocity vectors, shape (N, 5).
+        Returns:
+            np.array: Force from drag, shape (N, 5).
+        """
+        rel_v = v[:, :3] - self._air
+        f_drag = np.zeros((self.n, 5))
+        f_drag[:, :3] = (-0.5*self._cd*self._front_area*self._rho[:, self._i])[
+            :, None]*rel_v*abs(rel_v)
+        return f_drag
+
+    def lift(self, r, v, rotation=None):
+        """Lift of all members, pointing from the centre of pressure
+         perpendicular to the direction of motion in a global reference frame.
+        Args:
+            r (np.array): Positional vectors, shape (N, 5).
+            v (np.array): Velocity vectors, shape (N, 5).
+            rotation (np.array): Rotation matrices of r, if already known.
+        Returns:
+            np.array: Force from lift, shape (N, 5).
+        """
+        if rotation is None:
+            rotation = self.rotation(r[:, 3:])
+        rel_v = v[:, :3] - self._air
+        orientation = rotation[:, :, 2]
+        dir_lift = _cross(rel_v, _cross(orientation, rel_v))
+
+        attack = abs(self.angle_attack[:, self._i, 2])
+        cl = np.where(attack < self._critical_angle, self._cl*abs(1 - (abs(
+            attack - self._critical_angle)/self._critical_angle)), 0)
+
+        lift = (0.5*cl*self._side_area*self._rho[:, self._i])[:, None]*rel_v**2
+        mag_lift = np.sqrt(np.einsum('ni,ni->n', lift, lift))
+
+        #dir_lift is zero wherever its norm is, giving zero lift there.
+        norm = np.einsum('ni,ni->n', dir_lift, dir_lift)
+        g_lift = mag_lift[:, None]*dir_lift/np.sqrt(np.where(norm != 0, norm,
+            1))[:, None]
+
+        #Convert the vector to the local reference frame.
+        l_lift = np.einsum('nji,nj->ni', rotation, g_lift)
+
+        f_lift = np.zeros((self.n, 5))
+        f_lift[:, :3] = g_lift
+        f_lift[:, 3] = -l_lift[:, 1]*(self._hcp-self._hcm)
+        f_lift[:, 4] = l_lift[:, 0]*(self._hcp-self._hcm)
+        rail = self._on_rail(r)
+        if rail.any():
+            f_lift[rail, :3] = l_lift[rail, 2, None]*rotation[rail, :, 2]
+            f_lift[rail, 3:] = 0
+        return f_lift
+
+    def acceleration(self, t, r, v):
+        """Calculate the acceleration of all members using Newtons 2. law.
+        Args:
+            t (float): Time since initialization in seconds.
+            r (np.array): Positional vectors, shape (N, 5).
+            v (np.array): Velocity vectors, shape (N, 5).
+        Returns:
+            np.array: New acceleration vectors, shape (N, 5).
+        """
+        rotation = self.rotation(r[:, 3:])
+        f_thrust = self.thrust(t, r, rotation)
+        f_drag = self.drag(r, v)
+        f_weight = self.weight(r, rotation)
+        f_lift = self.lift(r, v, rotation)
+        m = self._m[:, self._i, None]
+        acc = np.empty((self.n, 5))
+        acc[:, :3] = (f_thrust[:, :3] + f_drag[:, :3] + f_lift[:, :3] +
+            f_weight[:, :3])/m
+        acc[:, 3:] = (f_thrust[:, 3:] + f_lift[:, 3:])/(m*(
+            3*self._radius[:, None]**2+self._length[:, None]**2)/12)
+        ang_acc = acc[:, 3:]
+        ang_acc[abs(ang_acc) < 10E-14] = 0
+        self.fthrust[:, self._i+1] = f_thrust[:, :3]
+        self.fdrag[:, self._i+1] = f_drag[:, :3]
+        self.flift[:, self._i+1] = f_lift[:, :3]
+        return acc
+
+    def launch(self):
+        """Solves the differential equations of all members using the step
+         function."""
+        for i in range(len(self.t)-1):
+            self._i = i
+            self.a[:, i+1] = self.acceleration(self.t[i], self.r[:, i],
+                self.v[:, i])
+            self.r[:, i+1], self.v[:, i+1] = self.step(self.t[i],
+                self.r[:, i], self.v[:, i], self.a[:, i+1])
+        return
+
+    def step(self, t, r, v, a):
+        """A modified Forward Euler step function for all members.
+        Args:
+            t (float): Time since initialization in seconds.
+            r (np.array): Positional vectors, shape (N, 5).
+            v (np.array): Velocity vectors, shape (N, 5).
+            a (np.array): Acceleration vectors, shape (N, 5).
+        Returns:
+            np.array: New positional vectors, shape (N, 5).
+            np.array: New velocity vectors, shape (N, 5).
+         """
+        v_nxt = np.where(r[:, 2, None] >= 0, v + self._dt*a, 0)
+        r_nxt = r + self._dt*v_nxt
+        self.update(t, r_nxt, v_nxt)
+        return r_nxt, v_nxt
+
+class Rocket_TVC_Ensemble(Rocket_Ensemble):
+
+    def __init__(self, kp, ki, kd, launch_ang, max_angle=5, rate=None,
+                 servo_rate=None, servo_lag=None, **kwargs):
+        """Initialize class. N rockets with TVC, as in TVC.Rocket_TVC.
+        Args:
+            kp (float or np.array): proportional coefficient.
+            ki (float or np.array): integral coefficient.
+            kd (float or np.array): derivative coefficient.
+            launch_ang (touple): Launch angle (deg [theta, phi]), shape (2,)
+                or (N, 2).
+            max_angle (float or np.array): Maximum angle of the thrust vector
+                in any direction (deg).
+            rate (float): Sample rate of the controllers (Hz), shared by all
+                members. Default to None, every time step.
+            servo_rate (float or np.array): Maximum rate the thrust vector
+                turns with (deg/s), NaN for no limit. Default to None, no
+                limit.
+            servo_lag (float or np.array): Time constant of the servo (s), NaN
+                for none. Default to None, none.
+            **kwargs: input for super class.
+        """
+        super().__init__(launch_ang, **kwargs)
+        self._kp, self._ki, self._kd, self._max_angle = [np.broadcast_to(
+            np.asarray(x, dtype=np.float64), (self.n,))[:, None] for x in (
+            kp, ki, kd, max_angle)]
+        self._prev_error = np.zeros((self.n, 2))
+        self._total_error = np.zeros((self.n, 2))
+        self._desired_ang = self.r[:, 0, 3:].copy()
+        self._period = None if rate is None else 1/rate
+        self._ts = self._dt if rate is None else self._period
+        if self._period is not None and self._period < self._dt*(1 - 1e-9):
+            raise ValueError("The controller can not run faster than the "
+                "time step.")
+        self._command = np.zeros((self.n, 2))
+        self._samples = 0
+        self._servo = servo_rate is not None or servo_lag is not None
+        servo_rate, servo_lag = [np.broadcast_to(np.asarray(np.nan if x is None
+            else x, dtype=np.float64), (self.n,))[:, None] for x in (
+            servo_rate, servo_lag)]
+        self._lag_gain = np.where(np.isnan(servo_lag), 1.0,
+            1 - np.exp(-self._dt/servo_lag))
+        self._slew = np.where(np.isnan(servo_rate), np.inf,
+            servo_rate*(np.pi/180)*self._dt)
+        self._angle = np.zeros((self.n, 2))
+        return
+
+    def thrust(self, t, r, rotation=None):
+        """Thrust of all members, with an angle depending on the TVC from
+         positive z in the local frame of reference, converted into the
+         global frame of reference.
+        Args:
+            t (float): Time since initialization (s).
+            r (np.array): Positional vectors, shape (N, 5).
+            rotation (np.array): Rotation matrices of r, if already known.
+        Returns:
+            np.array: Force from thrust, shape (N, 5).
+        """
+        if rotation is None:
+            rotation = self.rotation(r[:, 3:])
+        f_thrust = np.zeros((self.n, 5))
+        burning = t < self._burntime
+        if not burning.any():
+            return f_thrust
+        u = self.actuator(t, r, burning)
+        l_thrust = self.thrust_force()[:, None]*self.rotation(u)[:, :, 2]
+        g_thrust = np.einsum('nij,nj->ni', rotation, l_thrust)
+        f_thrust[burning, :3] = g_thrust[burning]
+        f_thrust[burning, 3] = -l_thrust[burning, 1]*self._hcm[burning]
+        f_thrust[burning, 4] = l_thrust[burning, 0]*self._hcm[burning]
+        return f_thrust
+
+    def actuator(self, t, r, active):
+        """Angle of the thrust vectors of all members at a time step, as in
+         TVC.Rocket_TVC.actuator().
+        Args:
+            t (float): Time since initialization (s).
+            r (np.array): Positional vectors, shape (N, 5).
+            active (np.array): Members whose controller and servo are
+                running.
+        Returns:
+            np.array: Angle of thrust vectors (rad [pitch, yaw]), shape (N, 2).
+        """
+        if self._period is None:
+            command = self.pid(r, active)
+        else:
+            if t >= (self._samples - 1e-6)*self._period:
+                self._command = self.pid(r, active)
+                self._samples = int(np.floor(t/self._period + 1e-6)) + 1
+            command = self._command
+        if not self._servo:
+            return command
+        move = np.clip(self._lag_gain*(command - self._angle), -self._slew,
+            self._slew)
+        self._angle[active] += move[active]
+        return self._angle.copy()
+
+    def pid(self, r, active=None):
+        """Calculate the angle of the thrust vector of all members using PID.
+        Args:
+            r (np.array): Positional vectors, shape (N, 5).
+            active (np.array): Members whose controller is running, the state
+                of the others is left untouched. Default to all.
+        Returns:
+            np.array: Angle of thrust vectors (rad [pitch, yaw]), shape (N, 2).
+        """
+        if active is None:
+            active = np.ones(self.n, dtype=bool)
+        error = self._desired_ang - r[:, 3:]
+        total_error = self._total_error + error*self._ts
+        proportional = self._kp*error
+        integral = self._ki*total_error
+        derivative = self._kd*(error - self._prev_error)
+        u = proportional + integral + derivative
+
+        limit = self._max_angle*(np.pi/180)
+        u = np.minimum(np.maximum(u, -limit), limit)
+        self._total_error[active] = total_error[active]
+        self._prev_error[active] = error[active]
+        return u
@@ -0,0 +1,100 @@
+import numpy as np
+
+#Events of a flight, in the order they happen.
+EVENTS = ("rail_exit", "burnout", "apogee", "touchdown")
+
+class Event():
+    def __init__(self, name, t, r, v):
+        """Initialize class.
+        Args:
+            name (str): One of EVENTS.
+            t (float): Time of the event (s).
+            r (np.array): Positional vector at the event
+                (East, North, altitude, pitch, yaw).
+            v (np.array): Velocity vector at the event
+                (East, North, altitude, pitch, yaw).
+        """
+        self.name = name
+        self.t = t
+        self.r = r
+        self.v = v
+        return
+
+    def __repr__(self):
+        return (f"Event({self.name!r}, t={self.t:.3f} s, "
+            f"r={np.round(self.r[:3], 2)})")
+
+class Summary():
+    def __init__(self, events):
+        """Initialize class.
+        Args:
+            events (dict): Event by name.
+        """
+        self.events = events
+        return
+
+    def __getitem__(self, name):
+        return self.events[name]
+
+    def __contains__(self, name):
+        return name in self.events
+
+    def __repr__(self):
+        return "Summary(" + ", ".join(repr(self.events[name])
+            for name in EVENTS if name in self.events) + ")"
+
+    @property
+    def apogee(self):
+        """float: Altitude at apogee (m), or None."""
+        if "apogee" not in self.events:
+            return None
+        return self.events["apogee"].r[2]
+
+    @property
+    def landing(self):
+        """np.array: Position at touchdown (m [East, North]), or None."""
+        if "touchdown" not in self.events:
+            return None
+        return self.events["touchdown"].r[:2]
+
+    @property
+    def flight_time(self):
+        """float: Time of touchdown (s), or None."""
+        if "touchdown" not in self.events:
+            return None
+        return self.events["touchdown"].t
+
+def first_crossing(g):
+    """Index of the first sample at which g crossed from negative to zero or
+     positive.
+    Args:
+        g (np.array): Event function sampled at each time step.
+    Returns:
+        int: The index, or None.
+    """
+    index = np.flatnonzero((g[:-1] < 0) & (g[1:] >= 0))
+    return None if len(index) == 0 else index[0]+1
+
+def locate(name, t, r, v, g, j):
+    """Refine an event between time step j-1 and j. The time is the root of
+     the linear interpolation of the event function, the position is a cubic
+     Hermite interpolation using the velocity and the velocity is linear.
+    Args:
+        name (str): One of EVENTS.
+        t (np.array): Times (s).
+        r (np.array): Positional vectors, shape (len(t), 5).
+        v (np.array): Velocity vectors, shape (len(t), 5).
+        g (np.array): Event function at each time.
+        j (int): First time step after the event.
+    Returns:
+        Event: The event.
+    """
+    theta = g[j-1]/(g[j-1] - g[j])
+    h = t[j] - t[j-1]
+    h00 = 2*theta**3 - 3*theta**2 + 1
+    h10 = theta**3 - 2*theta**2 + theta
+    h01 = -2*theta**3 + 3*theta**2
+    h11 = theta**3 - theta**2
+    r_event = h00*r[j-1] + h10*h*v[j-1] + h01*r[j] + h11*h*v[j]
+    v_event = (1 - theta)*v[j-1] + theta*v[j]
+    return Event(name, t[j-1] + theta*h, r_event, v_event)
@@ -0,0 +1,73 @@
+import numpy as np
+
+#Butcher tableau of the Dormand-Prince 5(4) pair.
+C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+A = [np.array([]), np.array([1/5]), np.array([3/40, 9/40]),
+    np.array([44/45, -56/15, 32/9]),
+    np.array([19372/6561, -25360/2187, 64448/6561, -212/729]),
+    np.array([9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]),
+    np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])]
+B = A[6]
+#Difference between the 5th and the embedded 4th order solution.
+E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+#Coefficients of the 4th order continuous extension.
+P = np.array([
+    [1, -8048581381/2820520608, 8663915743/2820520608,
+        -12715105075/11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200/32700410799, -68118460800/10900136933,
+        87487479700/32700410799],
+    [0, -1754552775/470086768, 14199869525/1410260304,
+        -10690763975/1880347072],
+    [0, 127303824393/49829197408, -318862633887/49829197408,
+        701980252875/199316789632],
+    [0, -282668133/205662961, 2019193451/616988883,
+        -1453857185/822651844],
+    [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+
+def dopri_step(fun, t, y, f, h):
+    """One step of the Dormand-Prince 5(4) method.
+    Args:
+        fun (callable): Right hand side fun(t, y).
+        t (float): Time at the start of the step.
+        y (np.array): State at the start of the step.
+        f (np.array): fun(t, y), reused from the previous step.
+        h (float): Step size.
+    Returns:
+        np.array: State at t + h.
+        np.array: fun(t + h, state at t + h).
+        np.array: All stages, shape (7, len(y)).
+        np.array: Local error estimate.
+    """
+    k = np.empty((7, len(y)))
+    k[0] = f
+    for s in range(1, 6):
+        k[s] = fun(t + C[s]*h, y + h*(A[s] @ k[:s]))
+    y_new = y + h*(B[:6] @ k[:6])
+    k[6] = fun(t + h, y_new)
+    return y_new, k[6], k, h*(E @ k)
+
+def error_norm(error, y, y_new, rtol, atol):
+    """Root mean square of the error, scaled by the tolerances."""
+    scale = atol + rtol*np.maximum(abs(y), abs(y_new))
+    return np.sqrt(np.mean((error/scale)**2))
+
+def dense(y, h, k, theta):
+    """Evaluate the continuous extension of a step.
+    Args:
+        y (np.array): State at the start of the step.
+        h (float): Step size.
+        k (np.array): Stages of the step, shape (7, len(y)).
+        theta (np.array): Fractions of the step, between 0 and 1.
+    Returns:
+        np.array: States at t + theta*h, shape (len(theta), len(y)).
+    """
+    theta = np.atleast_1d(theta)
+    powers = theta[:, None]**np.arange(1, 5)
+    return y + h*(powers @ (k.T @ P).T)
+
+def step_factor(err, order=5):
+    """Factor to scale the step size with, given the scaled error."""
+    if err == 0:
+        return 10
+    return min(10, max(0.2, 0.9*err**(-1/order)))
@@ -1,10 +1,70 @@
+import copy
+import math
 import numpy as np
 import matplotlib.pyplot as plt
+import atmosphere
+import integrators
+from motor import Motor
+from wind import Wind
+import events
+import profiling
+import streaming
+
+class Kinematics():
+    def __init__(self, rotation, rel_v, on_rail):
+        """Initialize class. Everything the force models need to know about
+         the attitude and motion of one state, computed once.
+        Args:
+            rotation (np.array): Rotation matrix from the local to the global
+                frame of reference.
+            rel_v (np.array): Velocity relative to the wind
+                (East, North, altitude).
+            on_rail (bool): True while the rocket is on the launch rail.
+        """
+        self.rotation = rotation
+        self.axis = rotation[:, 2]
+        self.rel_v = rel_v
+        self.speed2 = rel_v.dot(rel_v)
+        self.on_rail = on_rail
+        return
+
+class State():
+    def __init__(self, steps, values):
+        """Initialize class. Everything about a simulation that changes while
+         it runs, after a number of time steps: the histories, the index of
+         the time step and, e.g., the state of a controller. Restoring it
+         into a rocket with the same input continues the flight from there.
+        Args:
+            steps (int): Number of time steps computed.
+            values (dict): Copies of the changing attributes by name.
+        """
+        self.steps = steps
+        self.values = values
+        return
+
+    @property
+    def t(self):
+        """Time of the last computed time step (s)."""
+        return float(self.values["t"][self.steps])
+
+def _copy(value):
+    """Copy of an attribute of a State, sharing nothing that changes."""
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, list):
+        return list(value)
+    return copy.copy(value)
 
 class Rocket():
+    #Attributes that change while the rocket flies, see State.
+    _STATE = ("_i", "_kin", "_cursor", "t", "r", "v", "a", "_m", "_rho",
+        "angle_attack", "fthrust", "fdrag", "flift")
+
     def __init__(self, launch_ang, tmax, wind_speed, wind_ang, dry_mass,
                  wet_mass, length, cd, cl, critical_angle, hcm, hcp, radius,
-                 thrustforce, burntime, dt=0.01, rail_length=5.0):
+                 thrustforce, burntime, dt=0.01, rail_length=5.0,
+                 integrator="euler", rtol=1e-6, atol=1e-6,
+                 atmosphere_table=False, motor=None, wind=None):
         """Initialize class.
         Args:
             launch_ang (touple): Launch angle (deg [elevation, azimuth]).
@@ -23,10 +83,33 @@ class Rocket():
             burntime (float): Burntime (s).
             dt (float): Time step (s). Default to 0.01.
             rail_length (float): Lenght of launch rail (m). Default to 5.0.
+            integrator (str): 'euler' for the modified Forward Euler step
+                function, or 'rk45' for an adaptive Dormand-Prince method
+                resampled onto the time steps. Default to 'euler'.
+            rtol (float): Relative tolerance of 'rk45'. Default to 1e-6.
+            atol (float): Absolute tolerance of 'rk45'. Default to 1e-6.
+            atmosphere_table (bool): Look the air density up in the shared
+                atmosphere.table() instead of evaluating the layers of the
+                standard atmosphere. Default to False.
+            motor (Motor or str): Thrust curve, or the path of a .eng-file,
+                replacing thrustforce and burntime. The propellant mass is
+                still wet_mass - dry_mass. Default to None, a constant thrust.
+            wind (Wind or str): Wind depending on altitude and time, or the
+                path of a sounding file, replacing wind_speed and wind_ang.
+                Default to None, a constant wind.
         """
+        if integrator not in ("euler", "rk45"):
+            raise ValueError(f"Unknown integrator '{integrator}'.")
+        self._integrator = integrator
+        self._rtol = rtol
+        self._atol = atol
         self._dt = dt
-        self.t = np.linspace(0, tmax, tmax*int(1/self._dt)+1)
-        self.r, self.v, self.a = np.zeros((3, tmax*int(1/self._dt)+1, 5))
+        steps = tmax*int(1/self._dt)+1
+        self._i = 0 #Index of the current time step.
+        self._steps = 0 #Number of time steps computed.
+        self._kin = None #Kinematics of the last computed state.
+        self.t = np.linspace(0, tmax, steps)
+        self.r, self.v, self.a = np.zeros((3, steps, 5))
 
         #Set initial launch angle in Euler angles pitch and yaw.
         self.r[0][3] = -((np.pi/2)-launch_ang[0]*np.pi/180)*np.cos(
@@ -42,37 +125,81 @@ class Rocket():
         self._thrustforce = thrustforce
         self._mt = wet_mass
         self._mf = wet_mass-dry_mass
-        self._m = [wet_mass]
+        if isinstance(motor, str):
+            motor = Motor.load(motor)
+        self._motor = motor
+        #Evaluates the thrust curve at the time of each step.
+        self._cursor = None if motor is None else motor.cursor()
+        if motor is not None:
+            self._burntime = motor.burntime
+        self._m = np.zeros(steps)
+        self._m[0] = wet_mass
         self._cd = cd
         self._cl = cl
         self._hcm = hcm/1000
         self._hcp = hcp/1000
         self._wind = -wind_speed*np.array([np.sin(wind_ang*np.pi/180),
             np.cos(wind_ang*np.pi/180), 0])
+        if isinstance(wind, str):
+            wind = Wind.load(wind)
+        self._wind_model = wind
         self._side_area = (length/1000)*(radius/1000)*2
         self._front_area = np.pi*((radius/1000)**2)
         self._critical_angle = critical_angle*np.pi/180
         self._radius = radius/1000
         self._length = length/1000
-        self.angle_attack = [np.zeros(3)]
-        self.fthrust = [np.zeros(3)]
-        self.fdrag = [np.zeros(3)]
-        self.flift = [np.zeros(3)]
-
-        self._g = 9.80665 #Gravitational constant (m/s^2).
-        self._p0 = 101325 #standard absolute atmospheric pressure (Pa).
-        self._air_molar = 0.0289654 #Molar mass of dry air (kg/mol).
-        self._gas_constant = 8.314463 #Ideal gas constant (J/(mol*k)).
-        self._t0 = 288.15 #Absolute temperature at sea level (K).
-        self._t_laps = 0.0065 #Temperature laps rate (K/m).
-        self._rho = [1.225] #Air density (kg/m^3).
-
-        #First set of calculations for the air density.
-        self._c = (self._p0*self._air_molar/(self._gas_constant*self._t0))
-        self._exp = ((self._g*self._air_molar/(
-            self._gas_constant*self._t_laps))-1)
+        #Histories, written in place one row per time step.
+        self.angle_attack, self.fthrust, self.fdrag, self.flift = np.zeros(
+            (4, steps, 3))
+
+        self._g = atmosphere.G #Gravitational constant (m/s^2).
+        self._rho = np.zeros(steps)
+        self._rho[0] = 1.225 #Air density (kg/m^3).
+        #Air density (kg/m^3) as a function of altitude (m).
+        self._density = (atmosphere.table().density_at if atmosphere_table
+            else atmosphere.density)
         return
 
+    def rotation(self, rot):
+        """Rotation matrix counter clockwise by the x- and y-axis.
+        Args:
+            rot (np.array): Rotation (pitch, yaw).
+        Returns:
+            np.array: Rotation matrix, shape (3, 3).
+        """
+        cp, sp = np.cos(rot[0]), np.sin(rot[0])
+        cy, sy = np.cos(rot[1]), np.sin(rot[1])
+        return np.array([[cy, sy*sp, sy*cp], [0, cp, -sp],
+            [-sy, cy*sp, cy*cp]])
+
+    def kinematics(self, r, v, t=None):
+        """Compute the rotation, body axis and relative wind of a state.
+        Args:
+            r (np.array): Positional vector (East, North, altitude, theta, phi).
+            v (np.array): Velocity vector (East, North, altitude, theta, phi).
+            t (float): Time since initialization (s). Default to the time of
+                the current time step.
+        Returns:
+            Kinematics: Shared by the force models evaluated at this state.
+        """
+        return Kinematics(self.rotation(r[3:]), v[:3] - self.air_velocity(t,
+            r[2]), np.sqrt(r.dot(r)) < self._rodlenght)
+
+    def air_velocity(self, t, h):
+        """Velocity of the air, the wind.
+        Args:
+            t (float): Time since initialization (s), or None for the time of
+                the current time step.
+            h (float): Altitude (m).
+        Returns:
+            np.array: The velocity (East, North, altitude).
+        """
+        if self._wind_model is None:
+            return self._wind
+        if t is None:
+            t = self.t[self._i]
+        return np.array(self._wind_model.at(t, h))
+
     def rotate(self, rot, vector, inverse=False):
         """
         Rotate a vector counter clockwise by its x- and y-axis.
@@ -84,10 +211,7 @@ class Rocket():
         Returns:
             np.array: Rotated output vector.
         """
-        rotation = np.array([[np.cos(rot[1]), np.sin(rot[1])*np.sin(rot[0]),
-            np.sin(rot[1])*np.cos(rot[0])], [0, np.cos(rot[0]),
-            -np.sin(rot[0])], [-np.sin(rot[1]), np.cos(rot[1])*np.sin(rot[0]),
-            np.cos(rot[1])*np.cos(rot[0])]])
+        rotation = self.rotation(rot)
 
         if inverse:
             output = rotation.T @ vector
@@ -95,100 +219,142 @@ class Rocket():
             output = rotation @ vector
         return output
 
-    def update(self, t, r, v):
+    def thrust_force(self, t):
+        """Magnitude of the thrust (N) during the burn.
+        Args:
+            t (float): Time since initialization (s).
+        Returns:
+            float: The thrust, from the thrust curve if given.
+        """
+        if self._cursor is None:
+            return self._thrustforce
+        return self._cursor.thrust(t)
+
+    def mass(self, t):
+        """Mass (kg), losing the propellant linearly during the burn, or in
+         proportion to the impulse delivered with a thrust curve.
+        Args:
+            t (float): Time since initialization (s).
+        Returns:
+            float: The mass.
+        """
+        if t >= self._burntime:
+            return self._mt - self._mf
+        if self._cursor is None:
+            return self._mt - (self._mf*t/self._burntime)
+        return self._mt - self._mf*self._cursor.burned(t)
+
+    def update(self, t, r, v, i=None, kin=None):
         """Update mass (kg) as a function of time (s), air density (kg/m^3) as a
-        function of height (m) and calculate the angle of attack (rad).
+        function of height (m) and calculate the angle of attack (rad). The
+        kinematics of the state are kept in self._kin for the next call of
+        acceleration().
         Args:
             t (float): Time since initialization in seconds.
             r (np.array): Positional vector (East, North, altitude, theta, phi).
             v (np.array): Velocity vector (East, North, altitude, theta, phi).
+            i (int): Index to store the results at. Default to the next step.
+            kin (Kinematics): Kinematics of the state, if already known.
         """
-        if t >= self._burntime:
-            self._m.append(self._mt - self._mf)
-        else:
-            self._m.append(self._mt - (self._mf*t/self._burntime))
+        if i is None:
+            i = self._i + 1
+        if kin is None:
+            kin = self.kinematics(r, v, t)
+        self._kin = kin
+        self._m[i] = self.mass(t)
 
-        self._rho.append(self._c*(1-(self._t_laps*r[2]/self._t0))**self._exp)
+        self._rho[i] = self._density(r[2])
 
-        rel_v = v[:3] - self._wind
         motion_theta = 0
-        if abs(rel_v.dot(rel_v)) > 0:
-            motion_theta = np.arccos(rel_v[2]/np.sqrt(rel_v.dot(rel_v)))
-        rocket_theta = np.arccos(np.cos(r[3])*np.cos(r[4]))
-        self.angle_attack.append(np.array([motion_theta, rocket_theta,
-            motion_theta - rocket_theta]))
+        if abs(kin.speed2) > 0:
+            motion_theta = np.arccos(kin.rel_v[2]/np.sqrt(kin.speed2))
+        rocket_theta = np.arccos(kin.rotation[2, 2])
+        self.angle_attack[i] = (motion_theta, rocket_theta,
+            motion_theta - rocket_theta)
         return
 
-    def weight(self, r):
+    def weight(self, r, kin=None):
         """Weight as a vector pointing from the center of mass of the rocket
          towards negative z in the main coordinate system.
+        Args:
+            r (np.array): Positional vector (East, North, altitude, theta, phi).
+            kin (Kinematics): Kinematics of the state, if already known.
         Returns:
             np.array: Force from weight as a vector
                 (East, North, altitude, theta, phi).
         """
-        weight = np.array([0, 0, -self._g*self._m[-1]])
-        if np.sqrt(r.dot(r)) < self._rodlenght:
-            l_weight = np.array([0, 0,
-                self.rotate(r[3:], weight, inverse=True)[2]])
-            weight = self.rotate(r[3:], l_weight)
+        if kin is None:
+            kin = self.kinematics(r, np.zeros(5))
+        weight = np.array([0, 0, -self._g*self._m[self._i]])
+        if kin.on_rail:
+            #Only the component along the rail, in the local frame.
+            weight = kin.rotation[2, 2]*weight[2]*kin.axis
         return np.array([weight[0], weight[1], weight[2], 0, 0])
 
-    def thrust(self, t, r):
+    def thrust(self, t, r, kin=None):
         """Thrust as a vector pointing from the back of the rocket towards
          positive z in the local reference frame, converted into the global
          reference frame.
         Args:
             t (float): Time since initialization in seconds.
             r (np.array): Positional vector (East, North, altitude, theta, phi).
+            kin (Kinematics): Kinematics of the state, if already known.
         Returns:
             np.array: Force from thrust as a vector
                 (East, North, altitude, theta, phi).
         """
         if t < self._burntime:
-            #Thrust is now a vector in the local reference frame.
-            l_thrust = self._thrustforce*np.array([0, 0, 1])
-            #Convert the vector to the global reference frame.
-            g_thrust = self.rotate(r[3:], l_thrust)
+            if kin is None:
+                kin = self.kinematics(r, np.zeros(5))
+            #Thrust along the body axis, in the global reference frame.
+            g_thrust = self.thrust_force(t)*kin.axis
             return np.array((g_thrust[0], g_thrust[1], g_thrust[2], 0, 0))
         else:
             return np.zeros(5)
 
-    def drag(self, r, v):
+    def drag(self, r, v, kin=None):
         """Drag as a vector pointing from the center of pressure opposite the
          direction of motion in a global reference frame.
         Args:
             r (np.array): Positional vector (East, North, altitude, theta, phi).
             v (np.array): Velocity vector (East, North, altitude, theta, phi).
+            kin (Kinematics): Kinematics of the state, if already known.
         Returns:
             np.array: Force from drag as a vector
                 (East, North, altitude, theta, phi).
         """
-        rel_v = v[:3] - self._wind
+        rel_v = (v[:3] - self.air_velocity(None, r[2]) if kin is None
+            else kin.rel_v)
         #Drag in global reference frame.
-        g_drag = -0.5*self._cd*self._front_area*self._rho[-1]*rel_v*abs(rel_v)
+        g_drag = (-0.5*self._cd*self._front_area*self._rho[self._i]*rel_v*
+            abs(rel_v))
 
         return np.array([g_drag[0], g_drag[1], g_drag[2], 0, 0])
 
-    def lift(self, r, v):
+    def lift(self, r, v, kin=None):
         """Lift as a vector pointing from the center of pressure perpendicular
          to the direction of motion in a global reference frame.
         Args:
             r (np.array): Positional vector (East, North, altitude, theta, phi).
             v (np.array): Velocity vector (East, North, altitude, theta, phi).
+            kin (Kinematics): Kinematics of the state, if already known.
         Returns:
             np.array: Force from lift as a vector
                 (East, North, altitude, theta, phi).
         """
-        rel_v = v[:3] - self._wind
-        orientation = self.rotate(r[3:], np.array([0, 0, 1]))
+        if kin is None:
+            kin = self.kinematics(r, v)
+        rel_v = kin.rel_v
+        orientation = kin.axis
         dir_lift = np.cross(rel_v, np.cross(orientation, rel_v))
 
         cl = 0
-        if abs(self.angle_attack[-1][2]) < self._critical_angle:
-            cl = self._cl*abs(1 - (abs(self.angle_attack[-1][2] -
+        attack = self.angle_attack[self._i][2]
+        if abs(attack) < self._critical_angle:
+            cl = self._cl*abs(1 - (abs(attack -
                  self._critical_angle)/self._critical_angle))
 
-        lift = 0.5*cl*self._side_area*self._rho[-1]*rel_v**2
+        lift = 0.5*cl*self._side_area*self._rho[self._i]*rel_v**2
         mag_lift = np.sqrt(lift.dot(lift))
 
         if dir_lift.dot(dir_lift) != 0:
@@ -197,53 +363,588 @@ class Rocket():
             g_lift = np.array([0, 0, 0])
 
         #Convert the vector to the local reference frame.
-        l_lift = self.rotate(r[3:], g_lift, inverse=True)
+        l_lift = kin.rotation.T @ g_lift
 
         f_lift = np.array([g_lift[0], g_lift[1], g_lift[2],
             -l_lift[1]*(self._hcp-self._hcm), l_lift[0]*(self._hcp-self._hcm)])
-        if np.sqrt(r.dot(r)) < self._rodlenght:
-            g_lift = self.rotate(r[3:], np.array([0, 0, l_lift[2]]))
+        if kin.on_rail:
+            g_lift = l_lift[2]*orientation
             f_lift = np.array([g_lift[0], g_lift[1], g_lift[2], 0, 0])
         return f_lift
 
-    def acceleration(self, t, r, v):
+    def acceleration(self, t, r, v, kin=None):
         """Calculate the acceleration using Newtons 2. law.
         Args:
             t (float): Time since initialization in seconds.
             r (np.array): Positional vector (East, North, altitude, theta, phi).
             v (np.array): Velocity vector (East, North, altitude, theta, phi).
+            kin (Kinematics): Kinematics of the state, if already known.
         Returns:
             np.array: New acceleration vector
                 (East, North, altitude, theta, phi).
         """
-        f_thrust = self.thrust(t, r)
-        f_drag = self.drag(r, v)
-        f_weight = self.weight(r)
-        f_lift = self.lift(r, v)
+        if kin is None:
+            kin = self.kinematics(r, v, t)
+        f_thrust = self.thrust(t, r, kin)
+        f_drag = self.drag(r, v, kin)
+        f_weight = self.weight(r, kin)
+        f_lift = self.lift(r, v, kin)
+        m = self._m[self._i]
         acc = np.array([(f_thrust[:3] + f_drag[:3] + f_lift[:3] +
-            f_weight[:3])/self._m[-1]])
+            f_weight[:3])/m])
         ang_acc = np.array([(f_thrust[3:] + f_lift[3:])/
-            (self._m[-1]*(3*self._radius**2+self._length**2)/12)])
+            (m*(3*self._radius**2+self._length**2)/12)])
         for i in range(2):
             if abs(ang_acc[-1][i]) < 10E-14:
                 ang_acc[-1][i] = 0
-        self.fthrust.append(f_thrust[:3])
-        self.fdrag.append(f_drag[:3])
-        self.flift.append(f_lift[:3])
+        self.fthrust[self._i+1] = f_thrust[:3]
+        self.fdrag[self._i+1] = f_drag[:3]
+        self.flift[self._i+1] = f_lift[:3]
         return np.concatenate((acc, ang_acc), axis=None)
 
-    def launch(self):
-        """Solves the differential equation using the step function."""
-        for i in range(len(self.t)-1):
-            self.a[i+1] = self.acceleration(self.t[i], self.r[i], self.v[i])
+    def launch(self, terminal=None, kernel="numpy"):
+        """Solves the differential equation using the chosen integrator, and
+         summarizes the events of the flight in self.summary.
+         A flight advanced to a time step before, see advance(), is
+         continued from there.
+        Args:
+            terminal (str): Stop at this event, one of events.EVENTS. All
+                histories are then cut off after the time step the event
+                happened in. Default to None, running until tmax.
+            kernel (str): 'numpy' to call the force models on arrays, or
+                'fast' to run the same Euler steps on plain floats. Default
+                to 'numpy'.
+        """
+        if terminal is not None and terminal not in events.EVENTS:
+            raise ValueError(f"Unknown event '{terminal}'.")
+        if kernel not in ("numpy", "fast"):
+            raise ValueError(f"Unknown kernel '{kernel}'.")
+        if kernel == "fast" and self._integrator != "euler":
+            raise ValueError("The fast kernel only runs the Euler step.")
+        if self._integrator == "rk45" and self._steps > 0:
+            raise ValueError("Only the Euler step continues a flight.")
+        self._exact_events = {}
+        if self._integrator == "rk45":
+            end = self._launch_rk45(terminal)
+        elif kernel == "fast":
+            end = self._launch_fast(terminal)
+        else:
+            end = self._launch_euler(terminal)
+        if end < len(self.t):
+            self._truncate(end)
+        self.summary = events.Summary(self.find_events())
+        return
+
+    def advance(self, t, kernel="numpy"):
+        """Run the Euler steps up to the last time step at or before t, to
+         snapshot() or fork() the flight there. launch() continues it.
+        Args:
+            t (float): Time since initialization (s).
+            kernel (str): 'numpy' or 'fast', see launch(). Default to
+                'numpy'.
+        """
+        if self._integrator != "euler":
+            raise ValueError("Only the Euler step continues a flight.")
+        stop = min(int(np.searchsorted(self.t, t + 1e-9*self._dt,
+            side='right'))-1, len(self.t)-1)
+        if stop > self._steps:
+            if kernel == "fast":
+                self._launch_fast(None, stop)
+            else:
+                self._launch_euler(None, stop)
+        return
+
+    def snapshot(self):
+        """The state of the flight after the time steps computed so far.
+        Returns:
+            State: Copies of everything that changes while flying.
+        """
+        return State(self._steps, {name:_copy(getattr(self, name))
+            for name in self._STATE if hasattr(self, name)})
+
+    def restore(self, state):
+        """Go back or forth to a state of this rocket or of one with the
+         same input. The state itself is not changed, so it can be restored
+         any number of times.
+        Args:
+            state (State): The state, see snapshot().
+        """
+        for name, value in state.values.items():
+            setattr(self, name, _copy(value))
+        self._steps = state.steps
+        return
+
+    def fork(self, n):
+        """Independent copies of the rocket at the current time step, e.g.
+         to change the gains or inputs of each before launch() continues
+         them. The input and models are shared, the state is not.
+        Args:
+            n (int): Number of copies.
+        Returns:
+            list: The copies.
+        """
+        state = self.snapshot()
+        rockets = []
+        for _ in range(n):
+            rocket = copy.copy(self)
+            rocket.restore(state)
+            rockets.append(rocket)
+        return rockets
+
+    def control(self, u):
+        """Set the control input of the following time steps, see
+         iter_steps(). A rocket without TVC has none.
+        Args:
+            u: The control input, None for none.
+        """
+        if u is not None:
+            raise ValueError("The rocket has no control input.")
+        return
+
+    def iter_steps(self, history=None, terminal=None, deadline=None,
+                   realtime=False):
+        """Run the Euler steps one at a time, e.g.
+         'for step in rocket.iter_steps(): ...', 'async for step in ...', or
+         with control inputs 'steps.send(u)'. See streaming.Stream.
+        Args:
+            history (int): Keep only this many of the last time steps.
+                Default to None, filling the histories.
+            terminal (str): Stop after this event. Default to None.
+            deadline (float): Time a step may take (s). Default to dt.
+            realtime (bool): Pace the steps to the wall clock. Default to
+                False.
+        Returns:
+            streaming.Stream: The steps.
+        """
+        return streaming.Stream(self, history, terminal, deadline, realtime)
+
+    def profile(self, components=profiling.COMPONENTS):
+        """Time the force models and the rest of the step, per phase of the
+         flight, while the returned profiler is attached, e.g.
+         'with rocket.profile() as profiler: rocket.launch()'. Nothing is
+         changed or timed otherwise.
+        Args:
+            components (touple): Names of the methods to time. Default to
+                profiling.COMPONENTS.
+        Returns:
+            profiling.Profiler: The profiler, not yet attached.
+        """
+        return profiling.Profiler(self, components)
+
+    def _launch_euler(self, terminal, stop=None):
+        """Solves the differential equation using the step function, from
+         the last computed time step on.
+        Args:
+            terminal (str): Event to stop at, or None.
+            stop (int): Last time step to compute. Default to the end.
+        Returns:
+            int: Number of time steps computed.
+        """
+        start = self._steps
+        if stop is None:
+            stop = len(self.t)-1
+        if start == 0 or self._kin is None:
+            #As computed by update(), at the time of the step before.
+            self._kin = self.kinematics(self.r[start], self.v[start],
+                self.t[max(start-1, 0)])
+        for i in range(start, stop):
+            self._i = i
+            #The kinematics of this state were computed by update().
+            self.a[i+1] = self.acceleration(self.t[i], self.r[i], self.v[i],
+                self._kin)
             self.r[i+1], self.v[i+1] = self.step(self.t[i], self.r[i],
                                                  self.v[i], self.a[i+1])
-        self.angle_attack = np.array(self.angle_attack, dtype=object)
-        self.fdrag = np.array(self.fdrag, dtype=object)
-        self.fthrust = np.array(self.fthrust, dtype=object)
-        self.flift = np.array(self.flift, dtype=object)
+            if (terminal is not None and
+                    self._crossed(terminal, i, i+2) is not None):
+                self._steps = i+1
+                return i+2
+        self._steps = max(stop, start)
+        return stop+1
+
+    def _fast_thrust(self, t, r, rot):
+        """Thrust for the fast kernel, on plain floats.
+        Args:
+            t (float): Time since initialization in seconds.
+            r (list): Positional vector (East, North, altitude, theta, phi).
+            rot (tuple): cos and sin of pitch, cos and sin of yaw.
+        Returns:
+            tuple: Force from thrust (East, North, altitude, theta, phi).
+        """
+        if t < self._burntime:
+            cp, sp, cy, sy = rot
+            f = self.thrust_force(t)
+            return (sy*cp*f, -sp*f, cy*cp*f, 0.0, 0.0)
+        return (0.0, 0.0, 0.0, 0.0, 0.0)
+
+    def _launch_fast(self, terminal, stop=None):
+        """Solves the differential equation with the same modified Forward
+         Euler step as _launch_euler(), but on plain floats, without the
+         overhead of small arrays. Mass, air density and angle of attack are
+         carried from one step to the next exactly like update() does.
+        Args:
+            terminal (str): Event to stop at, or None.
+            stop (int): Last time step to compute. Default to the end.
+        Returns:
+            int: Number of time steps computed.
+        """
+        start = self._steps
+        if stop is None:
+            stop = len(self.t)-1
+        cos, sin, sqrt, acos = math.cos, math.sin, math.sqrt, math.acos
+        dt = self._dt
+        t_all = self.t.tolist()
+        wx, wy, wz = (float(w) for w in self.air_velocity(
+            t_all[max(start-1, 0)], self.r[start][2]))
+        air = None if self._wind_model is None else self._wind_model.at
+        rail, burntime = self._rodlenght, self._burntime
+        mass, g, density = self.mass, self._g, self._density
+        k_drag = -0.5*self._cd*self._front_area
+        k_lift = 0.5*self._side_area
+        cl0, critical = self._cl, self._critical_angle
+        arm = self._hcp - self._hcm
+        inertia = (3*self._radius**2+self._length**2)/12
+        if terminal is not None:
+            event = {"rail_exit": lambda t, r, v: sqrt(r[0]*r[0] + r[1]*r[1] +
+                r[2]*r[2] + r[3]*r[3] + r[4]*r[4]) - rail,
+                "burnout": lambda t, r, v: t - burntime,
+                "apogee": lambda t, r, v: -v[2],
+                "touchdown": lambda t, r, v: -r[2]}[terminal]
+
+        r = self.r[start].tolist()
+        v = self.v[start].tolist()
+        m = float(self._m[start])
+        rho = float(self._rho[start])
+        attack = float(self.angle_attack[start][2])
+        rows_r, rows_v, rows_a = [], [], []
+        rows_m, rows_rho, rows_aoa = [], [], []
+        rows_thrust, rows_drag, rows_lift = [], [], []
+        rot = (cos(r[3]), sin(r[3]), cos(r[4]), sin(r[4]))
+        if terminal is not None:
+            g_prev = event(t_all[start], r, v)
+        end = max(stop, start)+1
+        for i in range(start, stop):
+            t = t_all[i]
+            cp, sp, cy, sy = rot
+            ax, ay, az = sy*cp, -sp, cy*cp
+            rx, ry, rz = v[0] - wx, v[1] - wy, v[2] - wz
+            on_rail = sqrt(r[0]*r[0] + r[1]*r[1] + r[2]*r[2] + r[3]*r[3] +
+                r[4]*r[4]) < rail
+
+            f_thrust = self._fast_thrust(t, r, rot)
+
+            k = k_drag*rho
+            dx, dy, dz = k*rx*abs(rx), k*ry*abs(ry), k*rz*abs(rz)
+
+            w = -g*m
+            if on_rail:
+                w = cy*cp*w
+                wgx, wgy, wgz = w*ax, w*ay, w*az
+            else:
+                wgx, wgy, wgz = 0.0, 0.0, w
+
+            #Lift along rel_v x (axis x rel_v).
+            ox, oy, oz = ay*rz - az*ry, az*rx - ax*rz, ax*ry - ay*rx
+            lx, ly, lz = ry*oz - rz*oy, rz*ox - rx*oz, rx*oy - ry*ox
+            cl = 0.0
+            if abs(attack) < critical:
+                cl = cl0*abs(1 - (abs(attack - critical)/critical))
+            k = k_lift*cl*rho
+            px, py, pz = k*rx*rx, k*ry*ry, k*rz*rz
+            mag = sqrt(px*px + py*py + pz*pz)
+            norm = lx*lx + ly*ly + lz*lz
+            if norm != 0:
+                norm = sqrt(norm)
+                lx, ly, lz = mag*lx/norm, mag*ly/norm, mag*lz/norm
+            else:
+                lx, ly, lz = 0.0, 0.0, 0.0
+            #Lift in the local frame.
+            l0 = cy*lx - sy*lz
+            l1 = sy*sp*lx + cp*ly + cy*sp*lz
+            l2 = ax*lx + ay*ly + az*lz
+            if on_rail:
+                lx, ly, lz = l2*ax, l2*ay, l2*az
+                lm0, lm1 = 0.0, 0.0
+            else:
+                lm0, lm1 = -l1*arm, l0*arm
+
+            a = [(f_thrust[0] + dx + lx + wgx)/m,
+                (f_thrust[1] + dy + ly + wgy)/m,
+                (f_thrust[2] + dz + lz + wgz)/m,
+                (f_thrust[3] + lm0)/(m*inertia),
+                (f_thrust[4] + lm1)/(m*inertia)]
+            for j in (3, 4):
+                if abs(a[j]) < 10E-14:
+                    a[j] = 0.0
+            rows_a.append(a)
+            rows_thrust.append(f_thrust[:3])
+            rows_drag.append((dx, dy, dz))
+            rows_lift.append((lx, ly, lz))
+
+            if r[2] >= 0:
+                v = [v[j] + dt*a[j] for j in range(5)]
+            else:
+                v = [0.0, 0.0, 0.0, 0.0, 0.0]
+            r = [r[j] + dt*v[j] for j in range(5)]
+            rows_r.append(r)
+            rows_v.append(v)
+
+            #Same as update().
+            m = mass(t)
+            rho = density(r[2])
+            if air is not None:
+                wx, wy, wz = air(t, r[2])
+            rot = (cos(r[3]), sin(r[3]), cos(r[4]), sin(r[4]))
+            rx, ry, rz = v[0] - wx, v[1] - wy, v[2] - wz
+            speed2 = rx*rx + ry*ry + rz*rz
+            motion = 0.0
+            if speed2 > 0:
+                motion = acos(max(-1.0, min(1.0, rz/sqrt(speed2))))
+            rocket = acos(rot[2]*rot[0])
+            attack = motion - rocket
+            rows_m.append(m)
+            rows_rho.append(rho)
+            rows_aoa.append((motion, rocket, attack))
+
+            if terminal is not None:
+                g_now = event(t_all[i+1], r, v)
+                if g_prev < 0 <= g_now:
+                    end = i+2
+                    break
+                g_prev = g_now
+
+        rows = slice(start+1, end)
+        if end > start+1:
+            self.r[rows], self.v[rows], self.a[rows] = rows_r, rows_v, rows_a
+            self._m[rows], self._rho[rows] = rows_m, rows_rho
+            self.angle_attack[rows] = rows_aoa
+            self.fthrust[rows], self.fdrag[rows] = rows_thrust, rows_drag
+            self.flift[rows] = rows_lift
+            self._i = end-2
+        self._steps = end-1
+        #The kinematics of the last state are not computed here.
+        self._kin = None
+        return end
+
+    def event_function(self, name, t, r, v):
+        """Functions that cross from negative to zero or positive when an
+         event happens.
+        Args:
+            name (str): One of events.EVENTS.
+            t (np.array): Times (s).
+            r (np.array): Positional vectors, shape (len(t), 5).
+            v (np.array): Velocity vectors, shape (len(t), 5).
+        Returns:
+            np.array: Value of the function at each time.
+        """
+        if name == "rail_exit":
+            return np.sqrt(np.einsum('ij,ij->i', r, r)) - self._rodlenght
+        elif name == "burnout":
+            return t - self._burntime
+        elif name == "apogee":
+            return -v[:, 2]
+        elif name == "touchdown":
+            return -r[:, 2]
+        raise ValueError(f"Unknown event '{name}'.")
+
+    def _crossed(self, name, start, end):
+        """First time step in [start + 1, end) at which an event happened.
+        Args:
+            name (str): One of events.EVENTS.
+            start (int): First time step to look at.
+            end (int): End of the time steps to look at.
+        Returns:
+            int: The time step, or None.
+        """
+        g = self.event_function(name, self.t[start:end], self.r[start:end],
+            self.v[start:end])
+        j = events.first_crossing(g)
+        return None if j is None else start + j
+
+    def find_events(self):
+        """Locate the events of the flight between the time steps.
+        Returns:
+            dict: events.Event by name, for the events that happened.
+        """
+        found = {}
+        for name in events.EVENTS:
+            g = self.event_function(name, self.t, self.r, self.v)
+            j = events.first_crossing(g)
+            if j is not None:
+                found[name] = events.locate(name, self.t, self.r, self.v, g, j)
+        found.update(self._exact_events)
+        return found
+
+    def _truncate(self, end):
+        """Cut all histories off after the first 'end' time steps."""
+        self.t = self.t[:end]
+        self.r, self.v, self.a = self.r[:end], self.v[:end], self.a[:end]
+        self._m, self._rho = self._m[:end], self._rho[:end]
+        self.angle_attack = self.angle_attack[:end]
+        self.fthrust, self.fdrag = self.fthrust[:end], self.fdrag[:end]
+        self.flift = self.flift[:end]
         return
 
+    def _breakpoints(self):
+        """Times the adaptive integrator has to step onto, because the
+         right hand side is discontinuous there.
+        Returns:
+            list: Times (s).
+        """
+        if self._motor is None:
+            return [self._burntime]
+        #The thrust curve has a kink at each of its points.
+        return list(self._motor.t[1:])
+
+    def _sample(self, t, r, v):
+        """Called by the adaptive integrator at every breakpoint, before the
+         next segment is integrated.
+        Args:
+            t (float): Time since initialization in seconds.
+            r (np.array): Positional vector (East, North, altitude, theta, phi).
+            v (np.array): Velocity vector (East, North, altitude, theta, phi).
+        """
+        return
+
+    def _derivative(self, t, y):
+        """Right hand side of the equations of motion for the adaptive
+         integrator, with mass, air density and angle of attack evaluated at
+         the state itself.
+        Args:
+            t (float): Time since initialization in seconds.
+            y (np.array): Position and velocity, shape (10,).
+        Returns:
+            np.array: Velocity and acceleration, shape (10,).
+        """
+        self._evaluations += 1
+        self.update(t, y[:5], y[5:], i=self._i)
+        self._last_acc = self.acceleration(t, y[:5], y[5:], self._kin)
+        return np.concatenate((y[5:], self._last_acc))
+
+    def _launch_rk45(self, terminal):
+        """Solves the differential equation with the Dormand-Prince method.
+         Steps are taken with error control and the dense output is resampled
+         onto self.t. Unlike the Euler step, mass, air density and angle of
+         attack are those of the state at each time step. The histories are
+         interpolated between accepted steps. At touchdown the rocket is held
+         at rest.
+        Args:
+            terminal (str): Event to stop at, or None.
+        Returns:
+            int: Number of time steps computed.
+        """
+        tmax = self.t[-1]
+        stops = sorted({b for b in self._breakpoints() if 0 < b < tmax} |
+            {tmax})
+        #Index 0 is used as scratch space while integrating.
+        self._i = 0
+        self._evaluations = 0
+        records = []
+
+        def record(t):
+            records.append(np.concatenate(((t,), self._history_row())))
+
+        t, y = 0.0, np.concatenate((self.r[0], self.v[0]))
+        h = self._dt
+        k_next = 0
+        touchdown = None
+        end_row = None
+        for stop in stops:
+            if touchdown is not None or end_row is not None:
+                break
+            self._sample(t, y[:5], y[5:])
+            #Just before the breakpoint, the left limit of the right hand side.
+            end = np.nextafter(stop, -np.inf) if stop < tmax else stop
+            fun = lambda s, x: self._derivative(min(s, end), x)
+            f = fun(t, y)
+            record(t)
+            while t < stop and touchdown is None and end_row is None:
+                h = min(h, stop - t)
+                y_new, f_new, k, error = integrators.dopri_step(fun, t, y, f,
+                    h)
+                err = integrators.error_norm(error, y, y_new, self._rtol,
+                    self._atol)
+                if err <= 1:
+                    t_new = stop if h == stop - t else t + h
+                    if y_new[2] < 0 and t > 0:
+                        theta, state = self._touchdown(t, y, h, k)
+                        t_new = t + theta*h
+                        touchdown = (t_new, state)
+                    k_end = np.searchsorted(self.t, t_new, side='right')
+                    if k_end > k_next:
+                        states = integrators.dense(y, h, k,
+                            (self.t[k_next:k_end] - t)/h)
+                        self.r[k_next:k_end] = states[:, :5]
+                        self.v[k_next:k_end] = states[:, 5:]
+                        if terminal is not None:
+                            end_row = self._crossed(terminal,
+                                max(k_next-1, 0), k_end)
+                            end_row = None if end_row is None else end_row+1
+                        k_next = k_end
+                    if touchdown is None:
+                        t, y, f = t_new, y_new, f_new
+                        record(t)
+                elif h < 1e-10:
+                    raise RuntimeError(f"Step size too small at t={t} s.")
+                h *= integrators.step_factor(err)
+
+        records = np.array(records)
+        filled = k_next
+        grid = self.t[:filled]
+        columns = [np.interp(grid, records[:, 0], records[:, j])
+            for j in range(1, records.shape[1])]
+        self.a[:filled] = np.array(columns[:5]).T
+        self._m[:filled], self._rho[:filled] = columns[5], columns[6]
+        self.angle_attack[:filled] = np.array(columns[7:10]).T
+        self.fthrust[:filled] = np.array(columns[10:13]).T
+        self.fdrag[:filled] = np.array(columns[13:16]).T
+        self.flift[:filled] = np.array(columns[16:19]).T
+        if touchdown is not None:
+            #The rocket rests where it hit the ground.
+            self.r[filled:] = touchdown[1][:5]
+            self.r[filled:, 2] = 0
+            self.v[filled:] = 0
+            self.a[filled:] = 0
+            self._m[filled:] = self._m[filled-1]
+            self._rho[filled:] = self._rho[filled-1]
+            self.angle_attack[filled:] = self.angle_attack[filled-1]
+            self.fthrust[filled:] = 0
+            self.fdrag[filled:] = 0
+            self.flift[filled:] = 0
+            self._exact_events["touchdown"] = events.Event("touchdown",
+                touchdown[0], touchdown[1][:5], touchdown[1][5:])
+            if terminal == "touchdown":
+                end_row = filled+1
+        self._i = len(self.t)-1
+        return len(self.t) if end_row is None else end_row
+
+    def _history_row(self):
+        """Acceleration, mass, air density, angle of attack and forces from
+         the last call of _derivative()."""
+        i = self._i
+        return np.concatenate((self._last_acc, (self._m[i], self._rho[i]),
+            self.angle_attack[i], self.fthrust[i+1], self.fdrag[i+1],
+            self.flift[i+1]))
+
+    def _touchdown(self, t, y, h, k):
+        """Find where the altitude crosses zero within an accepted step.
+        Args:
+            t (float): Time at the start of the step.
+            y (np.array): State at the start of the step.
+            h (float): Step size.
+            k (np.array): Stages of the step.
+        Returns:
+            float: Fraction of the step at touchdown.
+            np.array: State at touchdown.
+        """
+        lo, hi = 0.0, 1.0
+        for _ in range(60):
+            mid = (lo + hi)/2
+            if integrators.dense(y, h, k, mid)[0, 2] < 0:
+                hi = mid
+            else:
+                lo = mid
+        return hi, integrators.dense(y, h, k, hi)[0]
+
     def step(self, t, r, v, a):
         """A modified Forward Euler step function.
         Args:
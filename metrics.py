@@ -0,0 +1,208 @@
+import numpy as np
+import events
+import openrocket
+from sweep import run_sweep
+
+#Input of the rocket in "rocket verification.ork", as used in comparison.py.
+INPUTS = {"tmax":90, "dry_mass":9.85, "wet_mass":18.554, "length":2710,
+    "cd":0.75, "cl":0.15, "critical_angle":20, "hcm":710, "hcp":510,
+    "radius":51.5, "thrustforce":2529, "burntime":6.04}
+LAUNCH_ANG = (80, 90)
+#Wind cases exported from OpenRocket: name of the export, wind speed (m/s)
+#and wind angle (deg).
+CASES = {"no_wind":("0mps", 0, 0),
+    "3mps_headwind":("3mps90deg", 3, 90),
+    "8mps_headwind":("8mps90deg", 8, 90),
+    "14mps_headwind":("14mps90deg", 14, 90),
+    "8mps_crosswind":("8mps0deg", 8, 0),
+    "8mps_tailwind":("8mps270deg", 8, 270)}
+#Compared channels: altitude, East and North (m), speed (m/s) and vertical
+#orientation (rad).
+CHANNELS = ("altitude", "east", "north", "velocity", "zenith")
+#Columns of the table, besides 'case'. The errors are model minus
+#OpenRocket: RMS and maximum absolute error of each channel over the common
+#flight time, apogee altitude (m), distance between the landing points (m)
+#and time offset of each event (s). NaN where it can not be compared.
+FIELDS = (tuple(f"{channel}_{stat}" for channel in CHANNELS
+    for stat in ("rms", "max")) + ("apogee", "landing")
+    + tuple(f"{name}_dt" for name in events.EVENTS))
+
+def model_channels(flight):
+    """The compared channels of a simulated flight.
+    Args:
+        flight (Trajectory): A launched Rocket or Trajectory.
+    Returns:
+        np.array: Channels, shape (len(flight.t), len(CHANNELS)).
+    """
+    channels = np.empty((len(flight.t), len(CHANNELS)))
+    channels[:, :3] = flight.r[:, [2, 0, 1]]
+    channels[:, 3] = np.sqrt(np.einsum('ij,ij->i', flight.v[:, :3],
+        flight.v[:, :3]))
+    channels[:, 4] = np.pi/2 - flight.angle_attack[:, 1]
+    #The angles are first computed for the second time step.
+    channels[0, 4] = np.nan
+    return channels
+
+def openrocket_channels(frame):
+    """The compared channels of an OpenRocket export.
+    Args:
+        frame (openrocket.Frame): The export.
+    Returns:
+        np.array: Time (s).
+        np.array: Channels, shape (len(frame), len(CHANNELS)).
+    """
+    columns = ("Altitude (m)", "Position East of launch (m)",
+        "Position North of launch (m)", "Total velocity (m/s)",
+        "Vertical orientation (zenith) (rad)")
+    return (np.asarray(frame["Time (s)"]),
+        np.column_stack([frame[column] for column in columns]))
+
+def openrocket_summary(frame, rail_length=5.0):
+    """Locate the events of an OpenRocket export the same way as for the
+     model, with the velocity taken as the gradient of the position. Burnout
+     is where the thrust drops to zero, and the flight ends at touchdown or
+     at the last sample.
+    Args:
+        frame (openrocket.Frame): The export.
+        rail_length (float): Length of the launch rail (m). Default to 5.0.
+    Returns:
+        events.Summary: Events of the flight, with positions
+            (East, North, altitude).
+    """
+    t = np.asarray(frame["Time (s)"])
+    r = np.column_stack((frame["Position East of launch (m)"],
+        frame["Position North of launch (m)"], frame["Altitude (m)"]))
+    v = np.gradient(r, t, axis=0)
+    functions = {"rail_exit":np.sqrt(np.einsum('ij,ij->i', r, r))-rail_length,
+        "burnout":-np.asarray(frame["Thrust (N)"]), "apogee":-v[:, 2],
+        "touchdown":-r[:, 2]}
+    found = {}
+    for name in events.EVENTS:
+        g = functions[name]
+        j = events.first_crossing(g)
+        if j is not None:
+            found[name] = events.locate(name, t, r, v, g, j)
+    if "touchdown" not in found and "apogee" in found:
+        found["touchdown"] = events.Event("touchdown", t[-1], r[-1], v[-1])
+    return events.Summary(found)
+
+def resample(t_source, values, t):
+    """Linear interpolation of all channels at once onto other times. The
+     interval of each time is searched for once and shared by the channels.
+    Args:
+        t_source (np.array): Increasing times of the values.
+        values (np.array): Channels, shape (len(t_source), k).
+        t (np.array): Times to interpolate at.
+    Returns:
+        np.array: Channels at t, shape (len(t), k). NaN outside of t_source.
+    """
+    j = np.clip(np.searchsorted(t_source, t, side='right'), 1,
+        len(t_source)-1)
+    w = ((t - t_source[j-1])/(t_source[j] - t_source[j-1]))[:, None]
+    resampled = (1 - w)*values[j-1] + w*values[j]
+    resampled[(t < t_source[0]) | (t > t_source[-1])] = np.nan
+    return resampled
+
+def compare(flight, frame, rail_length=None):
+    """Error metrics of one simulated flight against its OpenRocket export.
+    Args:
+        flight (Trajectory): A launched Rocket or Trajectory, with summary.
+        frame (openrocket.Frame): The export.
+        rail_length (float): Length of the launch rail (m). Default to the
+            one in flight.inputs, or 5.0.
+    Returns:
+        dict: Value of each of FIELDS.
+    """
+    if rail_length is None:
+        rail_length = getattr(flight, "inputs", {}).get("rail_length", 5.0)
+    model = flight.summary
+    reference = openrocket_summary(frame, rail_length)
+    t_or, channels_or = openrocket_channels(frame)
+    #Only the time both are in the air is compared.
+    end = min(t_or[-1] if reference.flight_time is None
+        else reference.flight_time, flight.t[-1] if model.flight_time is None
+        else model.flight_time)
+    inside = flight.t <= end
+    error = (model_channels(flight)[inside]
+        - resample(t_or, channels_or, flight.t[inside]))
+    metrics = {}
+    for k, channel in enumerate(CHANNELS):
+        e = error[:, k][~np.isnan(error[:, k])]
+        metrics[f"{channel}_rms"] = np.sqrt(np.mean(e**2)) if len(e) else np.nan
+        metrics[f"{channel}_max"] = np.max(abs(e)) if len(e) else np.nan
+    metrics["apogee"] = (np.nan if None in (model.apogee, reference.apogee)
+        else model.apogee - reference.apogee)
+    metrics["landing"] = (np.nan if model.landing is None
+        or reference.landing is None
+        else np.hypot(*(model.landing - reference.landing)))
+    for name in events.EVENTS:
+        metrics[f"{name}_dt"] = (model[name].t - reference[name].t
+            if name in model and name in reference else np.nan)
+    return metrics
+
+def table(rows):
+    """Collect metrics in a structured array, one row per case.
+    Args:
+        rows (dict): Metrics by case name, see compare().
+    Returns:
+        np.array: Structured array with the field 'case' and FIELDS.
+    """
+    dtype = [("case", "U24")] + [(field, float) for field in FIELDS]
+    return np.array([(case,) + tuple(metrics[field] for field in FIELDS)
+        for case, metrics in rows.items()], dtype=dtype)
+
+def compare_cases(cases=None, max_workers=1, kernel="fast", **kwargs):
+    """Simulate the wind cases and compare each one to its OpenRocket export,
+     in one batch.
+    Args:
+        cases (list): Names of CASES to run. Default to all of them.
+        max_workers (int): Number of processes, see sweep.run_sweep().
+            Default to 1.
+        kernel (str): 'numpy' or 'fast', see Rocket.launch(). Use 'numpy'
+            together with integrator='rk45'. Default to 'fast'.
+        **kwargs: Input overriding INPUTS and LAUNCH_ANG, e.g. dt, cd or
+            integrator.
+    Returns:
+        np.array: Metrics of each case, see table().
+    """
+    if cases is None:
+        cases = list(CASES)
+    scenarios = []
+    for case in cases:
+        _, wind_speed, wind_ang = CASES[case]
+        scenario = dict(INPUTS, launch_ang=LAUNCH_ANG, wind_speed=wind_speed,
+            wind_ang=wind_ang)
+        scenario.update(kwargs)
+        scenarios.append(scenario)
+    flights = run_sweep(scenarios, max_workers, "touchdown", kernel)
+    return table({case:compare(flight, openrocket.load(CASES[case][0]))
+        for case, flight in zip(cases, flights)})
+
+def check(metrics, limits):
+    """Compare metrics to limits, for gating changes of the model.
+    Args:
+        metrics (np.array): Metrics, see table().
+        limits (dict): Largest allowed absolute value by field.
+    Returns:
+        list: Description of each value over its limit, empty if none.
+    """
+    failures = []
+    for row in metrics:
+        for field, limit in limits.items():
+            if not abs(row[field]) <= limit:
+                failures.append(f"{row['case']}: {field} = {row[field]:.4g}"
+                    f" exceeds {limit:.4g}")
+    return failures
+
+def format_table(metrics):
+    """Text table with one line per field and one column per case."""
+    width = max(14, *(len(case) + 1 for case in metrics["case"]))
+    lines = [f"{'':16}" + "".join(f"{case:>{width}}"
+        for case in metrics["case"])]
+    for field in FIELDS:
+        lines.append(f"{field:16}" + "".join(f"{value:>{width}.4g}"
+            for value in metrics[field]))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    print(format_table(compare_cases()))
@@ -0,0 +1,137 @@
+import numpy as np
+
+class Motor():
+    def __init__(self, t, thrust, name=""):
+        """Initialize class. A thrust curve, linear between its points, with
+         the cumulative impulse precomputed at every point. The propellant is
+         assumed to burn in proportion to the impulse delivered.
+        Args:
+            t (np.array): Increasing times (s). A curve that does not start at
+                0 s starts from zero thrust at 0 s.
+            thrust (np.array): Thrust at each time (N). Burnout is at the
+                last time.
+            name (str): Name of the motor. Default to ''.
+        """
+        t = np.asarray(t, dtype=np.float64)
+        thrust = np.asarray(thrust, dtype=np.float64)
+        if t[0] > 0:
+            t, thrust = np.concatenate(([0.0], t)), np.concatenate(([0.0],
+                thrust))
+        if np.any(np.diff(t) <= 0):
+            raise ValueError("The times of a thrust curve must increase.")
+        self.name = name
+        self.t = t
+        self.thrust_table = thrust
+        self.burntime = float(t[-1])
+        self.impulse_table = np.concatenate(([0.0], np.cumsum(
+            0.5*(thrust[1:] + thrust[:-1])*np.diff(t))))
+        self.total_impulse = float(self.impulse_table[-1])
+        self._slope = np.diff(thrust)/np.diff(t)
+        return
+
+    @classmethod
+    def load(cls, path):
+        """Read a thrust curve in the RASP (.eng) format: comment lines
+         starting with ';', a header line starting with the name of the motor,
+         and one line with time (s) and thrust (N) per point.
+        Args:
+            path (str): Path of the file.
+        Returns:
+            Motor: The motor.
+        """
+        name, points = None, []
+        with open(path) as file:
+            for line in file:
+                line = line.split(";")[0].strip()
+                if not line:
+                    continue
+                if name is None:
+                    name = line.split()[0]
+                else:
+                    points.append([float(x) for x in line.split()[:2]])
+        t, thrust = np.array(points).T
+        return cls(t, thrust, name)
+
+    @classmethod
+    def from_export(cls, frame):
+        """The thrust curve as simulated by OpenRocket, up to burnout.
+        Args:
+            frame (openrocket.Frame): An OpenRocket export.
+        Returns:
+            Motor: The motor.
+        """
+        t = np.asarray(frame["Time (s)"])
+        thrust = np.asarray(frame["Thrust (N)"])
+        end = np.flatnonzero(thrust > 0)[-1] + 2
+        return cls(t[:end], thrust[:end], "OpenRocket")
+
+    def _segment(self, t):
+        return np.clip(np.searchsorted(self.t, t, side='right')-1, 0,
+            len(self.t)-2)
+
+    def thrust(self, t):
+        """Thrust (N) at time t (s), a float or an array."""
+        k = self._segment(t)
+        thrust = self.thrust_table[k] + self._slope[k]*(t - self.t[k])
+        return np.where((t < 0) | (t >= self.burntime), 0.0, thrust)[()]
+
+    def impulse(self, t):
+        """Impulse (N s) delivered by time t (s), a float or an array."""
+        t = np.clip(t, 0, self.burntime)
+        k = self._segment(t)
+        dt = t - self.t[k]
+        return (self.impulse_table[k] + self.thrust_table[k]*dt
+            + 0.5*self._slope[k]*dt**2)
+
+    def burned(self, t):
+        """Fraction of the propellant burned by time t (s), a float or an
+         array."""
+        return self.impulse(t)/self.total_impulse
+
+    def cursor(self):
+        """A Cursor for evaluating the curve one time at a time."""
+        return Cursor(self)
+
+class Cursor():
+    def __init__(self, motor):
+        """Initialize class. Evaluates a thrust curve at single times. The
+         segment of the last time is remembered and moved from there, so a
+         simulation stepping forward in time never searches the curve.
+        Args:
+            motor (Motor): The motor.
+        """
+        self._t = motor.t.tolist()
+        self._thrust = motor.thrust_table.tolist()
+        self._impulse = motor.impulse_table.tolist()
+        self._slope = motor._slope.tolist()
+        self._total = motor.total_impulse
+        self._burntime = motor.burntime
+        self._k = 0
+        return
+
+    def _seek(self, t):
+        k, times = self._k, self._t
+        while k < len(times)-2 and t >= times[k+1]:
+            k += 1
+        while k > 0 and t < times[k]:
+            k -= 1
+        self._k = k
+        return k
+
+    def thrust(self, t):
+        """Thrust (N) at time t (s)."""
+        if t < 0 or t >= self._burntime:
+            return 0.0
+        k = self._seek(t)
+        return self._thrust[k] + self._slope[k]*(t - self._t[k])
+
+    def burned(self, t):
+        """Fraction of the propellant burned by time t (s)."""
+        if t <= 0:
+            return 0.0
+        if t >= self._burntime:
+            return 1.0
+        k = self._seek(t)
+        dt = t - self._t[k]
+        return (self._impulse[k] + self._thrust[k]*dt
+            + 0.5*self._slope[k]*dt*dt)/self._total
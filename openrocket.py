@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+#Where the exports are looked for, relative to the working directory and to
+#this file.
+SEARCH_DIRS = ("csv", ".")
+CACHE_DIR = ".orcache"
+#Columns used when comparing the model to OpenRocket.
+COLUMNS = ("Time (s)", "Altitude (m)", "Total velocity (m/s)",
+    "Total acceleration (m/s)", "Position East of launch (m)",
+    "Position North of launch (m)", "Vertical orientation (zenith) (rad)")
+
+class Frame():
+    def __init__(self, source, manifest, cache):
+        """Initialize class. The columns of one OpenRocket export, opened as
+         memory mapped arrays when first used.
+        Args:
+            source (str): Path of the csv-file.
+            manifest (dict): Description of the cache.
+            cache (str): Directory of the cache.
+        """
+        self.source = source
+        self.columns = manifest["header"]
+        self._manifest = manifest
+        self._cache = cache
+        self._arrays = {}
+        return
+
+    def __getitem__(self, column):
+        if column not in self._arrays:
+            if column not in self._manifest["files"]:
+                if column not in self.columns:
+                    raise KeyError(column)
+                _convert(self.source, self._cache, self._manifest, [column])
+            try:
+                array = self._open(column)
+            except (OSError, EOFError, ValueError):
+                #Removed or rewritten by another process, convert it again.
+                _convert(self.source, self._cache, self._manifest, [column])
+                array = self._open(column)
+            self._arrays[column] = array
+        return self._arrays[column]
+
+    def _open(self, column):
+        return np.load(os.path.join(self._cache,
+            self._manifest["files"][column]), mmap_mode='r')
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __len__(self):
+        return self._manifest["rows"]
+
+    def keys(self):
+        return list(self.columns)
+
+def find(name, roll=False):
+    """Find an OpenRocket export, in csv/ or next to the simulations.
+    Args:
+        name (str): Name of the file, with or without 'openrocket_' and
+            '.csv', e.g. '8mps90deg'.
+        roll (bool): The variant with 3 deg fin cant. Default to False.
+    Returns:
+        str: Path of the file.
+    """
+    stem = os.path.basename(name)
+    if stem.endswith(".csv"):
+        stem = stem[:-4]
+    if not stem.startswith("openrocket_"):
+        stem = "openrocket_" + stem
+    if roll and not stem.endswith("_roll"):
+        stem += "_roll"
+    here = os.path.dirname(os.path.abspath(__file__))
+    candidates = [name] if os.path.dirname(name) else []
+    for base in (os.getcwd(), here):
+        candidates += [os.path.join(base, folder, stem + ".csv")
+            for folder in SEARCH_DIRS]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    raise FileNotFoundError(f"No OpenRocket export '{stem}.csv' in "
+        f"{', '.join(SEARCH_DIRS)}.")
+
+def exists(name, roll=False):
+    """True if the OpenRocket export can be found, see find()."""
+    try:
+        find(name, roll)
+    except FileNotFoundError:
+        return False
+    return True
+
+def load(name, columns=COLUMNS, roll=False, cache_dir=None):
+    """Load an OpenRocket export. Each column is parsed from the csv-file
+     once and kept as a .npy-file, so later runs open it without parsing.
+     The cache is rebuilt when the csv-file changes.
+    Args:
+        name (str): See find().
+        columns (list): Columns to have ready. Others are converted when
+            first used. Default to COLUMNS.
+        roll (bool): The variant with 3 deg fin cant. Default to False.
+        cache_dir (str): Directory of the cache. Default to .orcache/ next to
+            the csv-file.
+    Returns:
+        Frame: The columns of the export.
+    """
+    source = find(name, roll)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source), CACHE_DIR)
+    cache = os.path.join(cache_dir, os.path.basename(source)[:-4])
+    manifest = _manifest(source, cache)
+    missing = [column for column in columns
+        if column not in manifest["files"]]
+    for column in missing:
+        if column not in manifest["header"]:
+            raise KeyError(column)
+    if missing:
+        _convert(source, cache, manifest, missing)
+    return Frame(source, manifest, cache)
+
+def _fingerprint(source):
+    stat = os.stat(source)
+    return {"mtime_ns":stat.st_mtime_ns, "size":stat.st_size}
+
+def _digest(source):
+    sha = hashlib.sha1()
+    with open(source, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _manifest(source, cache):
+    """Read the manifest of a cache, or start a new one if the csv-file has
+     changed since. An unchanged modification time and size is trusted,
+     otherwise the content hash decides.
+    """
+    path = os.path.join(cache, "manifest.json")
+    fingerprint = _fingerprint(source)
+    try:
+        with open(path) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = None
+    if manifest is not None:
+        if all(manifest[key] == value for key, value in fingerprint.items()):
+            return manifest
+        digest = _digest(source)
+        if manifest["sha1"] == digest:
+            manifest.update(fingerprint)
+            _write_manifest(cache, manifest)
+            return manifest
+        for stale in manifest["files"].values():
+            try:
+                os.remove(os.path.join(cache, stale))
+            except FileNotFoundError:
+                pass
+    else:
+        digest = _digest(source)
+    with open(source) as file:
+        header = file.readline().rstrip("\r\n").split(",")
+    manifest = dict(fingerprint, sha1=digest, header=header, rows=None,
+        files={})
+    os.makedirs(cache, exist_ok=True)
+    _write_manifest(cache, manifest)
+    return manifest
+
+def _write_manifest(cache, manifest):
+    _replace(os.path.join(cache, "manifest.json"), 'w',
+        lambda file: json.dump(manifest, file, indent=1))
+    return
+
+def _replace(path, mode, write):
+    """Write a file through a temporary file of its own and move it into
+     place, so processes sharing the cache only ever see whole files."""
+    handle, temporary = tempfile.mkstemp(suffix=".tmp",
+        dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, mode) as file:
+            write(file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return
+
+def _convert(source, cache, manifest, columns):
+    """Parse only the given columns of the csv-file and add them to the
+     cache."""
+    indices = [manifest["header"].index(column) for column in columns]
+    data = np.loadtxt(source, delimiter=",", skiprows=1, usecols=indices,
+        ndmin=2)
+    for j, column in enumerate(columns):
+        filename = f"{indices[j]}.npy"
+        values = np.ascontiguousarray(data[:, j])
+        _replace(os.path.join(cache, filename), 'wb',
+            lambda file: np.save(file, values))
+        manifest["files"][column] = filename
+    manifest["rows"] = len(data)
+    _write_manifest(cache, manifest)
+    return
@@ -0,0 +1,170 @@
+import time
+import numpy as np
+
+#Phases of the flight the time is attributed to.
+PHASES = ("rail", "burn", "coast", "descent")
+#Methods of the rocket that are timed by default, if it has them.
+COMPONENTS = ("step", "update", "kinematics", "rotation", "air_velocity",
+    "mass", "_density", "acceleration", "thrust", "thrust_force", "actuator",
+    "pid", "rotate", "drag", "lift", "weight", "find_events")
+#Marks an attribute that was not set on the rocket itself.
+_MISSING = object()
+
+class Profiler():
+    def __init__(self, rocket, components=COMPONENTS):
+        """Initialize class. Counts the calls of methods of a rocket and the
+         time spent in them, per phase of the flight. While attached, each
+         method is replaced by a timing wrapper set on the rocket itself;
+         detached the rocket is left exactly as it was, so profiling costs
+         nothing when not in use. The phase is that of the state of the last
+         call of update(), so the force models are broken down for the numpy
+         kernel and the 'rk45' integrator, not for the fast kernel which
+         inlines them.
+        Args:
+            rocket (Rocket): The rocket, e.g. a launchsim.Rocket or
+                TVC.Rocket_TVC.
+            components (touple): Names of the methods to time. Missing ones
+                are skipped. Default to COMPONENTS.
+        """
+        self.rocket = rocket
+        self.components = tuple(name for name in components
+            if hasattr(rocket, name))
+        self.phase = PHASES[0]
+        self.reset()
+        self._saved = None
+        return
+
+    def reset(self):
+        """Discard everything recorded so far."""
+        #Calls, time and time outside of nested timed calls (s) by phase and
+        #component, and the number of updates, the time steps, by phase.
+        self._records = {}
+        self._steps = dict.fromkeys(PHASES, 0)
+        self._stack = []
+        return
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, *exc):
+        self.detach()
+        return False
+
+    def attach(self):
+        """Start timing the components."""
+        if self._saved is not None:
+            return
+        self._saved = {}
+        for name in set(self.components) | {"update"}:
+            if not hasattr(self.rocket, name):
+                continue
+            self._saved[name] = self.rocket.__dict__.get(name, _MISSING)
+            setattr(self.rocket, name, self._wrap(name, getattr(self.rocket,
+                name)))
+        return
+
+    def detach(self):
+        """Stop timing and restore the methods of the rocket."""
+        if self._saved is None:
+            return
+        for name, saved in self._saved.items():
+            if saved is _MISSING:
+                delattr(self.rocket, name)
+            else:
+                setattr(self.rocket, name, saved)
+        self._saved = None
+        return
+
+    def phase_of(self, t, r, v):
+        """Phase of the flight of a state.
+        Args:
+            t (float): Time since initialization (s).
+            r (np.array): Positional vector (East, North, altitude, theta, phi).
+            v (np.array): Velocity vector (East, North, altitude, theta, phi).
+        Returns:
+            str: One of PHASES.
+        """
+        rocket = self.rocket
+        if np.sqrt(r.dot(r)) < rocket._rodlenght:
+            return "rail"
+        if t < rocket._burntime:
+            return "burn"
+        if v[2] >= 0:
+            return "coast"
+        return "descent"
+
+    def _wrap(self, name, method):
+        """Wrap a method in a timer, update() also tracking the phase."""
+        records, stack, steps = self._records, self._stack, self._steps
+        clock = time.perf_counter
+        timed = name in self.components
+        tracks = name == "update"
+
+        def wrapper(*args, **kwargs):
+            if tracks:
+                self.phase = self.phase_of(*args[:3])
+                steps[self.phase] += 1
+                if not timed:
+                    return method(*args, **kwargs)
+            stack.append(0.0)
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                inner = stack.pop()
+                record = records.setdefault((self.phase, name), [0, 0.0, 0.0])
+                record[0] += 1
+                record[1] += elapsed
+                record[2] += elapsed - inner
+                if stack:
+                    stack[-1] += elapsed
+
+        wrapper.__wrapped__ = method
+        return wrapper
+
+    def report(self):
+        """What was recorded, by phase and in total ('all').
+        Returns:
+            dict: For each phase the number of time steps ('steps') and, by
+                component, the number of calls ('calls'), the time spent in
+                the calls ('seconds') and the part of it not spent in other
+                timed calls ('self_seconds').
+        """
+        report = {phase:{"steps":self._steps[phase], "components":{}}
+            for phase in PHASES}
+        report["all"] = {"steps":sum(self._steps.values()), "components":{}}
+        for name in self.components:
+            for phase in PHASES:
+                record = self._records.get((phase, name))
+                if record is None:
+                    continue
+                for key in (phase, "all"):
+                    total = report[key]["components"].setdefault(name,
+                        {"calls":0, "seconds":0.0, "self_seconds":0.0})
+                    total["calls"] += record[0]
+                    total["seconds"] += record[1]
+                    total["self_seconds"] += record[2]
+        return report
+
+    def format_report(self, phases=PHASES + ("all",)):
+        """The report as a text table, with the time per step in
+         microseconds.
+        Args:
+            phases (touple): Phases to list. Default to all and the total.
+        Returns:
+            str: The table.
+        """
+        report = self.report()
+        lines = [f"{'phase':9}{'component':14}{'calls':>9}{'seconds':>10}"
+            f"{'self':>10}{'us/step':>10}"]
+        for phase in phases:
+            steps = report[phase]["steps"]
+            for name, total in sorted(report[phase]["components"].items(),
+                    key=lambda item: -item[1]["self_seconds"]):
+                per_step = 1e6*total["seconds"]/steps if steps else np.nan
+                lines.append(f"{phase:9}{name:14}{total['calls']:9d}"
+                    f"{total['seconds']:10.4f}{total['self_seconds']:10.4f}"
+                    f"{per_step:10.1f}")
+        return "\n".join(lines)
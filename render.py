@@ -0,0 +1,111 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import matplotlib.pyplot as plt
+import openrocket
+import store
+
+#Number of columns a line is decimated to. A figure of 12.8 inches at 100
+#dpi is 1280 pixels wide, and no subplot is wider than the figure.
+PIXELS = 1280
+
+def decimate(x, y, buckets=None):
+    """Reduce a line to the first and last point and the minimum and maximum
+     of each of a number of buckets, in their original order. Drawn at no
+     more than one bucket per pixel column this looks the same as the full
+     line.
+    Args:
+        x (np.array): Increasing x values.
+        y (np.array): y values.
+        buckets (int): Number of buckets. Default to PIXELS.
+    Returns:
+        np.array: Decimated x.
+        np.array: Decimated y.
+    """
+    if buckets is None:
+        buckets = PIXELS
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+    if n <= 4*buckets or y.ndim != 1:
+        return x, y
+    size = -(-n//buckets)
+    segments = -(-n//size)
+    padded = np.full(segments*size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(segments, size)
+    missing = np.isnan(padded)
+    base = np.arange(segments)*size
+    low = base + np.argmin(np.where(missing, np.inf, padded), axis=1)
+    high = base + np.argmax(np.where(missing, -np.inf, padded), axis=1)
+    keep = np.unique(np.concatenate(([0, n-1], np.minimum(low, n-1),
+        np.minimum(high, n-1))))
+    return x[keep], y[keep]
+
+def plot(x, y, *args, **kwargs):
+    """plt.plot() of one line, decimated with decimate()."""
+    x, y = decimate(x, y)
+    return plt.plot(x, y, *args, **kwargs)
+
+class Flight():
+    def __init__(self, i):
+        """Initialize class. Stands in for flight i of the dataset of a
+         render job.
+        Args:
+            i (int): Index of the flight in the dataset.
+        """
+        self.i = i
+        return
+
+class Export():
+    def __init__(self, name, roll=False, optional=False):
+        """Initialize class. Stands in for an OpenRocket export in a render
+         job, see openrocket.load().
+        Args:
+            name (str): Name of the export, e.g. '8mps90deg'.
+            roll (bool): The variant with 3 deg fin cant. Default to False.
+            optional (bool): Give None if it does not exist. Default to
+                False.
+        """
+        self.name = name
+        self.roll = roll
+        self.optional = optional
+        return
+
+def _resolve(arg, dataset):
+    if isinstance(arg, Flight):
+        return dataset[arg.i]
+    if isinstance(arg, Export):
+        if arg.optional and not openrocket.exists(arg.name, arg.roll):
+            return None
+        return openrocket.load(arg.name, roll=arg.roll)
+    return arg
+
+def _render(job, path):
+    """Draw one figure and save it, in a worker."""
+    function, args, filename = job
+    plt.switch_backend("Agg")
+    dataset = store.Dataset(path)
+    function(*[_resolve(arg, dataset) for arg in args])
+    plt.savefig(filename)
+    plt.close("all")
+    return filename
+
+def render(jobs, path, max_workers=None):
+    """Draw and save figures in parallel on the Agg backend. The flights are
+     read from a dataset on disk by each worker, memory mapped, instead of
+     being sent to it.
+    Args:
+        jobs (list): (function, args, filename) of each figure. The function
+            draws the figure from args, where Flight and Export stand in for
+            the flights of the dataset and the OpenRocket exports.
+        path (str): Directory of the dataset, see store.Dataset.
+        max_workers (int): Number of processes. Default to the number of
+            cores. With 1 the figures are drawn in this process.
+    Returns:
+        list: Filename of each figure.
+    """
+    task = partial(_render, path=path)
+    if max_workers == 1:
+        return [task(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(task, jobs))
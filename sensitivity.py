@@ -0,0 +1,258 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import dispersion
+from ensemble import Rocket_Ensemble, Rocket_TVC_Ensemble
+
+#Inputs whose influence is measured, by default.
+PARAMETERS = ("cd", "cl", "critical_angle", "hcm", "hcp", "thrustforce",
+    "burntime", "dry_mass", "wet_mass")
+#Outputs each flight is reduced to: apogee altitude (m), landing point
+#(m [East, North]) and the largest attitude error during the burn (deg),
+#the angle between the rocket and its launch direction.
+OUTPUTS = ("apogee", "landing_east", "landing_north", "attitude_error")
+STEP = 0.05 #Relative step of the one-at-a-time differences.
+RANGE = 0.1 #Relative half width of the uniform ranges of the Sobol samples.
+CHUNK = 64 #Flights simulated as one ensemble.
+RESAMPLES = 1000 #Bootstrap resamples of the confidence intervals.
+CONFIDENCE = 0.95
+#An output whose spread over the flights of an analysis is below FLAT times
+#its scale does not vary, e.g. the cross range of a flight in a plane, and
+#its indices are NaN rather than shares of roundoff.
+FLAT = 1e-9
+
+def flat(outputs):
+    """Whether each output does not vary over the flights.
+    Args:
+        outputs (np.array): OUTPUTS of the flights, shape (..., len(OUTPUTS)).
+    Returns:
+        np.array: True where the output is flat, shape (len(OUTPUTS),).
+    """
+    outputs = outputs.reshape(-1, outputs.shape[-1])
+    return (np.std(outputs, axis=0)
+        < FLAT*(1 + np.abs(np.mean(outputs, axis=0))))
+
+def reduce(flight, burntime):
+    """Reduce a flight to OUTPUTS.
+    Args:
+        flight (Trajectory): The flight.
+        burntime (float): Burntime of the rocket (s).
+    Returns:
+        np.array: Value of each of OUTPUTS.
+    """
+    metrics = dict(zip(dispersion.METRICS, dispersion.reduce(flight)))
+    burn = flight.t < burntime
+    pitch, yaw = flight.r[0, 3:]
+    direction = np.array((np.sin(yaw)*np.cos(pitch), -np.sin(pitch),
+        np.cos(yaw)*np.cos(pitch)))
+    pitch, yaw = flight.r[burn, 3], flight.r[burn, 4]
+    axis = np.stack((np.sin(yaw)*np.cos(pitch), -np.sin(pitch),
+        np.cos(yaw)*np.cos(pitch)), axis=1)
+    error = np.degrees(np.max(np.arccos(np.clip(axis @ direction, -1, 1))))
+    return np.array((metrics["apogee"], metrics["landing_east"],
+        metrics["landing_north"], error))
+
+def run_chunk(scenarios):
+    """Simulate scenarios as one ensemble and reduce them.
+    Args:
+        scenarios (list): Scenarios with the same keys, see sweep.build().
+    Returns:
+        np.array: OUTPUTS of each flight, shape (len(scenarios),
+            len(OUTPUTS)).
+    """
+    if "kp" in scenarios[0]:
+        ensemble = Rocket_TVC_Ensemble.from_scenarios(scenarios)
+    else:
+        ensemble = Rocket_Ensemble.from_scenarios(scenarios)
+    ensemble.launch()
+    return np.array([reduce(ensemble.member(i), ensemble._burntime[i])
+        for i in range(len(scenarios))])
+
+def evaluate(scenarios, max_workers=1, chunk=CHUNK):
+    """Simulate a batch of scenarios in chunks, each chunk as one ensemble.
+    Args:
+        scenarios (list): Scenarios with the same keys, see sweep.build().
+        max_workers (int): Number of processes, None for the number of
+            cores. Default to 1, in this process.
+        chunk (int): Flights per ensemble. Default to CHUNK.
+    Returns:
+        np.array: OUTPUTS of each flight, shape (len(scenarios),
+            len(OUTPUTS)).
+    """
+    chunks = [scenarios[k:k+chunk] for k in range(0, len(scenarios), chunk)]
+    if max_workers == 1:
+        results = list(map(run_chunk, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(run_chunk, chunks))
+    return np.concatenate(results)
+
+def oat(base, parameters=PARAMETERS, step=STEP, max_workers=1):
+    """One-at-a-time sensitivities. Each parameter is moved by a relative
+     step up and down with the others at their base value, and the central
+     difference gives its effect: the change of an output per relative
+     change of the parameter. The 2P+1 flights run as one batch, and the
+     baseline is shared by all parameters and outputs.
+    Args:
+        base (dict): Base scenario, see sweep.build().
+        parameters (touple): Inputs to perturb. Default to PARAMETERS.
+        step (float): Relative step. Default to STEP.
+        max_workers (int): See evaluate(). Default to 1.
+    Returns:
+        dict: 'baseline', the OUTPUTS of the base scenario, shape (O,);
+            'effect', in units of the output, shape (P, O); 'index', the
+            share of each parameter in the sum of the absolute effects on
+            an output; 'low' and 'high', the index from the smaller and the
+            larger of the forward and backward differences, which differ
+            where the output is not linear over the step. The indices of
+            flat outputs, see flat(), are NaN.
+    """
+    scenarios = [dict(base)]
+    for name in parameters:
+        for sign in (1, -1):
+            scenarios.append(dict(base, **{name:base[name]*(1 + sign*step)}))
+    outputs = evaluate(scenarios, max_workers)
+    baseline = outputs[0]
+    up, down = outputs[1::2] - baseline, baseline - outputs[2::2]
+    effect = (up + down)/(2*step)
+    one_sided = np.abs(np.stack((up, down)))/step
+
+    def share(x):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return x/np.sum(x, axis=-2, keepdims=True)
+
+    #The others at their central effect while one is at either bound.
+    central = np.abs(effect)
+    others = np.sum(central, axis=0) - central
+    bounds = one_sided/(one_sided + others)
+    index, low, high = share(central), bounds.min(axis=0), bounds.max(axis=0)
+    still = flat(outputs)
+    for x in (index, low, high):
+        x[:, still] = np.nan
+    return {"parameters":tuple(parameters), "baseline":baseline,
+        "effect":effect, "index":index, "low":low, "high":high}
+
+def saltelli(base, parameters, spread, rng, samples):
+    """The scenarios of the Saltelli scheme: two independent samples A and B
+     of the parameters, uniform within their ranges, and for each parameter
+     A with that column taken from B.
+    Args:
+        base (dict): Base scenario, see sweep.build().
+        parameters (touple): Inputs to sample.
+        spread (float or dict): Relative half width of the range, per
+            parameter if a dict.
+        rng (np.random.Generator): Random numbers.
+        samples (int): Number of rows N of A and B.
+    Returns:
+        list: The N(P+2) scenarios, A, B, then each AB_i.
+    """
+    width = np.array([spread[name] if isinstance(spread, dict) else spread
+        for name in parameters])
+    center = np.array([base[name] for name in parameters])
+    a, b = center*(1 + width*rng.uniform(-1, 1, (2, samples,
+        len(parameters))))
+    blocks = [a, b]
+    for i in range(len(parameters)):
+        ab = a.copy()
+        ab[:, i] = b[:, i]
+        blocks.append(ab)
+    return [dict(base, **dict(zip(parameters, map(float, row))))
+        for block in blocks for row in block]
+
+def _indices(a, b, ab, rows):
+    """First order (Saltelli 2010) and total (Jansen) indices from the
+     outputs of A, B and the AB_i, taking the given rows of the samples.
+    Args:
+        a (np.array): Outputs of A, shape (N, O).
+        b (np.array): Outputs of B, shape (N, O).
+        ab (np.array): Outputs of each AB_i, shape (P, N, O).
+        rows (np.array): Rows to use, shape (R, N) for R resamples.
+    Returns:
+        np.array: First order indices, shape (R, P, O).
+        np.array: Total indices, shape (R, P, O).
+    """
+    a, b = a[rows], b[rows]
+    variance = np.var(np.concatenate((a, b), axis=1), axis=1)
+    first = np.empty((len(rows), len(ab), a.shape[-1]))
+    total = np.empty_like(first)
+    for i in range(len(ab)):
+        abi = ab[i][rows]
+        first[:, i] = np.mean(b*(abi - a), axis=1)
+        total[:, i] = 0.5*np.mean((a - abi)**2, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return first/variance[:, None], total/variance[:, None]
+
+def sobol(base, parameters=PARAMETERS, spread=RANGE, samples=256, seed=0,
+          resamples=RESAMPLES, confidence=CONFIDENCE, max_workers=1):
+    """Variance based sensitivities. The parameters are drawn uniformly
+     within their ranges around the base values, all N(P+2) flights of the
+     Saltelli scheme run as one batch, and every output is reduced from the
+     same flights. Confidence intervals are bootstrapped by resampling the
+     rows.
+    Args:
+        base (dict): Base scenario, see sweep.build().
+        parameters (touple): Inputs to sample. Default to PARAMETERS.
+        spread (float or dict): Relative half width of the range, per
+            parameter if a dict. Default to RANGE.
+        samples (int): Number of rows N of the samples. Default to 256.
+        seed (int): Seed of the samples and the bootstrap. Default to 0.
+        resamples (int): Bootstrap resamples. Default to RESAMPLES.
+        confidence (float): Level of the intervals. Default to CONFIDENCE.
+        max_workers (int): See evaluate(). Default to 1.
+    Returns:
+        dict: 'first' and 'total', the first order and total indices, the
+            share of the variance of an output due to the parameter alone
+            and with all its interactions, shape (P, O); 'first_low',
+            'first_high', 'total_low' and 'total_high', their confidence
+            intervals; 'mean' and 'std' of the outputs, shape (O,). The
+            indices of flat outputs, see flat(), are NaN.
+    """
+    rng = np.random.default_rng(seed)
+    scenarios = saltelli(base, parameters, spread, rng, samples)
+    outputs = evaluate(scenarios, max_workers).reshape(len(parameters)+2,
+        samples, len(OUTPUTS))
+    a, b, ab = outputs[0], outputs[1], outputs[2:]
+    everything = np.arange(samples)[None]
+    first, total = [x[0] for x in _indices(a, b, ab, everything)]
+    rows = rng.integers(0, samples, (resamples, samples))
+    tail = 100*(1 - confidence)/2
+    result = {"parameters":tuple(parameters), "first":first, "total":total,
+        "mean":np.mean(outputs[:2], axis=(0, 1)),
+        "std":np.std(outputs[:2], axis=(0, 1))}
+    for name, boot in zip(("first", "total"), _indices(a, b, ab, rows)):
+        low, high = np.nanpercentile(boot, (tail, 100 - tail), axis=0)
+        result[name + "_low"], result[name + "_high"] = low, high
+    still = flat(outputs[:2])
+    for name in ("first", "total"):
+        for key in (name, name + "_low", name + "_high"):
+            result[key][:, still] = np.nan
+    return result
+
+def format_indices(result, index="index"):
+    """Text table of the indices of oat() or sobol(), one column per
+     output, with the interval, n/a for flat outputs.
+    Args:
+        result (dict): Result of oat() or sobol().
+        index (str): 'index' of oat(), 'first' or 'total' of sobol().
+            Default to 'index'.
+    Returns:
+        str: The table.
+    """
+    low, high = (("low", "high") if index == "index" else
+        (index + "_low", index + "_high"))
+    lines = [f"{'parameter':16}" + "".join(f"{name:>24}" for name in OUTPUTS)]
+    for i, name in enumerate(result["parameters"]):
+        lines.append(f"{name:16}" + "".join(f"{'n/a':>24}"
+            if np.isnan(result[index][i, j]) else
+            f"{result[index][i, j]:8.3f} [{result[low][i, j]:6.3f},"
+            f"{result[high][i, j]:6.3f}]" for j in range(len(OUTPUTS))))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    from results import GAINS
+
+    base = dict(dispersion.NOMINAL, **GAINS)
+    print("One at a time, share of the effects:")
+    print(format_indices(oat(base)))
+    result = sobol(base, samples=64)
+    print("Sobol, total indices:")
+    print(format_indices(result, "total"))
@@ -0,0 +1,414 @@
+import math
+import numpy as np
+
+#Points of the flight the attitude dynamics are linearized at.
+TRIMS = ("rail_exit", "max_q", "burnout")
+STEP = 1e-6 #Step of the central differences (rad, rad/s).
+FREQUENCIES = 256 #Number of frequencies the loops are evaluated at.
+DECADES = 4 #Decades of frequencies below the Nyquist frequency.
+CHUNK = 1024 #Gains whose margins are computed at once, to bound the memory.
+#Ways the plant is sampled: the exact zero-order hold of the linear dynamics,
+#or the modified Forward Euler step of the simulator itself.
+METHODS = ("zoh", "euler")
+
+class Trim():
+    def __init__(self, name, t, r, v, u, a, b, ts, dt):
+        """Initialize class. The attitude dynamics of a rocket with TVC
+         linearized at a state of its flight, x' = a x + b u. The state x is
+         the deviation of pitch, yaw, pitch rate and yaw rate, followed by the
+         angle of the thrust vector (pitch, yaw) if the servo lags, and the
+         input u is the deviation of the commanded angle of the thrust vector
+         (rad). The translational state is held, as the attitude is much
+         faster.
+        Args:
+            name (str): Name of the point, one of TRIMS.
+            t (float): Time since initialization (s).
+            r (np.array): Positional vector (East, North, altitude, pitch, yaw).
+            v (np.array): Velocity vector (East, North, altitude, pitch, yaw).
+            u (np.array): Angle of the thrust vector at the state
+                (rad [pitch, yaw]).
+            a (np.array): State matrix, shape (n, n).
+            b (np.array): Input matrix, shape (n, 2).
+            ts (float): Sample time of the controller (s).
+            dt (float): Time step of the rocket (s).
+        """
+        self.name = name
+        self.t = t
+        self.r = r
+        self.v = v
+        self.u = u
+        self.a = a
+        self.b = b
+        self.ts = ts
+        self.dt = dt
+        return
+
+    def __repr__(self):
+        return (f"Trim({self.name!r}, t={self.t:.3f} s, "
+            f"altitude={self.r[2]:.1f} m)")
+
+def trim_times(rocket, names=TRIMS):
+    """Times of the trim points of a flight: the first time step off the
+     rail, the time step of maximum dynamic pressure while the TVC acts, and
+     the end of the burn. The TVC acts on the time steps a whole sample time
+     of the controller before burnout, as the sampled models hold the thrust
+     vector for a whole sample time; the burnout point is the last of them.
+     A point at the time of an earlier one, e.g. the maximum dynamic
+     pressure of a rocket still accelerating at burnout, is left out.
+    Args:
+        rocket (Rocket): A launched rocket.
+        names (touple): Trim points, out of TRIMS. Default to TRIMS.
+    Returns:
+        dict: Time (s) by name.
+    """
+    t = rocket.t
+    ts = getattr(rocket, "_ts", rocket._dt)
+    end = int(np.searchsorted(t, rocket._burntime - ts + 1e-9, side='right'))
+    times = {}
+    for name in names:
+        if name == "rail_exit":
+            i = int(np.searchsorted(t, rocket.summary["rail_exit"].t))
+        elif name == "burnout":
+            i = end-1
+        elif name == "max_q":
+            q = np.array([0.5*rocket._rho[j]*np.sum((rocket.v[j, :3] -
+                rocket.air_velocity(t[j], rocket.r[j, 2]))**2)
+                for j in range(end)])
+            i = int(np.argmax(q))
+        else:
+            raise ValueError(f"Unknown trim point '{name}'.")
+        if float(t[i]) not in times.values():
+            times[name] = float(t[i])
+    return times
+
+def linearize(rocket, t, name=None, step=STEP, kernel="numpy"):
+    """Linearize the attitude dynamics of a rocket with TVC at a time step of
+     its flight, by central differences of acceleration() and of thrust()
+     with the angle of the thrust vector set in place of actuator(). A
+     lagging servo adds its angle to the state, the rate limit of the servo
+     is left out.
+    Args:
+        rocket (Rocket_TVC): The rocket, not yet flown past t. It is advanced
+            to the last time step at or before t and left there.
+        t (float): Time since initialization (s).
+        name (str): Name of the point. Default to None.
+        step (float): Step of the central differences. Default to STEP.
+        kernel (str): Kernel to advance the rocket with, see
+            Rocket.launch(). Default to 'numpy'.
+    Returns:
+        Trim: The linearized dynamics.
+    """
+    if not hasattr(rocket, "actuator"):
+        raise TypeError("Only a rocket with TVC is linearized.")
+    rocket.advance(t, kernel)
+    i = rocket._steps
+    t, r, v = float(rocket.t[i]), rocket.r[i].copy(), rocket.v[i].copy()
+    state = rocket.snapshot()
+    #The angle the thrust vector would have in the next time step.
+    u = np.array(rocket.actuator(t, r), dtype=np.float64)
+    rocket.restore(state)
+
+    def angular(dr, dv, du):
+        held = u + du
+        rocket.actuator = lambda t, r: held
+        rocket._i = i
+        rocket.update(t, r + dr, v + dv, i=i)
+        return rocket.acceleration(t, r + dr, v + dv, rocket._kin)[3:]
+
+    #Derivatives by pitch and yaw, their rates and the thrust vector.
+    jacobians = np.zeros((3, 2, 2))
+    try:
+        for k in range(2):
+            for j in range(3):
+                delta = np.zeros((3, 5))
+                delta[j, 3+k] = step
+                plus = angular(delta[0], delta[1], delta[2, 3:])
+                minus = angular(-delta[0], -delta[1], -delta[2, 3:])
+                jacobians[j, :, k] = (plus - minus)/(2*step)
+    finally:
+        if "actuator" in rocket.__dict__:
+            del rocket.actuator
+        rocket.restore(state)
+
+    lag = rocket._servo_lag
+    n = 4 if lag is None else 6
+    a, b = np.zeros((n, n)), np.zeros((n, 2))
+    a[:2, 2:4] = np.eye(2)
+    a[2:4, :2], a[2:4, 2:4] = jacobians[0], jacobians[1]
+    if lag is None:
+        b[2:4] = jacobians[2]
+    else:
+        a[2:4, 4:6] = jacobians[2]
+        a[4:6, 4:6] = -np.eye(2)/lag
+        b[4:6] = np.eye(2)/lag
+    return Trim(name, t, r, v, u, a, b, rocket._ts, rocket._dt)
+
+def trim_points(rocket, names=TRIMS, kernel="fast"):
+    """Fly a rocket with TVC and linearize it at its trim points. The
+     rocket itself is left as it is.
+    Args:
+        rocket (Rocket_TVC): The rocket, not yet launched.
+        names (touple): Trim points, out of TRIMS. Default to TRIMS.
+        kernel (str): Kernel to fly with, see Rocket.launch(). Default to
+            'fast'.
+    Returns:
+        list: Trim of each name, see trim_times().
+    """
+    probe = rocket.fork(1)[0]
+    probe.launch(kernel=kernel)
+    times = trim_times(probe, names)
+    flight = rocket.fork(1)[0]
+    trims = {}
+    for name in sorted(times, key=times.get):
+        trims[name] = linearize(flight, times[name], name, kernel=kernel)
+    return [trims[name] for name in names if name in trims]
+
+def expm(m):
+    """Matrix exponential, by scaling and squaring of the Taylor series."""
+    norm = np.max(np.sum(np.abs(m), axis=0))
+    squarings = max(0, int(math.ceil(math.log2(norm)))+1) if norm > 0 else 0
+    x = m/2**squarings
+    result = term = np.eye(len(m))
+    for k in range(1, 20):
+        term = term @ x/k
+        result = result + term
+    for _ in range(squarings):
+        result = result @ result
+    return result
+
+def discretize(a, b, ts):
+    """Zero-order hold equivalent of x' = a x + b u, the input held for a
+     sample time: x[k+1] = phi x[k] + gamma u[k].
+    Args:
+        a (np.array): State matrix, shape (n, n).
+        b (np.array): Input matrix, shape (n, m).
+        ts (float): Sample time (s).
+    Returns:
+        np.array: phi, shape (n, n).
+        np.array: gamma, shape (n, m).
+    """
+    n, m = b.shape
+    block = np.zeros((n+m, n+m))
+    block[:n, :n], block[:n, n:] = a*ts, b*ts
+    block = expm(block)
+    return block[:n, :n], block[:n, n:]
+
+def euler(trim, ts):
+    """The plant sampled the way the simulator steps it: the modified
+     Forward Euler step of Rocket.step(), the servo moving first, repeated
+     for the time steps the input is held.
+    Args:
+        trim (Trim): The linearized dynamics.
+        ts (float): Sample time (s), a multiple of the time step.
+    Returns:
+        np.array: phi, shape (n, n).
+        np.array: gamma, shape (n, 2).
+    """
+    steps = int(round(ts/trim.dt))
+    if steps < 1 or abs(steps*trim.dt - ts) > 1e-9*ts:
+        raise ValueError("The sample time must be a multiple of the time "
+            "step.")
+    a, b, dt = trim.a, trim.b, trim.dt
+    n = len(a)
+    #The servo first, then the velocity and the position with the new
+    #velocity.
+    step, hold = np.eye(n), np.zeros((n, 2))
+    if n > 4:
+        step[4:6, 4:6] = np.exp(dt*a[4:6, 4:6].diagonal())*np.eye(2)
+        hold[4:6] = np.eye(2) - step[4:6, 4:6]
+    step[2:4] += dt*(a[2:4] @ step)
+    hold[2:4] = dt*(a[2:4] @ hold + b[2:4])
+    step[:2] += dt*step[2:4]
+    hold[:2] = dt*hold[2:4]
+    phi, gamma = np.eye(n), np.zeros((n, 2))
+    for _ in range(steps):
+        phi, gamma = step @ phi, step @ gamma + hold
+    return phi, gamma
+
+def _gains(kp, ki, kd):
+    """The gains as float arrays of one shape."""
+    return np.broadcast_arrays(*[np.asarray(x, dtype=np.float64)
+        for x in (kp, ki, kd)])
+
+def closed_loop(phi, gamma, kp, ki, kd, ts):
+    """Transition matrices of the sampled loop of the plant and the PID of
+     Rocket_TVC.pid(), without the limit of the thrust vector. The state is
+     the plant, the integral of the error and the error of the sample
+     before.
+    Args:
+        phi (np.array): Discrete state matrix, shape (n, n).
+        gamma (np.array): Discrete input matrix, shape (n, 2).
+        kp (float or np.array): proportional coefficient.
+        ki (float or np.array): integral coefficient.
+        kd (float or np.array): derivative coefficient.
+        ts (float): Sample time (s).
+    Returns:
+        np.array: Transition matrices, shape (gains shape) + (n+4, n+4).
+    """
+    kp, ki, kd = _gains(kp, ki, kd)
+    n = len(phi)
+    c = np.eye(2, n)
+    gain = (kp + ki*ts + kd)[..., None, None]
+    m = np.zeros(kp.shape + (n+4, n+4))
+    m[..., :n, :n] = phi - gain*(gamma @ c)
+    m[..., :n, n:n+2] = ki[..., None, None]*gamma
+    m[..., :n, n+2:] = -kd[..., None, None]*gamma
+    m[..., n:n+2, :n] = -ts*c
+    m[..., n:n+2, n:n+2] = np.eye(2)
+    m[..., n+2:, :n] = -c
+    return m
+
+def frequency_response(phi, gamma, ts, frequencies=FREQUENCIES):
+    """Frequency response of the sampled plant from the thrust vector to
+     pitch and yaw, up to the Nyquist frequency.
+    Args:
+        phi (np.array): Discrete state matrix, shape (n, n).
+        gamma (np.array): Discrete input matrix, shape (n, 2).
+        ts (float): Sample time (s).
+        frequencies (int): Number of frequencies. Default to FREQUENCIES.
+    Returns:
+        np.array: Frequencies (rad/s), shape (W,).
+        np.array: Response, shape (W, 2, 2).
+    """
+    nyquist = np.pi/ts
+    w = np.logspace(math.log10(nyquist)-DECADES, math.log10(nyquist),
+        frequencies)
+    z = np.exp(1j*w*ts)
+    resolvent = np.linalg.solve(z[:, None, None]*np.eye(len(phi)) - phi,
+        np.broadcast_to(gamma.astype(complex), (len(w),) + gamma.shape))
+    return w, resolvent[:, :2, :]
+
+def _interpolate(x0, x1, f):
+    return x0 + f*(x1 - x0)
+
+def _crossings(w, loops):
+    """margins() of loops evaluated at frequencies w, shape (..., len(w))."""
+    l0, l1 = loops[..., :-1], loops[..., 1:]
+    #Phase crossovers, where the loop crosses the negative real axis.
+    cross = np.signbit(l0.imag) != np.signbit(l1.imag)
+    f = l0.imag/np.where(cross, l0.imag - l1.imag, 1)
+    real = _interpolate(l0, l1, f).real
+    factor = np.where(cross & (real < 0), -1/np.where(real < 0, real, -1),
+        np.nan)
+    upper = np.where(factor > 1, factor, np.inf).min(axis=-1)
+    lower = np.where(factor < 1, factor, 0).max(axis=-1)
+
+    #Gain crossovers, the one closest to -1 counts.
+    magnitude = np.log(np.abs(loops))
+    m0, m1 = magnitude[..., :-1], magnitude[..., 1:]
+    cross = (np.signbit(m0) != np.signbit(m1)) & np.isfinite(m0 - m1)
+    f = m0/np.where(cross, m0 - m1, 1)
+    phase = np.where(cross, np.degrees(np.angle(-_interpolate(l0, l1, f))),
+        np.inf)
+    j = np.argmin(np.abs(phase), axis=-1)[..., None]
+    crossover = np.where(cross, _interpolate(w[:-1], w[1:], f), np.nan)
+    return {"gain_margin":20*np.log10(upper),
+        "lower_gain_margin":20*np.log10(lower),
+        "phase_margin":np.take_along_axis(phase, j, -1)[..., 0],
+        "crossover":np.take_along_axis(crossover, j, -1)[..., 0]}
+
+def margins(phi, gamma, kp, ki, kd, ts, frequencies=FREQUENCIES):
+    """Gain and phase margins of the pitch and yaw loops of the PID, each
+     broken at the plant input with the other loop closed. The gains are
+     evaluated CHUNK at a time.
+    Args:
+        phi (np.array): Discrete state matrix, shape (n, n).
+        gamma (np.array): Discrete input matrix, shape (n, 2).
+        kp (float or np.array): proportional coefficient.
+        ki (float or np.array): integral coefficient.
+        kd (float or np.array): derivative coefficient.
+        ts (float): Sample time (s).
+        frequencies (int): Number of frequencies. Default to FREQUENCIES.
+    Returns:
+        dict: With the shape of the gains + (2,): 'gain_margin', the factor
+            on the gain the loop is unstable at (dB), inf if none,
+            'lower_gain_margin', the same for a reduced gain (dB), -inf if
+            none, 'phase_margin' (deg), of the crossing of gain one closest
+            to -1, inf if there is none, and 'crossover', its frequency
+            (rad/s).
+    """
+    kp, ki, kd = _gains(kp, ki, kd)
+    shape = kp.shape
+    kp, ki, kd = kp.ravel(), ki.ravel(), kd.ravel()
+    w, p = frequency_response(phi, gamma, ts, frequencies)
+    z = np.exp(1j*w*ts)
+    result = {name:np.empty((len(kp), 2)) for name in ("gain_margin",
+        "lower_gain_margin", "phase_margin", "crossover")}
+    for start in range(0, len(kp), CHUNK):
+        part = slice(start, start+CHUNK)
+        k = (kp[part, None] + ki[part, None]*ts*z/(z - 1) +
+            kd[part, None]*(1 - 1/z))
+        loops = np.empty(k.shape[:1] + (2, len(w)), dtype=complex)
+        for j in range(2):
+            o = 1-j
+            plant = p[:, j, j] - p[:, j, o]*k*p[:, o, j]/(1 + k*p[:, o, o])
+            loops[:, j] = k*plant
+        with np.errstate(all='ignore'):
+            for name, value in _crossings(w, loops).items():
+                result[name][part] = value
+    return {name:value.reshape(shape + (2,))
+        for name, value in result.items()}
+
+def analyze(trims, kp, ki, kd, rate=None, method="zoh",
+            frequencies=FREQUENCIES):
+    """Closed loop poles and stability margins of grids of PID gains at
+     trim points, all gains at once.
+    Args:
+        trims (list): Trim points, see trim_points().
+        kp (float or np.array): proportional coefficient.
+        ki (float or np.array): integral coefficient.
+        kd (float or np.array): derivative coefficient. The gains are
+            broadcast against each other, e.g. np.meshgrid() of the grid.
+        rate (float): Sample rate of the controller (Hz). Default to that
+            of the rocket the trims are of.
+        method (str): How the plant is sampled, one of METHODS: 'zoh' for
+            the attitude dynamics themselves, 'euler' for the flight the
+            simulator computes with its time step. Default to 'zoh'.
+        frequencies (int): Number of frequencies of the margins. Default to
+            FREQUENCIES.
+    Returns:
+        dict: By name of the trim point, a dict with the Trim ('trim'), the
+            poles of the sampled loop ('poles', shape (gains shape) +
+            (n+4,)), their continuous equivalents ('s_poles', 1/s), whether
+            all poles are inside the unit circle ('stable') and the
+            margins() of pitch and yaw.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}'.")
+    report = {}
+    for trim in trims:
+        ts = trim.ts if rate is None else 1/rate
+        if method == "euler":
+            phi, gamma = euler(trim, ts)
+        else:
+            phi, gamma = discretize(trim.a, trim.b, ts)
+        poles = np.linalg.eigvals(closed_loop(phi, gamma, kp, ki, kd, ts))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s_poles = np.log(poles.astype(complex))/ts
+        report[trim.name] = {"trim":trim, "poles":poles, "s_poles":s_poles,
+            "stable":np.abs(poles).max(axis=-1) < 1,
+            **margins(phi, gamma, kp, ki, kd, ts, frequencies)}
+    return report
+
+if __name__ == "__main__":
+    import time
+    from TVC import Rocket_TVC
+    from results import INPUTS, GAINS
+
+    rocket = Rocket_TVC(**GAINS, **dict(INPUTS, wind_speed=8, wind_ang=90))
+    trims = trim_points(rocket)
+    kp, kd = np.meshgrid(np.geomspace(1, 1000, 100), np.geomspace(0.1, 300,
+        100), indexing='ij')
+    start = time.perf_counter()
+    report = analyze(trims, kp, GAINS["ki"], kd)
+    elapsed = time.perf_counter() - start
+    print(f"{kp.size} gains at {len(trims)} trim points in "
+        f"{1e3*elapsed:.1f} ms")
+    nominal = analyze(trims, **GAINS)
+    for name, result in report.items():
+        single = nominal[name]
+        verdict = "stable" if single["stable"] else "unstable"
+        print(f"{result['trim']}: {result['stable'].mean():.0%} of the grid "
+            f"stable, nominal gains {verdict}, gain margin "
+            f"{single['gain_margin'][0]:.1f} dB, phase margin "
+            f"{single['phase_margin'][0]:.1f} deg")
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import numpy as np
+import events
+from trajectory import Trajectory
+
+#Channels of a flight, in the order of the arguments of Trajectory, and the
+#shape of one time step of each.
+CHANNELS = {"t":(), "r":(5,), "v":(5,), "a":(5,), "m":(), "rho":(),
+    "angle_attack":(3,), "fthrust":(3,), "fdrag":(3,), "flift":(3,)}
+INDEX = "index.json"
+
+class Dataset():
+    def __init__(self, path):
+        """Initialize class. Flights stored on disk as one raw float64 file
+         per channel, with the time steps of all flights one after another,
+         and an index with the input, the events and the rows of each flight.
+         The channel files are memory mapped, so only the parts that are
+         actually read are loaded. The directory is created if it does not
+         exist.
+        Args:
+            path (str): Directory of the dataset.
+        """
+        self.path = path
+        self._maps = {}
+        index = os.path.join(path, INDEX)
+        if os.path.isfile(index):
+            with open(index) as file:
+                self.index = json.load(file)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.index = {"channels":{name:list(shape)
+                for name, shape in CHANNELS.items()}, "rows":0, "runs":[]}
+        return
+
+    def __len__(self):
+        return len(self.index["runs"])
+
+    def __getitem__(self, i):
+        """Flight i, as a Trajectory of memory mapped views."""
+        run = self.index["runs"][i]
+        rows = slice(run["start"], run["start"] + run["length"])
+        return Trajectory(*[self.channel(name)[rows] for name in CHANNELS],
+            inputs=run["inputs"], summary=_summary(run["events"]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def channel(self, name):
+        """All rows of one channel.
+        Args:
+            name (str): One of CHANNELS.
+        Returns:
+            np.memmap: Read only, shape (rows, *CHANNELS[name]).
+        """
+        if name not in self._maps:
+            shape = (self.index["rows"],) + tuple(
+                self.index["channels"][name])
+            if self.index["rows"] == 0:
+                return np.empty(shape)
+            self._maps[name] = np.memmap(self._file(name), dtype=np.float64,
+                mode='r', shape=shape)
+        return self._maps[name]
+
+    def append(self, flight):
+        """Append one flight, see extend()."""
+        self.extend([flight])
+        return
+
+    def extend(self, flights):
+        """Append flights. The channel files are written first and the index
+         last, so an interrupted append leaves the dataset as it was.
+        Args:
+            flights (list): Trajectory or launched Rocket of each flight.
+        """
+        flights = [flight if isinstance(flight, Trajectory)
+            else Trajectory.from_rocket(flight) for flight in flights]
+        for name, shape in CHANNELS.items():
+            size = self.index["rows"]*int(np.prod(shape, dtype=int))*8
+            with open(self._file(name), 'ab') as file:
+                #Anything after the indexed rows is left over from an
+                #interrupted append.
+                file.truncate(size)
+                for flight in flights:
+                    data = np.ascontiguousarray(getattr(flight, name),
+                        dtype=np.float64)
+                    if data.shape[1:] != shape:
+                        raise ValueError(f"Channel '{name}' has shape "
+                            f"{data.shape}.")
+                    file.write(data.tobytes())
+        for flight in flights:
+            self.index["runs"].append({"start":self.index["rows"],
+                "length":len(flight.t), "inputs":flight.inputs,
+                "events":_events(flight.summary)})
+            self.index["rows"] += len(flight.t)
+        path = os.path.join(self.path, INDEX)
+        with open(path + ".tmp", 'w') as file:
+            json.dump(self.index, file, default=_plain)
+        os.replace(path + ".tmp", path)
+        #The maps no longer cover all rows.
+        self._maps = {}
+        return
+
+    def _file(self, name):
+        return os.path.join(self.path, name + ".bin")
+
+def save(path, flights):
+    """Store flights as a new dataset, replacing an existing one.
+    Args:
+        path (str): Directory of the dataset.
+        flights (list): Trajectory or launched Rocket of each flight.
+    Returns:
+        Dataset: The dataset.
+    """
+    for name in list(CHANNELS) + [INDEX]:
+        stale = os.path.join(path, INDEX if name == INDEX else name + ".bin")
+        if os.path.isfile(stale):
+            os.remove(stale)
+    dataset = Dataset(path)
+    dataset.extend(flights)
+    return dataset
+
+def _events(summary):
+    """Events of a summary as plain lists, or None."""
+    if summary is None:
+        return None
+    return {name:{"t":float(event.t), "r":np.asarray(event.r).tolist(),
+        "v":np.asarray(event.v).tolist()}
+        for name, event in summary.events.items()}
+
+def _summary(found):
+    """Inverse of _events()."""
+    if found is None:
+        return None
+    return events.Summary({name:events.Event(name, event["t"],
+        np.array(event["r"]), np.array(event["v"]))
+        for name, event in found.items()})
+
+def _plain(value):
+    """Convert numpy values in the input to JSON, and other objects, like
+     Motor and Wind, to their class and the hash of their content, see
+     cache.canonical()."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "__dict__"):
+        #cache imports this module.
+        from cache import canonical
+        text = json.dumps(canonical(value), separators=(",", ":"))
+        return {"class":type(value).__qualname__,
+            "sha256":hashlib.sha256(text.encode()).hexdigest()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable.")
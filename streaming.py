@@ -0,0 +1,259 @@
+import asyncio
+import time
+import numpy as np
+import events
+from store import CHANNELS
+from trajectory import Trajectory
+
+#Attribute of the rocket holding each channel besides 't'.
+ATTRIBUTES = {"r":"r", "v":"v", "a":"a", "m":"_m", "rho":"_rho",
+    "angle_attack":"angle_attack", "fthrust":"fthrust", "fdrag":"fdrag",
+    "flift":"flift"}
+
+class Step():
+    def __init__(self, i, t, r, v, a, latency, late):
+        """Initialize class. One time step of a Stream.
+        Args:
+            i (int): Index of the time step.
+            t (float): Time since initialization (s).
+            r (np.array): Positional vector (East, North, altitude, pitch,
+                yaw).
+            v (np.array): Velocity vector (East, North, altitude, pitch, yaw).
+            a (np.array): Acceleration vector of the step to this state
+                (East, North, altitude, pitch, yaw).
+            latency (float): Time it took to compute the step (s).
+            late (bool): The step missed the deadline.
+        """
+        self.i = i
+        self.t = t
+        self.r = r
+        self.v = v
+        self.a = a
+        self.latency = latency
+        self.late = late
+        return
+
+class Ring():
+    def __init__(self, size):
+        """Initialize class. The last time steps of a flight, one row per
+         channel and time step, overwritten in a circle.
+        Args:
+            size (int): Number of time steps kept.
+        """
+        self.size = size
+        self.count = 0
+        self.channels = {name:np.zeros((size,) + shape)
+            for name, shape in CHANNELS.items()}
+        return
+
+    def append(self, rows):
+        """Add a time step.
+        Args:
+            rows (dict): A row of each channel, by name.
+        """
+        k = self.count % self.size
+        for name, row in rows.items():
+            self.channels[name][k] = row
+        self.count += 1
+        return
+
+    def trajectory(self, inputs=None):
+        """The kept time steps, oldest first.
+        Args:
+            inputs (dict): Input parameters of the flight. Default to None.
+        Returns:
+            Trajectory: The time steps.
+        """
+        n = min(self.count, self.size)
+        order = (np.arange(n) + self.count - n) % self.size
+        return Trajectory(*[self.channels[name][order] for name in CHANNELS],
+            inputs=inputs)
+
+class Stream():
+    def __init__(self, rocket, history=None, terminal=None, deadline=None,
+                 realtime=False):
+        """Initialize class. Runs the Euler steps of a rocket one at a time,
+         as an iterator or an asynchronous iterator of Step. The first Step
+         is the state the rocket starts from, each following one is computed
+         when asked for. send(u), or asend(u), gives the control input of the
+         next time step, see Rocket.control(), e.g. the angle of the thrust
+         vector of a Rocket_TVC in place of its PID. The time each step takes
+         is compared to a deadline.
+        Args:
+            rocket (Rocket): The rocket, continued from its last computed
+                time step.
+            history (int): Keep only this many of the last time steps, in a
+                Ring, instead of filling the histories of the rocket, so the
+                memory used does not grow with tmax. Default to None, filling
+                the histories and summarizing the events like launch().
+            terminal (str): Stop after this event, see Rocket.launch().
+                Default to None.
+            deadline (float): Time a step may take (s). Default to dt, real
+                time.
+            realtime (bool): Deliver each step no earlier than its simulated
+                time, counted on the wall clock from the first step. Default
+                to False, as fast as possible.
+        """
+        if rocket._integrator != "euler":
+            raise ValueError("Only the Euler step is streamed.")
+        if terminal is not None and terminal not in events.EVENTS:
+            raise ValueError(f"Unknown event '{terminal}'.")
+        self.rocket = rocket
+        self.terminal = terminal
+        self.deadline = rocket._dt if deadline is None else deadline
+        self.realtime = realtime
+        self.i = rocket._steps
+        self.steps = 0
+        self.late = 0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self._started = False
+        self._done = False
+        self._closed = False
+        self._clock = None
+        start = self.i
+        if start == 0 or rocket._kin is None:
+            #As computed by update(), at the time of the step before.
+            rocket._kin = rocket.kinematics(rocket.r[start], rocket.v[start],
+                rocket.t[max(start-1, 0)])
+        self.ring = None
+        if history is not None:
+            self.ring = Ring(history)
+            #Two rows to step from one to the other, the histories of the
+            #rocket are replaced.
+            for name, attribute in ATTRIBUTES.items():
+                work = np.zeros((2,) + CHANNELS[name])
+                work[0] = getattr(rocket, attribute)[start]
+                setattr(rocket, attribute, work)
+            self.ring.append(self._rows(0))
+        return
+
+    @property
+    def mean_latency(self):
+        """Mean time a step took (s)."""
+        return self.total_latency/self.steps if self.steps else np.nan
+
+    def _rows(self, k):
+        """Row k of each channel of the rocket."""
+        rows = {name:getattr(self.rocket, attribute)[k]
+            for name, attribute in ATTRIBUTES.items()}
+        rows["t"] = self.rocket.t[self.i]
+        return rows
+
+    def _state(self, k, latency=0.0, late=False):
+        rocket = self.rocket
+        return Step(self.i, float(rocket.t[self.i]), rocket.r[k].copy(),
+            rocket.v[k].copy(), rocket.a[k].copy(), latency, late)
+
+    def _compute(self, u):
+        """Compute the next time step.
+        Returns:
+            Step: The new state.
+            float: Time to wait until it is due (s).
+        """
+        if not self._started:
+            if u is not None:
+                raise TypeError("The first step is the initial state, it "
+                    "takes no control input.")
+            self._started = True
+            self._clock = time.perf_counter() - float(self.rocket.t[self.i])
+            return self._state(0 if self.ring is not None else self.i), 0.0
+        rocket = self.rocket
+        if self._closed or self._done or self.i >= len(rocket.t)-1:
+            self.close()
+            raise StopIteration
+        start = time.perf_counter()
+        rocket.control(u)
+        i = self.i
+        k = 0 if self.ring is not None else i
+        rocket._i = k
+        t = rocket.t[i]
+        rocket.a[k+1] = rocket.acceleration(t, rocket.r[k], rocket.v[k],
+            rocket._kin)
+        rocket.r[k+1], rocket.v[k+1] = rocket.step(t, rocket.r[k],
+            rocket.v[k], rocket.a[k+1])
+        if self.terminal is not None:
+            g = rocket.event_function(self.terminal, rocket.t[i:i+2],
+                rocket.r[k:k+2], rocket.v[k:k+2])
+            self._done = events.first_crossing(g) is not None
+        self.i = i+1
+        rocket._steps = i+1
+        if self.ring is not None:
+            self.ring.append(self._rows(1))
+        state = self._state(k+1)
+        if self.ring is not None:
+            for attribute in ATTRIBUTES.values():
+                work = getattr(rocket, attribute)
+                work[0] = work[1]
+        latency = time.perf_counter() - start
+        wait = self._clock + float(rocket.t[self.i]) - time.perf_counter()
+        state.latency = latency
+        state.late = latency > self.deadline or (self.realtime and wait < 0)
+        self.steps += 1
+        self.late += state.late
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+        return state, wait
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def send(self, u):
+        """Compute the next time step.
+        Args:
+            u: Control input of the time step, see Rocket.control().
+        Returns:
+            Step: The new state.
+        """
+        state, wait = self._compute(u)
+        if self.realtime and wait > 0:
+            time.sleep(wait)
+        return state
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.asend(None)
+
+    async def asend(self, u):
+        """send() for asyncio, waiting without blocking the event loop.
+        Args:
+            u: Control input of the time step, see Rocket.control().
+        Returns:
+            Step: The new state.
+        """
+        try:
+            state, wait = self._compute(u)
+        except StopIteration:
+            raise StopAsyncIteration
+        await asyncio.sleep(wait if self.realtime and wait > 0 else 0)
+        return state
+
+    def close(self):
+        """Stop streaming. Without history, the histories of the rocket are
+         cut off after the last computed time step and its events are
+         summarized, as after launch()."""
+        if self._closed:
+            return
+        self._closed = True
+        rocket = self.rocket
+        rocket.control(None)
+        if self.ring is None:
+            rocket._exact_events = {}
+            if self.i+1 < len(rocket.t):
+                rocket._truncate(self.i+1)
+            rocket.summary = events.Summary(rocket.find_events())
+        return
+
+    def trajectory(self):
+        """The kept time steps, see Ring, or the histories of the rocket.
+        Returns:
+            Trajectory: The flight.
+        """
+        if self.ring is not None:
+            return self.ring.trajectory()
+        return Trajectory.from_rocket(self.rocket)
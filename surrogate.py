@@ -0,0 +1,357 @@
+import json
+import math
+import os
+import warnings
+import numpy as np
+import dispersion
+from results import GAINS
+from sensitivity import OUTPUTS, evaluate
+
+PATH = "surrogate.npz"
+#Inputs of the surrogate and the range it is trained on. The launch angle is
+#given as 'elevation' and 'azimuth' (deg). The wet mass moves with the dry
+#mass, so the propellant stays the same.
+BOUNDS = {"wind_speed":(0.0, 15.0), "wind_ang":(0.0, 360.0),
+    "elevation":(75.0, 90.0), "azimuth":(0.0, 360.0), "kp":(40.0, 160.0),
+    "ki":(300.0, 1200.0), "kd":(15.0, 60.0), "dry_mass":(8.5, 11.5)}
+PARAMETERS = tuple(BOUNDS)
+#Directions, periodic over 360 deg.
+ANGLES = ("wind_ang", "azimuth")
+#The 8 m/s headwind case with the gains of TVC.py, the inputs not in BOUNDS.
+BASE = dict(dispersion.NOMINAL, **GAINS)
+#Outputs that are positive and spread over decades, fitted as their
+#logarithm: the attitude error is about 1e-3 deg where the loop is damped
+#and 1e-1 deg or more where it is not.
+LOG = ("attitude_error",)
+FLOOR = 1e-9 #Smallest value of the LOG outputs.
+SAMPLES = 512
+HOLDOUT = 0.2 #Fraction of the samples held out to measure the error.
+#Largest held out RMS error, relative to the spread of the samples, in the
+#space an output is fitted in, for the surrogate to serve that output.
+SKILL = 0.5
+
+def latin_hypercube(rng, samples, dimensions):
+    """Latin hypercube sample of the unit cube: each dimension is split into
+     as many intervals as samples, and each interval is sampled once.
+    Args:
+        rng (np.random.Generator): Random numbers.
+        samples (int): Number of points.
+        dimensions (int): Number of dimensions.
+    Returns:
+        np.array: The points, shape (samples, dimensions).
+    """
+    intervals = np.argsort(rng.random((dimensions, samples)), axis=1).T
+    return (intervals + rng.random((samples, dimensions)))/samples
+
+class Surrogate():
+    def __init__(self, base=None, bounds=None, outputs=OUTPUTS):
+        """Initialize class. Interpolates the outputs of sensitivity.reduce()
+         over PARAMETERS with radial basis functions, the cubic r^3 plus a
+         linear polynomial, trained on simulated flights. The wind and the
+         launch direction enter as vectors, so the directions are smooth
+         across 0 deg, and the outputs in LOG are fitted as their
+         logarithm. Queries outside the bounds it was trained in, and outputs
+         the surrogate did not learn, see train(), asked for, are simulated
+         instead.
+        Args:
+            base (dict): Scenario of the inputs not in PARAMETERS, see
+                sweep.build(). Default to BASE.
+            bounds (dict): Range of some PARAMETERS, replacing those of
+                BOUNDS. Default to None.
+            outputs (touple): Names of the outputs. Default to OUTPUTS.
+        """
+        self.base = dict(BASE if base is None else base)
+        self.bounds = dict(BOUNDS, **(bounds or {}))
+        self.outputs = tuple(outputs)
+        self._low = np.array([self.bounds[name][0] for name in PARAMETERS])
+        self._high = np.array([self.bounds[name][1] for name in PARAMETERS])
+        self._angles = np.array([name in ANGLES for name in PARAMETERS])
+        self._log = np.array([name in LOG for name in self.outputs])
+        self._index = {name:i for i, name in enumerate(PARAMETERS)}
+        elevation, azimuth = self.base["launch_ang"]
+        values = dict(self.base, elevation=elevation, azimuth=azimuth)
+        self._center = np.array([values[name] for name in PARAMETERS],
+            dtype=np.float64)
+        self.centers = None
+        self._squares = None
+        self.weights = None
+        self.polynomial = None
+        self.error = None
+        self.reliable = np.ones(len(self.outputs), dtype=bool)
+        self.simulated = 0
+        return
+
+    def center(self):
+        """Values of PARAMETERS in the base scenario."""
+        return self._center.copy()
+
+    def scenario(self, x):
+        """The scenario of a point of the parameter space.
+        Args:
+            x (np.array): Value of each of PARAMETERS.
+        Returns:
+            dict: The scenario, see sweep.build().
+        """
+        values = dict(zip(PARAMETERS, map(float, x)))
+        scenario = dict(self.base)
+        scenario["wet_mass"] = (self.base["wet_mass"] + values["dry_mass"]
+            - self.base["dry_mass"])
+        scenario["launch_ang"] = (values.pop("elevation"),
+            values.pop("azimuth"))
+        scenario.update(values)
+        return scenario
+
+    def features(self, x):
+        """Coordinates the basis functions are placed in, each of about unit
+         range: the wind and the horizontal part of the launch direction as
+         vectors, the others scaled to their bounds.
+        Args:
+            x (np.array): Points, shape (n, len(PARAMETERS)).
+        Returns:
+            np.array: Features, shape (n, len(PARAMETERS)).
+        """
+        x = np.asarray(x, dtype=np.float64)
+        f = (x - self._low)/(self._high - self._low)
+        j = self._index
+        wind = np.radians(x[..., j["wind_ang"]])
+        speed = x[..., j["wind_speed"]]/self._high[j["wind_speed"]]
+        f[..., j["wind_speed"]] = speed*np.sin(wind)
+        f[..., j["wind_ang"]] = speed*np.cos(wind)
+        azimuth = np.radians(x[..., j["azimuth"]])
+        horizontal = (np.cos(np.radians(x[..., j["elevation"]]))/
+            math.cos(math.radians(self._low[j["elevation"]])))
+        f[..., j["elevation"]] = horizontal*np.sin(azimuth)
+        f[..., j["azimuth"]] = horizontal*np.cos(azimuth)
+        return f
+
+    def inside(self, x):
+        """Whether points are inside the training envelope, directions taken
+         modulo 360 deg.
+        Args:
+            x (np.array): Points, shape (n, len(PARAMETERS)).
+        Returns:
+            np.array: True where inside, shape (n,).
+        """
+        x = np.where(self._angles, np.mod(x, 360.0), x)
+        return np.all((x >= self._low) & (x <= self._high), axis=-1)
+
+    def sample(self, samples, rng):
+        """Latin hypercube sample of the training envelope.
+        Args:
+            samples (int): Number of points.
+            rng (np.random.Generator): Random numbers.
+        Returns:
+            np.array: Points, shape (samples, len(PARAMETERS)).
+        """
+        unit = latin_hypercube(rng, samples, len(PARAMETERS))
+        return self._low + unit*(self._high - self._low)
+
+    def simulate(self, x, max_workers=1):
+        """Simulate points of the parameter space.
+        Args:
+            x (np.array): Points, shape (n, len(PARAMETERS)).
+            max_workers (int): See sensitivity.evaluate(). Default to 1.
+        Returns:
+            np.array: Outputs, shape (n, len(outputs)).
+        """
+        y = evaluate([self.scenario(row) for row in x], max_workers)
+        return y[:, [OUTPUTS.index(name) for name in self.outputs]]
+
+    def transform(self, y):
+        """The outputs in the space they are fitted in."""
+        y = np.array(y, dtype=np.float64)
+        y[:, self._log] = np.log(np.maximum(y[:, self._log], FLOOR))
+        return y
+
+    def fit(self, x, y, smoothing=0.0):
+        """Solve for the weights of the basis functions centered at the
+         points and of the linear polynomial.
+        Args:
+            x (np.array): Points, shape (n, len(PARAMETERS)).
+            y (np.array): Outputs at the points, shape (n, len(outputs)).
+            smoothing (float): Added to the diagonal, to approximate rather
+                than interpolate noisy outputs. Default to 0.0.
+        """
+        f = self.features(x)
+        n, d = f.shape
+        system = np.zeros((n+d+1, n+d+1))
+        system[:n, :n] = _cubic(f, f) + smoothing*np.eye(n)
+        system[:n, n] = system[n, :n] = 1
+        system[:n, n+1:] = f
+        system[n+1:, :n] = f.T
+        rhs = np.zeros((n+d+1, y.shape[1]))
+        rhs[:n] = self.transform(y)
+        solution = np.linalg.solve(system, rhs)
+        self.centers = f
+        self._squares = np.sum(f**2, axis=1)
+        self.weights = solution[:n]
+        self.polynomial = solution[n:]
+        return
+
+    def train(self, samples=SAMPLES, holdout=HOLDOUT, seed=0,
+              smoothing=0.0, max_workers=1):
+        """Simulate a Latin hypercube sample, fit the samples not held out,
+         measure the error on those held out and fit all samples. The
+         error of the final fit is at most about that measured. Outputs
+         whose error, in the space they are fitted in, is not below SKILL
+         times the spread of the samples are left out of the answers of
+         predict(), with a warning, and simulated when asked for.
+        Args:
+            samples (int): Number of flights. Default to SAMPLES.
+            holdout (float): Fraction of the flights held out. Default to
+                HOLDOUT.
+            seed (int): Seed of the sample. Default to 0.
+            smoothing (float): See fit(). Default to 0.0.
+            max_workers (int): See sensitivity.evaluate(). Default to 1.
+        """
+        rng = np.random.default_rng(seed)
+        x = self.sample(samples, rng)
+        y = self.simulate(x, max_workers)
+        test = rng.permutation(samples) < int(holdout*samples)
+        self.reliable[:] = True
+        if test.any():
+            self.fit(x[~test], y[~test], smoothing)
+            prediction = self.evaluate(x[test])
+            residual = prediction - y[test]
+            fitted = (self.transform(prediction)
+                - self.transform(y[test]))
+            score = (np.sqrt(np.mean(fitted**2, axis=0))/
+                np.std(self.transform(y), axis=0))
+            self.reliable[:] = score < SKILL
+            self.error = {name:{"rms":float(np.sqrt(np.mean(r**2))),
+                "max":float(np.max(np.abs(r))),
+                "std":float(np.std(y[:, j])), "score":float(score[j])}
+                for j, (name, r) in enumerate(zip(self.outputs, residual.T))}
+            for name, reliable in zip(self.outputs, self.reliable):
+                if not reliable:
+                    warnings.warn(f"The surrogate did not learn '{name}', "
+                        f"held out error {self.error[name]['score']:.2f} of "
+                        f"the spread, it is only given when asked for, simulated.")
+        self.fit(x, y, smoothing)
+        return
+
+    def evaluate(self, x):
+        """The surrogate at points, inside the envelope or not.
+        Args:
+            x (np.array): Points, shape (n, len(PARAMETERS)).
+        Returns:
+            np.array: Outputs, shape (n, len(outputs)).
+        """
+        f = self.features(x)
+        y = (_cubic(f, self.centers, self._squares) @ self.weights
+            + self.polynomial[0] + f @ self.polynomial[1:])
+        y[:, self._log] = np.exp(y[:, self._log])
+        return y
+
+    def served(self):
+        """Names of the outputs the surrogate learned, see train()."""
+        return tuple(name for name, reliable in zip(self.outputs,
+            self.reliable) if reliable)
+
+    def predict(self, x, outputs=None, fallback=True, max_workers=1):
+        """Outputs at points, simulated where outside the envelope, and at
+         all points if an output the surrogate did not learn is asked for,
+         see train().
+        Args:
+            x (np.array): Points, shape (n, len(PARAMETERS)).
+            outputs (touple): Names of the outputs, out of outputs. Default
+                to None, those the surrogate learned, see served().
+            fallback (bool): Simulate those points, or give NaN for them.
+                Default to True.
+            max_workers (int): See sensitivity.evaluate(). Default to 1.
+        Returns:
+            np.array: Outputs, shape (n, len(outputs)).
+        """
+        outputs = self.served() if outputs is None else tuple(outputs)
+        columns = [self.outputs.index(name) for name in outputs]
+        x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        y = self.evaluate(x)[:, columns]
+        simulate = ~self.inside(x)
+        learned = self.reliable[columns]
+        if not fallback:
+            y[simulate] = np.nan
+            y[:, ~learned] = np.nan
+            return y
+        if not learned.all():
+            simulate[:] = True
+        if simulate.any():
+            y[simulate] = self.simulate(x[simulate], max_workers)[:, columns]
+            self.simulated += int(simulate.sum())
+        return y
+
+    def query(self, outputs=None, **values):
+        """Outputs of one scenario, see predict().
+        Args:
+            outputs (touple): See predict(). Default to None.
+            **values: Value of some of PARAMETERS, the others at their base
+                value.
+        Returns:
+            dict: Value of each output.
+        """
+        outputs = self.served() if outputs is None else tuple(outputs)
+        x = self._center.copy()
+        for name, value in values.items():
+            x[self._index[name]] = value
+        return dict(zip(outputs, self.predict(x[None], outputs)[0].tolist()))
+
+    def save(self, path=PATH):
+        """Save the trained surrogate as .npz."""
+        with open(path + ".tmp", 'wb') as file:
+            np.savez(file, centers=self.centers, weights=self.weights,
+                polynomial=self.polynomial, meta=json.dumps({
+                "base":self.base, "bounds":self.bounds,
+                "outputs":self.outputs, "error":self.error,
+                "reliable":self.reliable.tolist()}))
+        os.replace(path + ".tmp", path)
+        return
+
+    @classmethod
+    def load(cls, path=PATH):
+        """Load a surrogate saved with save().
+        Args:
+            path (str): Path of the file. Default to PATH.
+        Returns:
+            Surrogate: The surrogate.
+        """
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            base = dict(meta["base"], launch_ang=tuple(
+                meta["base"]["launch_ang"]))
+            surrogate = cls(base, {name:tuple(bounds)
+                for name, bounds in meta["bounds"].items()}, meta["outputs"])
+            surrogate.centers = data["centers"]
+            surrogate._squares = np.sum(surrogate.centers**2, axis=1)
+            surrogate.weights = data["weights"]
+            surrogate.polynomial = data["polynomial"]
+        surrogate.error = meta["error"]
+        surrogate.reliable[:] = meta["reliable"]
+        return surrogate
+
+def _cubic(a, b, squares=None):
+    """The basis function r^3 between the rows of a and b, shape
+     (len(a), len(b)), with the squared norms of the rows of b if known."""
+    if squares is None:
+        squares = np.sum(b**2, axis=1)
+    distance = np.sqrt(np.maximum(np.sum(a**2, axis=1)[:, None]
+        - 2*a @ b.T + squares, 0))
+    return distance**3
+
+if __name__ == "__main__":
+    import time
+
+    if os.path.isfile(PATH):
+        surrogate = Surrogate.load(PATH)
+    else:
+        surrogate = Surrogate()
+        surrogate.train()
+        surrogate.save(PATH)
+    for name, error in surrogate.error.items():
+        print(f"{name:16}held out RMS error {error['rms']:9.3f}, max "
+            f"{error['max']:9.3f}, spread of the samples {error['std']:9.3f}, "
+            f"fitted {error['score']:.2f} of the spread")
+    for outputs in (None, surrogate.outputs):
+        start = time.perf_counter()
+        answer = surrogate.query(outputs, wind_speed=11, wind_ang=200)
+        elapsed = time.perf_counter() - start
+        print(f"11 m/s from 200 deg: {answer} in {1e3*elapsed:.3f} ms, "
+            f"{surrogate.simulated} simulated so far")
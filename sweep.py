@@ -0,0 +1,68 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from launchsim import Rocket
+from TVC import Rocket_TVC
+from trajectory import Trajectory
+
+def build(scenario):
+    """Build the rocket described by a scenario.
+    Args:
+        scenario (dict): Input for Rocket, including 'launch_ang'. If the PID
+            gains 'kp', 'ki' and 'kd' are given (and optionally 'max_angle'),
+            a Rocket_TVC is built instead.
+    Returns:
+        Rocket: The rocket, not yet launched.
+    """
+    if "kp" in scenario:
+        return Rocket_TVC(**scenario)
+    return Rocket(**scenario)
+
+def run(scenario, terminal=None, kernel="numpy"):
+    """Build and launch the rocket described by a scenario.
+    Args:
+        scenario (dict): See build().
+        terminal (str): Stop at this event, see Rocket.launch(). Default to
+            None.
+        kernel (str): 'numpy' or 'fast', see Rocket.launch(). Default to
+            'numpy'.
+    Returns:
+        Trajectory: The flight, as plain float64 arrays.
+    """
+    rocket = build(scenario)
+    rocket.launch(terminal, kernel)
+    return Trajectory.from_rocket(rocket, scenario)
+
+def run_sweep(scenarios, max_workers=None, terminal=None, kernel="numpy",
+              cache=None):
+    """Run independent scenarios across a pool of processes. Only the arrays
+     of each flight are sent back, not the rocket objects.
+    Args:
+        scenarios (list): Scenario dictionaries, see build().
+        max_workers (int): Number of processes. Default to the number of
+            cores. With 1 the scenarios are run in this process.
+        terminal (str): Stop each run at this event, see Rocket.launch().
+            Default to None.
+        kernel (str): 'numpy' or 'fast', see Rocket.launch(). Default to
+            'numpy'.
+        cache (cache.Cache): Take the flights found in the cache from it, and
+            store the others in it. Default to None.
+    Returns:
+        list: Trajectory of each scenario, in the same order.
+    """
+    if cache is not None:
+        keys = [cache.key(scenario, terminal, kernel) for scenario in scenarios]
+        flights = [cache.get(key, scenario)
+            for key, scenario in zip(keys, scenarios)]
+        missing = [i for i, flight in enumerate(flights) if flight is None]
+        if missing:
+            computed = run_sweep([scenarios[i] for i in missing], max_workers,
+                terminal, kernel)
+            for i, flight in zip(missing, computed):
+                cache.put(keys[i], flight)
+                flights[i] = flight
+        return flights
+    task = partial(run, terminal=terminal, kernel=kernel)
+    if max_workers == 1:
+        return [task(scenario) for scenario in scenarios]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(task, scenarios))
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import metrics
+from launchsim import Rocket
+from TVC import Rocket_TVC
+from wind import Gust, Wind
+
+#Largest difference between the kernels, relative to the largest value of
+#the history. They differ only by the order of floating point operations.
+TOLERANCE = 1e-8
+#After burnout in turbulence the flight amplifies roundoff: scaling the gust
+#by 1+PERTURBATION moves the histories of the numpy kernel alone by up to
+#1e-1 with TVC. There the kernels may differ by a FACTOR more than that.
+PERTURBATION = 1e-15
+FACTOR = 10
+HISTORIES = ("r", "v", "a", "angle_attack", "fthrust", "fdrag", "flift", "_m",
+    "_rho")
+GUST = Gust.turbulence(2.0, 100.0, 100.0, 90, seed=1)
+#The wind replaces wind_speed and wind_ang, None for the constant wind of
+#those inputs.
+WINDS = {"inputs":lambda gust: None,
+    "constant":lambda gust: Wind.constant(8, 90),
+    "profile":lambda gust: Wind.power_law(8, 90),
+    "gust":lambda gust: Wind.power_law(8, 90, gust=gust)}
+ROCKETS = {"rocket":lambda **kwargs: Rocket(**kwargs),
+    "tvc":lambda **kwargs: Rocket_TVC(80, 600, 30, **kwargs),
+    "tvc_rate":lambda **kwargs: Rocket_TVC(80, 600, 30, rate=40, **kwargs),
+    "tvc_servo":lambda **kwargs: Rocket_TVC(80, 600, 30, rate=40,
+        servo_rate=60, servo_lag=0.02, **kwargs)}
+
+def launch(rocket, wind, kernel, gust=GUST):
+    flight = ROCKETS[rocket](launch_ang=metrics.LAUNCH_ANG, wind_speed=8,
+        wind_ang=90, wind=WINDS[wind](gust), **metrics.INPUTS)
+    flight.launch(kernel=kernel)
+    return flight
+
+def difference(expected, actual, steps=None):
+    """Largest difference of each history, relative to its largest value,
+     over the first steps."""
+    result = {}
+    for name in HISTORIES:
+        x = np.asarray(getattr(expected, name), dtype=np.float64)[:steps]
+        y = np.asarray(getattr(actual, name), dtype=np.float64)[:steps]
+        result[name] = np.max(np.abs(y - x))/(np.max(np.abs(x)) + 1e-300)
+    return result
+
+@pytest.mark.parametrize("wind", WINDS)
+@pytest.mark.parametrize("rocket", ROCKETS)
+def test_fast_kernel(rocket, wind):
+    numpy = launch(rocket, wind, "numpy")
+    fast = launch(rocket, wind, "fast")
+    assert len(numpy.t) == len(fast.t)
+    burn = int(np.sum(numpy.t < metrics.INPUTS["burntime"]))
+    for name, error in difference(numpy, fast, burn).items():
+        assert error <= TOLERANCE, name
+    bound = dict.fromkeys(HISTORIES, TOLERANCE)
+    if wind == "gust":
+        perturbed = launch(rocket, wind, "numpy", Gust(GUST.dt,
+            GUST.values*(1 + PERTURBATION)))
+        for name, error in difference(numpy, perturbed).items():
+            bound[name] = max(TOLERANCE, FACTOR*error)
+    for name, error in difference(numpy, fast).items():
+        assert error <= bound[name], name
+
+@pytest.mark.parametrize("rocket", ("tvc", "tvc_rate", "tvc_servo"))
+def test_fast_kernel_held_control(rocket):
+    flights = []
+    for kernel in ("numpy", "fast"):
+        flight = ROCKETS[rocket](launch_ang=metrics.LAUNCH_ANG, wind_speed=8,
+            wind_ang=90, **metrics.INPUTS)
+        flight.advance(1.0, kernel)
+        flight.control((0.02, -0.01))
+        flight.launch(kernel=kernel)
+        flights.append(flight)
+    numpy, fast = flights
+    #Held off course, the flight tumbles after burnout and amplifies
+    #roundoff like turbulence does, the control acts during the burn.
+    burn = int(np.sum(numpy.t < metrics.INPUTS["burntime"]))
+    for name, error in difference(numpy, fast, burn).items():
+        assert error <= TOLERANCE, name
+    #The held angle, not the PID, turned the thrust vector.
+    free = launch(rocket, "inputs", "fast")
+    assert difference(free, fast, burn)["fthrust"] > 1e-3
+    assert isinstance(fast._held, np.ndarray)
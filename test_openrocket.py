@@ -0,0 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os
+import numpy as np
+import openrocket
+
+PROCESSES = 8
+
+def total(cache_dir, k):
+    frame = openrocket.load("8mps90deg", cache_dir=cache_dir)
+    return float(sum(np.sum(frame[column]) for column in openrocket.COLUMNS))
+
+def test_concurrent_cold_load(tmp_path):
+    with ProcessPoolExecutor(PROCESSES) as executor:
+        totals = list(executor.map(partial(total, str(tmp_path)),
+            range(PROCESSES)))
+    assert len(set(totals)) == 1
+    assert totals[0] == total(str(tmp_path), 0)
+    cache = os.path.join(tmp_path, "openrocket_8mps90deg")
+    assert not [name for name in os.listdir(cache) if name.endswith(".tmp")]
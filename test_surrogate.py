@@ -0,0 +1,40 @@
+import time
+import numpy as np
+from surrogate import Surrogate
+
+#A query of the outputs the surrogate learned may not take longer (s).
+LATENCY = 1e-3
+
+def trained():
+    #A narrow envelope learned from few flights, to keep the test short.
+    surrogate = Surrogate(bounds={"wind_speed":(6.0, 10.0),
+        "wind_ang":(80.0, 100.0), "kp":(70.0, 90.0), "ki":(550.0, 650.0),
+        "kd":(25.0, 35.0), "dry_mass":(9.5, 10.5)})
+    surrogate.train(samples=40)
+    return surrogate
+
+def test_learned_outputs_are_not_simulated():
+    surrogate = trained()
+    surrogate.reliable[surrogate.outputs.index("attitude_error")] = False
+    outputs = ("apogee", "landing_east", "landing_north")
+    assert surrogate.served() == outputs
+    surrogate.query(wind_speed=8, wind_ang=90)
+    start = time.perf_counter()
+    for _ in range(100):
+        answer = surrogate.query(wind_speed=8, wind_ang=90)
+    elapsed = (time.perf_counter() - start)/100
+    assert tuple(answer) == outputs
+    assert surrogate.simulated == 0
+    assert elapsed < LATENCY
+    y = surrogate.predict(surrogate.sample(10, np.random.default_rng(1)))
+    assert y.shape == (10, 3) and surrogate.simulated == 0
+
+def test_unlearned_outputs_are_simulated():
+    surrogate = trained()
+    surrogate.reliable[surrogate.outputs.index("attitude_error")] = False
+    answer = surrogate.query(surrogate.outputs, wind_speed=8, wind_ang=90)
+    assert surrogate.simulated == 1
+    assert answer["attitude_error"] >= 0
+    y = surrogate.predict(surrogate.center(), surrogate.outputs,
+        fallback=False)
+    assert np.isnan(y[0, -1]) and np.isfinite(y[0, :3]).all()
@@ -0,0 +1,49 @@
+class Trajectory():
+    def __init__(self, t, r, v, a, m, rho, angle_attack, fthrust, fdrag,
+                 flift, inputs=None, summary=None):
+        """Initialize class. A plain container for the result of one flight,
+         exposing the same channel names as a launched Rocket so that the
+         plotting code can use either.
+        Args:
+            t (np.array): Time (s).
+            r (np.array): Positional vectors (East, North, altitude, pitch,
+                yaw).
+            v (np.array): Velocity vectors (East, North, altitude, pitch,
+                yaw).
+            a (np.array): Acceleration vectors (East, North, altitude, pitch,
+                yaw).
+            m (np.array): Mass (kg).
+            rho (np.array): Air density (kg/m^3).
+            angle_attack (np.array): Angles (rad [motion, rocket, attack]).
+            fthrust (np.array): Force from thrust (N [East, North, altitude]).
+            fdrag (np.array): Force from drag (N [East, North, altitude]).
+            flift (np.array): Force from lift (N [East, North, altitude]).
+            inputs (dict): Input parameters of the flight. Default to None.
+            summary (events.Summary): Events of the flight. Default to None.
+        """
+        self.t = t
+        self.r = r
+        self.v = v
+        self.a = a
+        self.m = m
+        self.rho = rho
+        self.angle_attack = angle_attack
+        self.fthrust = fthrust
+        self.fdrag = fdrag
+        self.flift = flift
+        self.inputs = {} if inputs is None else dict(inputs)
+        self.summary = summary
+        return
+
+    @classmethod
+    def from_rocket(cls, rocket, inputs=None):
+        """Collect the channels of a launched Rocket, without copying.
+        Args:
+            rocket (Rocket): A launched rocket.
+            inputs (dict): Input parameters of the flight. Default to None.
+        Returns:
+            Trajectory: The flight of the rocket.
+        """
+        return cls(rocket.t, rocket.r, rocket.v, rocket.a, rocket._m,
+            rocket._rho, rocket.angle_attack, rocket.fthrust, rocket.fdrag,
+            rocket.flift, inputs, getattr(rocket, "summary", None))
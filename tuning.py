@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from metrics import INPUTS, LAUNCH_ANG, CASES
+from sweep import run
+
+#Order of the tuned parameters.
+PARAMETERS = ("kp", "ki", "kd", "max_angle")
+#Search range of each parameter. The gains are searched on a log scale.
+BOUNDS = {"kp":(1, 1000), "ki":(1, 10000), "kd":(0.1, 300),
+    "max_angle":(1, 10)}
+LOG_SCALE = ("kp", "ki", "kd")
+#The hand tuned gains of TVC.py and results.py.
+START = {"kp":80, "ki":600, "kd":30, "max_angle":5}
+#Weight of the drift (deg^2 s per m) against the attitude error. The hand
+#tuned gains hold the attitude to about 1e-3 deg during the burn, while the
+#drift is tens of meters, so this makes both about the same size for them.
+DRIFT_WEIGHT = 3e-8
+#The wind cases of metrics.py.
+SCENARIOS = [dict(INPUTS, launch_ang=LAUNCH_ANG, wind_speed=wind_speed,
+    wind_ang=wind_ang) for _, wind_speed, wind_ang in CASES.values()]
+
+def cost(flight, drift_weight=DRIFT_WEIGHT):
+    """Cost of a flight with TVC, up to burnout: the integrated square of the
+     attitude error (deg^2 s) plus the drift, the distance of the rocket from
+     the line of the launch direction at burnout (m), times a weight.
+    Args:
+        flight (Trajectory): A flight, stopped at burnout.
+        drift_weight (float): Weight of the drift. Default to DRIFT_WEIGHT.
+    Returns:
+        float: The cost, inf if the flight diverged.
+    """
+    error = np.degrees(flight.r[:, 3:] - flight.r[0, 3:])
+    attitude = np.sum(error[1:]**2)*(flight.t[1] - flight.t[0])
+    pitch, yaw = flight.r[0, 3:]
+    direction = np.array((np.sin(yaw)*np.cos(pitch), -np.sin(pitch),
+        np.cos(yaw)*np.cos(pitch)))
+    position = flight.r[-1, :3]
+    drift = np.linalg.norm(position - (position @ direction)*direction)
+    total = attitude + drift_weight*drift
+    return total if np.isfinite(total) else np.inf
+
+def evaluate(params, scenarios, bound=np.inf, drift_weight=DRIFT_WEIGHT,
+             kernel="fast"):
+    """Mean cost of one set of parameters over the scenarios. The scenarios
+     are run in order, and the evaluation stops as soon as the partial mean
+     is above the bound, since the costs are not negative.
+    Args:
+        params (dict): Value of each of PARAMETERS.
+        scenarios (list): Scenario dictionaries without the PID parameters,
+            see sweep.build().
+        bound (float): Cost of the incumbent. Default to inf.
+        drift_weight (float): See cost(). Default to DRIFT_WEIGHT.
+        kernel (str): 'numpy' or 'fast', see Rocket.launch(). Default to
+            'fast'.
+    Returns:
+        float: The mean cost, or the partial mean if stopped early.
+        bool: True if all scenarios were run.
+    """
+    total = 0
+    for scenario in scenarios:
+        flight = run(dict(scenario, **params), "burnout", kernel)
+        total += cost(flight, drift_weight)/len(scenarios)
+        if total > bound:
+            return total, False
+    return total, True
+
+class Tuner():
+    def __init__(self, scenarios=None, bounds=None, drift_weight=DRIFT_WEIGHT,
+                 kernel="fast", max_workers=None, cache=None):
+        """Initialize class. Searches the PID gains and the maximum angle of
+         the thrust vector that minimize the mean cost() over the scenarios.
+         Candidates are evaluated in parallel, and every evaluation is
+         appended to the cache so that an interrupted search can be resumed.
+        Args:
+            scenarios (list): Scenario dictionaries without the PID
+                parameters, see sweep.build(). Default to SCENARIOS.
+            bounds (dict): Search range of each of PARAMETERS. Default to
+                BOUNDS.
+            drift_weight (float): See cost(). Default to DRIFT_WEIGHT.
+            kernel (str): 'numpy' or 'fast', see Rocket.launch(). Default to
+                'fast'.
+            max_workers (int): Number of processes. Default to the number of
+                cores. With 1 the candidates are run in this process.
+            cache (str): Path of the cache, a JSON lines file. Default to
+                None, not caching.
+        """
+        self._scenarios = SCENARIOS if scenarios is None else scenarios
+        self._bounds = dict(BOUNDS if bounds is None else bounds)
+        self._drift_weight = drift_weight
+        self._kernel = kernel
+        self._max_workers = max_workers
+        self._cache = cache
+        #Evaluations by point: (cost, complete).
+        self.evaluated = {}
+        self.evaluations = 0
+        self.best = None
+        self.best_cost = np.inf
+        #Only evaluations of the same problem are reused from the cache.
+        self._key = hashlib.sha1(json.dumps([self._scenarios, drift_weight,
+            kernel], sort_keys=True, default=str).encode()).hexdigest()
+        if cache is not None and os.path.isfile(cache):
+            with open(cache) as file:
+                for line in file:
+                    entry = json.loads(line)
+                    if entry["key"] == self._key:
+                        self.evaluated[self._point(entry["params"])] = (
+                            entry["cost"], entry["complete"])
+        return
+
+    def _point(self, params):
+        """Hashable point of a set of parameters, to 6 significant digits."""
+        return tuple(float(f"{params[name]:.6g}") for name in PARAMETERS)
+
+    def to_params(self, x):
+        """Parameters of a point in the unit cube of the search range.
+        Args:
+            x (np.array): Coordinates between 0 and 1, one per parameter.
+        Returns:
+            dict: Value of each of PARAMETERS.
+        """
+        params = {}
+        for name, xi in zip(PARAMETERS, np.clip(x, 0, 1)):
+            low, high = self._bounds[name]
+            if name in LOG_SCALE:
+                value = low*(high/low)**xi
+            else:
+                value = low + (high - low)*xi
+            params[name] = float(f"{value:.6g}")
+        return params
+
+    def to_unit(self, params):
+        """Inverse of to_params()."""
+        x = np.empty(len(PARAMETERS))
+        for j, name in enumerate(PARAMETERS):
+            low, high = self._bounds[name]
+            if name in LOG_SCALE:
+                x[j] = np.log(params[name]/low)/np.log(high/low)
+            else:
+                x[j] = (params[name] - low)/(high - low)
+        return np.clip(x, 0, 1)
+
+    def evaluate(self, candidates):
+        """Evaluate candidates in parallel against the incumbent, reusing
+         earlier evaluations. The incumbent is updated.
+        Args:
+            candidates (list): Parameter dictionaries.
+        Returns:
+            list: Cost of each candidate, inf if it was stopped early.
+        """
+        points = [self._point(params) for params in candidates]
+        todo = {}
+        for point, params in zip(points, candidates):
+            known = self.evaluated.get(point)
+            #An early stopped candidate is only known to cost more than its
+            #partial cost.
+            if known is None or (not known[1] and known[0] <= self.best_cost):
+                todo[point] = params
+        if todo:
+            task = partial(evaluate, scenarios=self._scenarios,
+                bound=self.best_cost, drift_weight=self._drift_weight,
+                kernel=self._kernel)
+            if self._max_workers == 1 or len(todo) == 1:
+                results = [task(params) for params in todo.values()]
+            else:
+                with ProcessPoolExecutor(max_workers=self._max_workers) as \
+                        executor:
+                    results = list(executor.map(task, todo.values()))
+            for (point, params), result in zip(todo.items(), results):
+                self.evaluated[point] = result
+                self.evaluations += 1
+                self._store(params, *result)
+        costs = []
+        for point, params in zip(points, candidates):
+            value, complete = self.evaluated[point]
+            costs.append(value if complete else np.inf)
+            if complete and value < self.best_cost:
+                self.best, self.best_cost = dict(params), value
+        return costs
+
+    def _store(self, params, value, complete):
+        """Append an evaluation to the cache."""
+        if self._cache is None:
+            return
+        with open(self._cache, 'a') as file:
+            file.write(json.dumps({"key":self._key, "params":params,
+                "cost":value, "complete":complete}) + "\n")
+        return
+
+    def search(self, start=None, samples=16, step=0.25, min_step=1/64,
+               iterations=50, seed=0):
+        """Random sampling of the search range, followed by a pattern search
+         around the incumbent: all neighbours one step away along each
+         parameter are evaluated at once, the search moves to the best one if
+         it is better and halves the step otherwise. Raises a ValueError if
+         neither the start nor any random candidate completes.
+        Args:
+            start (dict): First candidate. Default to START.
+            samples (int): Number of random candidates. Default to 16.
+            step (float): First step, as a fraction of the search range.
+                Default to 0.25.
+            min_step (float): The search stops below this step. Default to
+                1/64.
+            iterations (int): Largest number of pattern search iterations.
+                Default to 50.
+            seed (int): Seed of the random candidates. Default to 0.
+        Returns:
+            dict: The best parameters.
+            float: Their cost.
+        """
+        start = START if start is None else start
+        self.evaluate([self.to_params(self.to_unit(start))])
+        rng = np.random.default_rng(seed)
+        self.evaluate([self.to_params(x)
+            for x in rng.random((samples, len(PARAMETERS)))])
+        if self.best is None:
+            raise ValueError("No candidate completed the scenarios, every "
+                "one tumbled or exceeded the cost bound. Try another start "
+                "or more samples.")
+        for _ in range(iterations):
+            if step < min_step:
+                break
+            incumbent, x = self.best_cost, self.to_unit(self.best)
+            neighbours = []
+            for j in range(len(PARAMETERS)):
+                for sign in (1, -1):
+                    y = x.copy()
+                    y[j] = np.clip(y[j] + sign*step, 0, 1)
+                    if y[j] != x[j]:
+                        neighbours.append(self.to_params(y))
+            self.evaluate(neighbours)
+            if not self.best_cost < incumbent:
+                step /= 2
+        return self.best, self.best_cost
+
+if __name__ == "__main__":
+    tuner = Tuner(cache="tuning.jsonl")
+    print("Hand tuned:", START, evaluate(START, SCENARIOS)[0])
+    best, best_cost = tuner.search()
+    print(f"Best after {tuner.evaluations} new evaluations:", best, best_cost)
@@ -0,0 +1,292 @@
+import math
+import numpy as np
+
+STEP = 10.0 #Distance between the altitudes a wind is sampled at (m).
+TOP = 30000.0 #Highest altitude sampled (m).
+
+def components(speed, ang):
+    """Velocity of the air (East, North) of a wind blowing from a direction,
+     the convention of wind_ang of the rocket models.
+    Args:
+        speed (float or np.array): Wind speed (m/s).
+        ang (float or np.array): Wind direction (deg).
+    Returns:
+        float or np.array: Velocity towards East (m/s).
+        float or np.array: Velocity towards North (m/s).
+    """
+    return -speed*np.sin(ang*np.pi/180), -speed*np.cos(ang*np.pi/180)
+
+class Gust():
+    def __init__(self, dt, values):
+        """Initialize class. Turbulence as a time series of the velocity of
+         the air on an even time grid from 0 s, interpolated linearly and
+         held after its end.
+        Args:
+            dt (float): Time between samples (s).
+            values (np.array): Velocity of the air (East, North, up) (m/s),
+                shape (samples, 3).
+        """
+        self.dt = dt
+        self.values = np.asarray(values, dtype=np.float64).reshape(-1, 3)
+        if len(self.values) < 2:
+            raise ValueError("A gust needs at least two samples.")
+        self._values = self.values.tolist()
+        return
+
+    @classmethod
+    def turbulence(cls, intensity, length_scale, speed, duration, dt=0.01,
+                   seed=None):
+        """Random turbulence with the exponential correlation of the first
+         order Dryden model. Each component is a Gauss-Markov process with
+         correlation time length_scale/speed.
+        Args:
+            intensity (float or touple): Standard deviation of the velocity
+                (m/s), per component (East, North, up) if a touple.
+            length_scale (float or touple): Length scale of the turbulence
+                (m), per component if a touple.
+            speed (float): Speed the rocket moves through the turbulence
+                with (m/s).
+            duration (float): Length of the series (s).
+            dt (float): Time between samples (s). Default to 0.01.
+            seed (int): Seed of the random numbers. Default to None.
+        Returns:
+            Gust: The turbulence.
+        """
+        rng = np.random.default_rng(seed)
+        sigma = np.broadcast_to(np.asarray(intensity, dtype=np.float64), 3)
+        decay = np.exp(-dt*speed/np.broadcast_to(np.asarray(length_scale,
+            dtype=np.float64), 3))
+        noise = rng.standard_normal((int(math.ceil(duration/dt))+1, 3))
+        #Scaled so that the process is stationary from the first sample.
+        noise[1:] *= sigma*np.sqrt(1 - decay**2)
+        noise[0] *= sigma
+        values, decay = noise.tolist(), decay.tolist()
+        for k in range(1, len(values)):
+            prev, row = values[k-1], values[k]
+            for j in range(3):
+                row[j] += decay[j]*prev[j]
+        return cls(dt, values)
+
+    def at(self, t):
+        """Velocity of the air (East, North, up) (m/s) at time t (s), as
+         floats."""
+        x = min(max(t/self.dt, 0.0), len(self._values)-1.0)
+        k = min(int(x), len(self._values)-2)
+        low, high, f = self._values[k], self._values[k+1], x - k
+        return (low[0] + f*(high[0] - low[0]), low[1] + f*(high[1] - low[1]),
+            low[2] + f*(high[2] - low[2]))
+
+    def velocity(self, t):
+        """Velocity of the air (m/s) at times t (s), an array of shape
+         (len(t), 3)."""
+        x = np.clip(np.asarray(t)/self.dt, 0, len(self.values)-1.0)
+        k = np.minimum(x.astype(int), len(self.values)-2)
+        f = (x - k)[..., None]
+        return self.values[k] + f*(self.values[k+1] - self.values[k])
+
+class Wind():
+    def __init__(self, h, east, north, gust=None, step=STEP, top=TOP):
+        """Initialize class. Horizontal wind as a function of altitude,
+         sampled once on an even grid from the ground to top and interpolated
+         linearly in constant time, plus optional turbulence. The wind is
+         held constant outside the altitudes given and above top.
+        Args:
+            h (np.array): Increasing altitudes (m).
+            east (np.array): Velocity of the air towards East at each
+                altitude (m/s).
+            north (np.array): Velocity of the air towards North at each
+                altitude (m/s).
+            gust (Gust): Turbulence added to the wind. Default to None.
+            step (float): Distance between samples (m). Default to STEP.
+            top (float): Highest altitude sampled (m), above 0. Default to
+                TOP.
+        """
+        self.step = step
+        self.h = np.arange(0.0, top+step, step)
+        h = np.atleast_1d(np.asarray(h, dtype=np.float64))
+        self.east = np.interp(self.h, h, np.broadcast_to(east, h.shape))
+        self.north = np.interp(self.h, h, np.broadcast_to(north, h.shape))
+        self.gust = gust
+        #Plain lists for single altitudes, faster to index than arrays.
+        self._east, self._north = self.east.tolist(), self.north.tolist()
+        return
+
+    @classmethod
+    def constant(cls, speed, ang, **kwargs):
+        """The same wind at every altitude.
+        Args:
+            speed (float): Wind speed (m/s).
+            ang (float): Wind direction (deg).
+            **kwargs: Further input for the class.
+        Returns:
+            Wind: The wind.
+        """
+        east, north = components(speed, ang)
+        return cls(0.0, east, north, **kwargs)
+
+    @classmethod
+    def profile(cls, speed, ang, step=STEP, top=TOP, **kwargs):
+        """Wind from one direction with a speed depending on altitude.
+        Args:
+            speed (callable): Wind speed (m/s) as a function of an array of
+                altitudes (m).
+            ang (float): Wind direction (deg).
+            step (float): Distance between samples (m). Default to STEP.
+            top (float): Highest altitude sampled (m). Default to TOP.
+            **kwargs: Further input for the class.
+        Returns:
+            Wind: The wind.
+        """
+        h = np.arange(0.0, top+step, step)
+        east, north = components(speed(h), ang)
+        return cls(h, east, north, step=step, top=top, **kwargs)
+
+    @classmethod
+    def power_law(cls, speed, ang, exponent=1/7, reference=10.0, **kwargs):
+        """Wind shear following the power law, zero at the ground.
+        Args:
+            speed (float): Wind speed at the reference altitude (m/s).
+            ang (float): Wind direction (deg).
+            exponent (float): Exponent of the power law. Default to 1/7, for
+                open terrain.
+            reference (float): Altitude the speed is measured at (m).
+                Default to 10.0.
+            **kwargs: Further input for the class.
+        Returns:
+            Wind: The wind.
+        """
+        return cls.profile(lambda h: speed*(h/reference)**exponent, ang,
+            **kwargs)
+
+    @classmethod
+    def log(cls, speed, ang, roughness=0.03, reference=10.0, **kwargs):
+        """Wind shear following the logarithmic wind profile, zero up to the
+         roughness length.
+        Args:
+            speed (float): Wind speed at the reference altitude (m/s).
+            ang (float): Wind direction (deg).
+            roughness (float): Roughness length of the terrain (m). Default
+                to 0.03, for open terrain.
+            reference (float): Altitude the speed is measured at (m).
+                Default to 10.0.
+            **kwargs: Further input for the class.
+        Returns:
+            Wind: The wind.
+        """
+        scale = speed/math.log(reference/roughness)
+        return cls.profile(lambda h: scale*np.log(np.maximum(h, roughness)/
+            roughness), ang, **kwargs)
+
+    @classmethod
+    def sounding(cls, h, speed, ang, **kwargs):
+        """Wind measured at a number of altitudes, e.g. by a weather balloon.
+         The velocity is interpolated by component, so the direction turns
+         smoothly between the altitudes.
+        Args:
+            h (np.array): Increasing altitudes (m).
+            speed (np.array): Wind speed at each altitude (m/s).
+            ang (np.array): Wind direction at each altitude (deg).
+            **kwargs: Further input for the class.
+        Returns:
+            Wind: The wind.
+        """
+        east, north = components(np.asarray(speed, dtype=np.float64),
+            np.asarray(ang, dtype=np.float64))
+        return cls(h, east, north, **kwargs)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Read a sounding from a comma separated file with the columns
+         altitude (m), wind speed (m/s) and wind direction (deg). Lines
+         starting with '#' are comments.
+        Args:
+            path (str): Path of the file.
+            **kwargs: Further input for the class.
+        Returns:
+            Wind: The wind.
+        """
+        h, speed, ang = np.loadtxt(path, delimiter=",", comments="#",
+            ndmin=2)[:, :3].T
+        return cls.sounding(h, speed, ang, **kwargs)
+
+    def at(self, t, h):
+        """Velocity of the air (East, North, up) (m/s) at time t (s) and
+         altitude h (m), as floats."""
+        x = min(max(h/self.step, 0.0), len(self._east)-1.0)
+        j = min(int(x), len(self._east)-2)
+        f = x - j
+        east, north = self._east, self._north
+        east = east[j] + f*(east[j+1] - east[j])
+        north = north[j] + f*(north[j+1] - north[j])
+        if self.gust is None:
+            return east, north, 0.0
+        gx, gy, gz = self.gust.at(t)
+        return east + gx, north + gy, gz
+
+    def velocity(self, t, h):
+        """Velocity of the air (m/s) at time t (s) and altitudes h (m), an
+         array of shape (len(h), 3)."""
+        return Field([self]).velocity(t, h)
+
+class Field():
+    def __init__(self, winds):
+        """Initialize class. The winds of the members of an ensemble,
+         stacked so that all members are looked up at once. A wind shared by
+         all members is stored once.
+        Args:
+            winds (list): Wind of each member, all sampled with the same step
+                and top. Turbulence must have the same dt where given.
+        """
+        if all(wind is winds[0] for wind in winds):
+            winds = winds[:1]
+        first = winds[0]
+        if any(wind.step != first.step or len(wind.h) != len(first.h)
+                for wind in winds):
+            raise ValueError("The winds must be sampled on the same grid.")
+        self.n = len(winds)
+        self.step = first.step
+        self.east = np.stack([wind.east for wind in winds])
+        self.north = np.stack([wind.north for wind in winds])
+        gusts = [wind.gust for wind in winds]
+        self.dt = None
+        self.gust = None
+        if any(gust is not None for gust in gusts):
+            self.dt = next(gust.dt for gust in gusts if gust is not None)
+            if any(gust is not None and gust.dt != self.dt for gust in gusts):
+                raise ValueError("The gusts must have the same dt.")
+            samples = max(len(gust.values) for gust in gusts
+                if gust is not None)
+            #Shorter series are held at their last sample.
+            self.gust = np.zeros((self.n, samples, 3))
+            for i, gust in enumerate(gusts):
+                if gust is not None:
+                    self.gust[i, :len(gust.values)] = gust.values
+                    self.gust[i, len(gust.values):] = gust.values[-1]
+        self._rows = np.arange(self.n) if self.n > 1 else 0
+        return
+
+    def velocity(self, t, h):
+        """Velocity of the air (East, North, up) (m/s) of all members.
+        Args:
+            t (float): Time since initialization (s).
+            h (np.array): Altitude of each member (m), shape (N,).
+        Returns:
+            np.array: The velocity, shape (N, 3).
+        """
+        h = np.asarray(h, dtype=np.float64)
+        size = self.east.shape[1]
+        x = np.clip(h/self.step, 0, size-1.0)
+        j = np.minimum(x.astype(int), size-2)
+        f = x - j
+        rows = self._rows
+        air = np.zeros(h.shape + (3,))
+        low = self.east[rows, j]
+        air[..., 0] = low + f*(self.east[rows, j+1] - low)
+        low = self.north[rows, j]
+        air[..., 1] = low + f*(self.north[rows, j+1] - low)
+        if self.gust is not None:
+            x = min(max(t/self.dt, 0.0), self.gust.shape[1]-1.0)
+            k = min(int(x), self.gust.shape[1]-2)
+            low = self.gust[:, k]
+            air += low + (x - k)*(self.gust[:, k+1] - low)
+        return air